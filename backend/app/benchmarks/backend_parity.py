@@ -0,0 +1,138 @@
+"""
+Parity check of the NumPy/SciPy inference backend against the PyG model
+
+Loads the served bundle, checks its (bit-packed) features against the source graph,
+builds models.gcn_model.GCN from the same weights and compares logits and first-layer
+activations on both graphs, then the incremental append, the what-if scores and
+mini-batch inference against full forward passes. Needs the torch requirements.
+
+    python -m benchmarks.backend_parity --tolerance 1e-4
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline.graph_builder import node_permutation
+from services.artifact_bundle import ArtifactBundle
+from services.incremental import IncrementalGCN
+from services.minibatch import MiniBatchGCN
+from services.propagation import GCNWeights, PropagationEngine, gcn_logits
+from services.what_if import WhatIfEngine
+
+
+def torch_outputs(state_dict, x: np.ndarray, edge_index: np.ndarray):
+    """(hidden, logits) of the PyG model"""
+    import torch
+    from models.gcn_model import GCN
+
+    model = GCN(
+        in_channels=state_dict["conv1.lin.weight"].shape[1],
+        hidden_channels=state_dict["conv1.lin.weight"].shape[0],
+        out_channels=state_dict["conv2.lin.weight"].shape[0]
+    )
+    model.load_state_dict({name: torch.from_numpy(np.array(array)) for name, array in state_dict.items()})
+    model.eval()
+
+    x, edge_index = torch.from_numpy(np.array(x)), torch.from_numpy(np.array(edge_index))
+    with torch.no_grad():
+        hidden = torch.relu(model.conv1(x, edge_index))
+        logits = model(x, edge_index)
+    return hidden.numpy(), logits.numpy()
+
+
+def packing_error(bundle: ArtifactBundle) -> float:
+    """Largest difference between the bundle's (bit-packed) features and the source graph's, in node order"""
+    import torch
+    from pipeline.build_bundle import GRAPH_PATH
+
+    pivot_df = pd.DataFrame({"Economy": bundle.country_names("pivot_countries"), "Year": bundle.array("pivot_years")})
+    source = torch.load(GRAPH_PATH, weights_only=False).x.numpy()[node_permutation(pivot_df)]
+    return float(np.abs(np.asarray(bundle.features("graph_x")) - source).max())
+
+
+def relative_error(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.abs(a - b).max() / max(np.abs(b).max(), 1e-12))
+
+
+def run(bundle: ArtifactBundle, n_scenarios: int, seed: int = 0) -> dict:
+    state_dict = bundle.state_dict()
+    weights = GCNWeights.from_state_dict(state_dict)
+    rng = np.random.default_rng(seed)
+    report = {"graph_x_features": packing_error(bundle)}
+
+    for graph in ("graph", "future"):
+        x, edge_index = bundle.features(f"{graph}_x"), bundle.array(f"{graph}_edge_index")
+        hidden, logits = torch_outputs(state_dict, x, edge_index)
+
+        start = time.perf_counter()
+        engine = PropagationEngine(weights, x, edge_index)
+        numpy_logits = engine.logits()
+        report[f"{graph}_numpy_ms"] = (time.perf_counter() - start) * 1000
+        report[f"{graph}_hidden"] = relative_error(engine.hidden(), hidden)
+        report[f"{graph}_logits"] = relative_error(numpy_logits, logits)
+        report[f"{graph}_argmax_mismatches"] = int((numpy_logits.argmax(axis=1) != logits.argmax(axis=1)).sum())
+
+    # Append the last nodes again as new ones, wired to random existing nodes
+    x, edge_index = bundle.features("graph_x"), bundle.array("graph_edge_index")
+    n_old, n_new = x.shape[0], 20
+    new_nodes = np.arange(n_old, n_old + n_new)
+    existing = rng.integers(0, n_old, n_new)
+    edge_index_new = np.concatenate([np.stack([new_nodes, existing]), np.stack([existing, new_nodes])], axis=1)
+
+    incremental = IncrementalGCN(weights, x, edge_index)
+    incremental.append(np.array(x[-n_new:]), edge_index_new)
+    x_full = np.concatenate([x, x[-n_new:]])
+    _, logits = torch_outputs(state_dict, x_full, np.concatenate([edge_index, edge_index_new], axis=1))
+    report["incremental_logits"] = relative_error(incremental.out, logits)
+
+    # What-if scores of random feature changes against one full pass per scenario
+    what_if = WhatIfEngine(PropagationEngine(weights, x, edge_index))
+    nodes = rng.choice(n_old, n_scenarios, replace=False)
+    deltas = rng.normal(size=(n_scenarios, x.shape[1])).astype(np.float32)
+    scenario_rows, affected, scores = what_if.score(nodes, deltas)
+
+    errors = []
+    for s, (node, delta) in enumerate(zip(nodes, deltas)):
+        x_changed = np.array(x)
+        x_changed[node] += delta
+        expected = gcn_logits(weights, x_changed, edge_index)
+        rows = scenario_rows == s
+        errors.append(relative_error(scores[rows], expected[affected[rows]]))
+    report["what_if_logits"] = max(errors)
+
+    # Mini-batch inference with full neighbourhoods, in random node order, in-process and on a pool
+    nodes = rng.permutation(n_old)
+    expected = gcn_logits(weights, x, edge_index)[nodes]
+    for name, workers in (("minibatch_logits", 0), ("minibatch_pool_logits", 2)):
+        model = MiniBatchGCN(weights, x, edge_index, batch_size=64, workers=workers)
+        try:
+            report[name] = relative_error(model.logits(nodes), expected)
+        finally:
+            model.close()
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the NumPy inference backend with the PyG model")
+    parser.add_argument("--scenarios", type=int, default=20, help="what-if scenarios to check")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="largest accepted relative error")
+    args = parser.parse_args()
+
+    report = run(ArtifactBundle.open(), args.scenarios)
+    print(json.dumps(report, indent=2))
+
+    errors = {name: value for name, value in report.items() if name.endswith(("_features", "_hidden", "_logits"))}
+    mismatches = sum(value for name, value in report.items() if name.endswith("_mismatches"))
+    if max(errors.values()) > args.tolerance or mismatches:
+        print(f"❌ Backends differ: {errors}, {mismatches} different clusters")
+        sys.exit(1)
+    print("✅ NumPy backend matches the PyG model")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Scaling benchmark of pipeline.graph_builder on synthetic long-format data
+
+Generates `regions` pseudo-countries (e.g. subnational regions) over `years` years with
+the indicator count of the real dataset, then times every graph-building stage.
+
+    python -m benchmarks.graph_builder --regions 1000 5000 --years 11
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline.graph_builder import build_features, knn_edges, node_offsets, pivot_dataset, temporal_edges
+
+
+def synthetic_dataset(n_regions: int, n_years: int, n_indicators: int = 61,
+                      missing_rate: float = 0.3, seed: int = 0, first_year: int = 2014) -> pd.DataFrame:
+    """Long-format (Economy, Year, Indicator, Value) rows with missing values dropped"""
+    rng = np.random.default_rng(seed)
+    regions = np.array([f"Region {i:06d}" for i in range(n_regions)], dtype=object)
+    indicators = np.array([f"Indicator {i:03d}" for i in range(n_indicators)], dtype=object)
+
+    n_rows = n_regions * n_years * n_indicators
+    keep = rng.random(n_rows) >= missing_rate
+    economy = np.repeat(regions, n_years * n_indicators)[keep]
+    year = np.tile(np.repeat(np.arange(first_year, first_year + n_years), n_indicators), n_regions)[keep]
+    indicator = np.tile(indicators, n_regions * n_years)[keep]
+    value = rng.lognormal(size=keep.sum())
+
+    return pd.DataFrame({"Economy": economy, "Year": year, "Indicator": indicator, "Value": value})
+
+
+def run(n_regions: int, n_years: int, k: int) -> dict:
+    df = synthetic_dataset(n_regions, n_years)
+    timings = {}
+
+    start = time.perf_counter()
+    pivot_df = pivot_dataset(df)
+    features = build_features(pivot_df)
+    timings["pivot_features_s"] = time.perf_counter() - start
+
+    countries = pivot_df["Economy"].to_numpy()
+    years = pivot_df["Year"].to_numpy(dtype=np.int64)
+    offsets = node_offsets(years)
+
+    start = time.perf_counter()
+    temporal = temporal_edges(countries, years)
+    timings["temporal_edges_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    knn = knn_edges(features, offsets, k)
+    timings["knn_edges_s"] = time.perf_counter() - start
+
+    return {
+        "regions": n_regions,
+        "years": n_years,
+        "nodes": len(pivot_df),
+        "edges": temporal.shape[1] + knn.shape[1],
+        **{name: round(seconds, 4) for name, seconds in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time graph construction on synthetic data")
+    parser.add_argument("--regions", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--years", type=int, default=11)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    for n_regions in args.regions:
+        print(json.dumps(run(n_regions, args.years, args.k)))
+
+
+if __name__ == "__main__":
+    main()
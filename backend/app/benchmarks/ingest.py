@@ -0,0 +1,76 @@
+"""
+Benchmark of pipeline.ingest against pivoting the long-format CSV on every load
+
+Times a cold ingest of the raw archive into an empty cache, an ingest of the
+unchanged archive, and loading the pivoted dataset: read_csv + pivot_table of the
+cleaned CSV versus reading the cached partitions (all years, and one year).
+
+    python -m benchmarks.ingest --archive "../../Dataset ITU.zip" --dataset data/cleaned_final_dataset.csv
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from pipeline.ingest import ingest, load_pivot
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    """Fastest of repeat calls, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(archive: str, dataset: str, repeat: int) -> Dict:
+    # Tracing allocations slows the ingest down, memory is measured on a separate run
+    with tempfile.TemporaryDirectory() as cache_dir:
+        tracemalloc.start()
+        ingest(archive, cache_dir)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        summary = ingest(archive, cache_dir)
+        cold_s = time.perf_counter() - start
+
+        pivot_df = load_pivot(cache_dir)
+        one_year = int(np.max(pivot_df["Year"]))
+
+        return {
+            "rows": len(pivot_df),
+            "indicators": pivot_df.shape[1] - 2,
+            "years": len(summary["written"]),
+            "ingest_cold_s": cold_s,
+            "ingest_peak_alloc_mb": peak_mb,
+            "ingest_unchanged_s": best_of(lambda: ingest(archive, cache_dir), repeat),
+            "csv_pivot_s": best_of(
+                lambda: pd.read_csv(dataset).pivot_table(index=["Economy", "Year"], columns="Indicator", values="Value"),
+                repeat
+            ),
+            "cache_load_s": best_of(lambda: load_pivot(cache_dir), repeat),
+            "cache_load_one_year_s": best_of(lambda: load_pivot(cache_dir, years=[one_year]), repeat),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time ingesting the raw archive and loading the pivoted dataset")
+    parser.add_argument("--archive", default="../../Dataset ITU.zip", help="raw ITU dump")
+    parser.add_argument("--dataset", default="data/cleaned_final_dataset.csv", help="long-format CSV")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.archive, args.dataset, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Latency, throughput and memory benchmark of PredictionService and the HTTP endpoints
+
+Runs on the shipped bundle (scale 1) and on synthetic bundles with 10x the countries
+(scale 10) and 10x both the countries and the years (scale 100). Synthetic graphs have
+the feature width, temporal edges and kNN structure of the real one and reuse the
+trained GCN weights. Every scale runs in its own process, so its peak RSS is its own.
+
+    python -m benchmarks.service --scales 1 10 100 --iterations 200 --output bench.json
+
+Latencies are of sequential calls; "cold" HTTP cases start every request with an
+empty response cache, "warm" ones are served from it.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# scale -> (countries factor, years factor) of the synthetic graph
+SCALES = {1: (1, 1), 10: (10, 1), 100: (10, 10)}
+SYNTHETIC_DIR = os.path.join(tempfile.gettempdir(), "gcn-benchmark-bundles")
+SAMPLE_COUNTRIES = 50
+
+
+def synthetic_bundle(scale: int, output_dir: str = SYNTHETIC_DIR) -> str:
+    """Bundle of a synthetic graph scale times the size of the shipped one, built once"""
+    from benchmarks.graph_builder import synthetic_dataset
+    from pipeline.build_bundle import MANIFEST_FILE, feature_arrays, write_bundle
+    from pipeline.graph_builder import graph_arrays
+    from services.artifact_bundle import ArtifactBundle
+    from services.country_table import COUNTRY_ID_DTYPE, YEAR_DTYPE
+    from services.prediction_service import LAST_FORECAST_YEAR
+
+    base = ArtifactBundle.open()
+    version = f"synthetic-{scale}x-{base.version}"
+    if os.path.exists(os.path.join(output_dir, version, MANIFEST_FILE)):
+        return os.path.join(output_dir, version)
+
+    country_factor, year_factor = SCALES[scale]
+    n_countries = len(base.countries) * country_factor
+    n_years = len(base.node_offset) * year_factor
+    last_year = max(base.node_offset)
+    n_indicators = len(base.indicators)
+
+    pivot_df, x, edge_index, offsets = graph_arrays(
+        synthetic_dataset(n_countries, n_years, n_indicators, first_year=last_year - n_years + 1)
+    )
+    # Like the shipped forecast graph: the last historical year and the following ones
+    future_df, future_x, future_edge_index, _ = graph_arrays(
+        synthetic_dataset(n_countries, LAST_FORECAST_YEAR - last_year + 1, n_indicators, seed=1, first_year=last_year)
+    )
+
+    countries = sorted(set(pivot_df["Economy"]) | set(future_df["Economy"]))
+    country_ids = {country: i for i, country in enumerate(countries)}
+
+    def ids_of(names) -> np.ndarray:
+        return np.array([country_ids[name] for name in names], dtype=COUNTRY_ID_DTYPE)
+
+    arrays = {
+        **feature_arrays("graph_x", x, n_indicators),
+        "graph_edge_index": edge_index,
+        "graph_node_countries": ids_of(pivot_df["Economy"]),
+        "graph_node_years": pivot_df["Year"].to_numpy(dtype=YEAR_DTYPE),
+        **feature_arrays("future_x", future_x, n_indicators),
+        "future_edge_index": future_edge_index,
+        "future_node_countries": ids_of(future_df["Economy"]),
+        "future_node_years": future_df["Year"].to_numpy(dtype=YEAR_DTYPE),
+        "pivot_values": pivot_df.drop(columns=["Economy", "Year"]).to_numpy(dtype=np.float64),
+        "pivot_countries": ids_of(pivot_df["Economy"]),
+        "pivot_years": pivot_df["Year"].to_numpy(dtype=YEAR_DTYPE),
+        **{f"weights/{name}": array for name, array in base.state_dict().items()},
+    }
+    manifest = {
+        "model": base.manifest["model"],
+        "feature_predictor": None,
+        "node_offset": {str(year): list(offsets) for year, offsets in offsets.items()},
+        "countries": countries,
+        "indicators": [str(column) for column in pivot_df.columns if column not in ("Economy", "Year")],
+    }
+    return write_bundle(output_dir, version, arrays, manifest)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is in KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(fn: Callable[[int], object], iterations: int, warmup: int,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    """
+    Latency percentiles and throughput of fn(i) over sequential calls
+
+    setup runs before every call, outside the timed region. peak_alloc_mb is the
+    peak of Python and NumPy allocations during one extra call, traced separately
+    so tracing does not slow down the timed ones.
+    """
+    for i in range(warmup):
+        if setup:
+            setup()
+        fn(i)
+
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn(i)
+        latencies[i] = time.perf_counter() - start
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn(0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "mean_ms": float(latencies.mean() * 1000),
+        "throughput_rps": float(iterations / latencies.sum()),
+        "peak_alloc_mb": peak / 2 ** 20,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_scale(iterations: int, warmup: int, seed: int = 0) -> Dict:
+    """Benchmark the bundle ARTIFACT_BUNDLE_DIR points to, in this process"""
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from services.http_cache import ResponseCache
+
+    start = time.perf_counter()
+    # Keeps the startup output of the app out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), TestClient(app) as client:
+        load_s = time.perf_counter() - start
+        registry = app.state.registry
+        service = registry.service
+        table = service.state.cluster_table
+
+        years = table.years.tolist()
+        http_years = [year for year in years if 2014 <= year <= 2028]
+        rng = np.random.default_rng(seed)
+        countries = rng.choice(np.array(table.countries.names, dtype=object), SAMPLE_COUNTRIES, replace=False).tolist()
+
+        # (year, cluster) pairs with countries, anything else is a 404
+        present = []
+        for year in years:
+            for cluster in np.unique(table.year_slice(year)[1]).tolist():
+                present.append((year, cluster))
+        http_present = [(year, cluster) for year, cluster in present if 2014 <= year <= 2028]
+
+        def get(url: str):
+            response = client.get(url)
+            if response.status_code >= 400:
+                raise RuntimeError(f"GET {url}: {response.status_code} {response.text[:200]}")
+            return response
+
+        def clear_cache():
+            registry.model.response_cache = ResponseCache(registry.version, registry.executor)
+
+        service_cases = {
+            "service.predict_clusters": lambda i: service.predict_clusters(years[i % len(years)]),
+            "service.get_country_trends": lambda i: service.get_country_trends(countries[i % len(countries)], 10),
+            "service.get_cluster_stats": lambda i: service.get_cluster_stats(*present[i % len(present)]),
+        }
+        http_cases = {
+            "GET /predict/clusters/{year}": lambda i: get(f"/predict/clusters/{http_years[i % len(http_years)]}"),
+            "GET /predict/clusters/{year}?format=columnar":
+                lambda i: get(f"/predict/clusters/{http_years[i % len(http_years)]}?format=columnar"),
+            "GET /predict/clusters?from=2014&to=2028": lambda i: get("/predict/clusters?from=2014&to=2028"),
+            "GET /predict/transitions?from=2014&to=2028": lambda i: get("/predict/transitions?from=2014&to=2028"),
+            "GET /predict/trends/{country}": lambda i: get(f"/predict/trends/{countries[i % len(countries)]}"),
+            "GET /predict/similar/{country}": lambda i: get(f"/predict/similar/{countries[i % len(countries)]}"),
+            "GET /cluster-stats/{year}/{cluster}":
+                lambda i: get("/cluster-stats/{}/{}".format(*http_present[i % len(http_present)])),
+        }
+
+        # Warm cases first request every distinct URL once, so the timed calls are all hits
+        distinct = max(len(http_years), len(countries), len(http_present))
+
+        cases = {name: measure(fn, iterations, warmup) for name, fn in service_cases.items()}
+        for name, fn in http_cases.items():
+            cases[f"{name} (cold)"] = measure(fn, iterations, warmup, setup=clear_cache)
+            cases[f"{name} (warm)"] = measure(fn, iterations, warmup + distinct)
+
+        return {
+            "artifact_version": registry.artifact_version,
+            "nodes": int(service.state.data.x.shape[0]),
+            "edges": int(service.state.data.edge_index.shape[1]),
+            "countries": len(table.countries),
+            "years": len(years),
+            "load_s": load_s,
+            "peak_rss_mb": peak_rss_mb(),
+            "cases": cases,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the service and its endpoints at several graph scales")
+    parser.add_argument("--scales", type=int, nargs="+", default=sorted(SCALES), choices=sorted(SCALES))
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per case")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed calls per case")
+    parser.add_argument("--synthetic-dir", default=SYNTHETIC_DIR, help="where synthetic bundles are cached")
+    parser.add_argument("--output", help="JSON file to write, stdout by default")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # One scale in a fresh process, started by the parent below
+        with open(args.worker, "w") as f:
+            json.dump(run_scale(args.iterations, args.warmup), f)
+        return
+
+    from pipeline.build_bundle import BUNDLE_DIR
+
+    results: List[Dict] = []
+    for scale in args.scales:
+        start = time.perf_counter()
+        bundle_root = os.path.abspath(BUNDLE_DIR)
+        if scale != 1:
+            bundle_root = os.path.dirname(synthetic_bundle(scale, args.synthetic_dir))
+        build_s = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result_path = os.path.join(tmp_dir, "result.json")
+            env = {
+                **os.environ,
+                "ARTIFACT_BUNDLE_DIR": bundle_root,
+                "SHARED_ARRAY_DIR": os.path.join(tmp_dir, "shared"),
+                "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+            }
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.service", "--worker", result_path,
+                 "--iterations", str(args.iterations), "--warmup", str(args.warmup)],
+                env=env, check=True
+            )
+            with open(result_path) as f:
+                result = json.load(f)
+
+        results.append({"scale": scale, "bundle_s": build_s, **result})
+        print(f"Scale {scale}x: {result['nodes']} nodes, loaded in {result['load_s']:.2f}s, "
+              f"peak RSS {result['peak_rss_mb']:.0f}MB", file=sys.stderr)
+
+    report = json.dumps({
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "iterations": args.iterations,
+        "results": results,
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
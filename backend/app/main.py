@@ -1,13 +1,47 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routes import predictor, health
+from fastapi.middleware.gzip import GZipMiddleware
+from routes import admin, predictor, health
 from schemas.responses import ClusterStatsResponse
 from services.prediction_service import PredictionService
+from services.registry import ModelRegistry, get_prediction_service, get_forecast_cache
+from services.http_cache import ResponseCache, cached_response
+from services.metrics import MetricsMiddleware
+from services.serialization import dump_model
+
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+
+# Seconds between checks of the bundle CURRENT pointer for a new version, 0 disables hot reload
+BUNDLE_POLL_SECONDS = float(os.environ.get("BUNDLE_POLL_SECONDS", 30))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the models and data once per worker process, then watch the bundle for new versions"""
+    registry = ModelRegistry()
+    registry.load()
+    app.state.registry = registry
+
+    watcher = asyncio.create_task(registry.watch(BUNDLE_POLL_SECONDS)) if BUNDLE_POLL_SECONDS > 0 else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    registry.close()
+
 
 core_app = FastAPI(
     title="Digital Inequality Predictor API",
     description="Backend API for analyzing and mapping digital inequality using Graph Neural Networks (GNNs).",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 core_app.add_middleware(
@@ -17,20 +51,28 @@ core_app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+core_app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Outermost, so request durations include compression
+core_app.add_middleware(MetricsMiddleware)
 
 # --- ROUTES REGISTRATION ---
 core_app.include_router(health.router)
+core_app.include_router(admin.router)
 core_app.include_router(predictor.router)
 
 
-predictionService = PredictionService()
-
 @core_app.get("/", tags=["Root"])
 def root():
     return {"message": "Digital Inequality Predictor API is running!"}
 
 @core_app.get("/cluster-stats/{year}/{cluster}", response_model=ClusterStatsResponse)
-async def get_cluster_stats(year: int, cluster: int):
+async def get_cluster_stats(
+    request: Request,
+    year: int,
+    cluster: int,
+    predictionService: PredictionService = Depends(get_prediction_service),
+    cache: ResponseCache = Depends(get_forecast_cache)
+):
     """
     Get detailed statistics for a cluster
     
@@ -40,18 +82,22 @@ async def get_cluster_stats(year: int, cluster: int):
     if cluster not in [0, 1, 2]:
         raise HTTPException(status_code=400, detail="Cluster must be between 0 and 2")
     
-    try:
+    def render():
         result = predictionService.get_cluster_stats(year, cluster)
-        if result:
-            return result
-        else:
-            raise HTTPException(status_code=404, detail=f"No data for cluster {cluster} in {year}")
+        return dump_model(result) if result else None
+
+    try:
+        result = await cached_response(request, cache, ("cluster-stats", year, cluster), render)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No data for cluster {cluster} in {year}")
+    return result
+
 
 app = core_app
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000)
\ No newline at end of file
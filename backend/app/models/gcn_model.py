@@ -1,7 +1,6 @@
 import torch
 import torch.nn.functional as F
 from torch_geometric.nn import GCNConv
-from torch_geometric.loader import DataLoader
 
 class GCN(torch.nn.Module):
     """GCN model for countries clustering"""
@@ -0,0 +1,84 @@
+"""
+Clusters of selected (country, year) nodes of a bundle, by mini-batch inference
+
+For graphs too large for the full-batch forward pass of the service: only the 2-hop
+neighbourhoods of the selected nodes are gathered, a batch at a time (see
+services.minibatch.MiniBatchGCN), optionally sampled and spread over processes.
+
+    python -m pipeline.batch_inference --years 2020 2021 --countries Germany France \\
+        --batch-size 1024 --workers 4 --output clusters.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.artifact_bundle import ArtifactBundle
+from services.minibatch import MiniBatchGCN
+from services.country_table import CountryTable
+from services.node_index import NodeIndex
+from services.propagation import GCNWeights
+
+
+def select_nodes(index: NodeIndex, years=None, countries=None) -> np.ndarray:
+    """Node ids of the historical graph in the given years and countries (all by default)"""
+    selected = index.node_years >= 0
+    if years:
+        selected &= np.isin(index.node_years, years)
+    if countries:
+        wanted = index.countries.ids(countries)
+        selected &= np.isin(index.node_country_ids, wanted[wanted >= 0])
+    return np.flatnonzero(selected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mini-batch GCN inference for part of the graph")
+    parser.add_argument("--years", type=int, nargs="+", help="years to predict (default: all)")
+    parser.add_argument("--countries", nargs="+", help="countries to predict, e.g. one region (default: all)")
+    parser.add_argument("--batch-size", type=int, default=1024, help="target nodes per batch")
+    parser.add_argument("--fanout", type=int, nargs=2, metavar=("HOP1", "HOP2"),
+                        help="sample at most this many neighbours per hop (default: full neighbourhoods)")
+    parser.add_argument("--workers", type=int, default=0, help="processes running batches (default: in-process)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the neighbour sampling")
+    parser.add_argument("--output", default="clusters.csv", help="CSV file to write")
+    args = parser.parse_args()
+
+    bundle = ArtifactBundle.open()
+    index = NodeIndex(bundle.array("graph_node_countries"), bundle.array("graph_node_years"), CountryTable(bundle.countries))
+    nodes = select_nodes(index, args.years, args.countries)
+    if len(nodes) == 0:
+        parser.error("No nodes match the selected years and countries")
+
+    start = time.perf_counter()
+    model = MiniBatchGCN(
+        GCNWeights.from_state_dict(bundle.state_dict()),
+        bundle.features("graph_x"),
+        bundle.array("graph_edge_index"),
+        batch_size=args.batch_size,
+        fanouts=tuple(args.fanout) if args.fanout else None,
+        workers=args.workers,
+        seed=args.seed
+    )
+    try:
+        logits = model.logits(nodes)
+    finally:
+        model.close()
+
+    result = pd.DataFrame({
+        "node_id": nodes,
+        "country": index.country_names(nodes),
+        "year": index.node_years[nodes],
+        "cluster": logits.argmax(axis=1),
+    })
+    for k in range(logits.shape[1]):
+        result[f"logit_{k}"] = logits[:, k]
+    result.to_csv(args.output, index=False)
+
+    print(f"Predicted {len(nodes)} nodes in {-(-len(nodes) // args.batch_size)} batches "
+          f"in {time.perf_counter() - start:.2f}s")
+    print(f"💾 Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Compiles the served artifacts into one versioned, pickle-free bundle
+
+Reads the GCN weights (and the FeaturePredictor weights if there are any), both
+.pt graphs and the cleaned dataset once and writes plain .npy arrays plus a JSON
+manifest to <bundle_dir>/<version>/, then points <bundle_dir>/CURRENT at it.
+The version is a content hash of the source files, so rebuilding unchanged
+sources gives the same directory.
+
+    python -m pipeline.build_bundle --output data/bundle
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from pipeline.graph_builder import build_features, node_offsets, node_permutation, reorder_nodes
+from services.country_table import COUNTRY_ID_DTYPE, YEAR_DTYPE
+from services.graph import PackedFeatures
+
+GCN_WEIGHTS_PATH = "data/simple_gcn_model_dict.pth"
+GRAPH_PATH = "data/digital_inequality_graph_with_years.pt"
+FUTURE_GRAPH_PATH = "data/future_predictions_graph.pt"
+DATASET_PATH = "data/cleaned_final_dataset.csv"
+# Trained weights of the notebook's FeaturePredictor, optional: without them the
+# shipped forecast graph serves the future years
+FEATURE_PREDICTOR_WEIGHTS_PATH = "data/feature_predictor_dict.pth"
+SOURCE_PATHS = [GCN_WEIGHTS_PATH, GRAPH_PATH, FUTURE_GRAPH_PATH, DATASET_PATH]
+
+BUNDLE_DIR = os.environ.get("ARTIFACT_BUNDLE_DIR", "data/bundle")
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+# 2: int16 country ids and years, bit-packed mask columns of the node features
+# 3: graph nodes labelled from the pivot rows and renumbered in (Year, Economy) order
+FORMAT_VERSION = 3
+
+
+def source_paths() -> List[str]:
+    """Files a bundle is built from, optional ones only if they exist"""
+    if os.path.exists(FEATURE_PREDICTOR_WEIGHTS_PATH):
+        return SOURCE_PATHS + [FEATURE_PREDICTOR_WEIGHTS_PATH]
+    return SOURCE_PATHS
+
+
+def source_version(paths: Optional[List[str]] = None) -> str:
+    """Content hash of the model and data files a bundle is built from, and of the bundle format"""
+    digest = hashlib.sha256(f"format {FORMAT_VERSION}".encode())
+    for path in paths or source_paths():
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def build_bundle(output_dir: str = BUNDLE_DIR) -> str:
+    """Write the bundle of the current source files, returns its directory"""
+    # Only needed to read the .pt sources, the service reads bundles without torch
+    import torch
+
+    version = source_version()
+    bundle_dir = os.path.join(output_dir, version)
+    if os.path.exists(os.path.join(bundle_dir, MANIFEST_FILE)):
+        _set_current(output_dir, version)
+        return bundle_dir
+
+    state_dict = torch.load(GCN_WEIGHTS_PATH, map_location="cpu")
+    graph = torch.load(GRAPH_PATH, weights_only=False)
+    future_graph = torch.load(FUTURE_GRAPH_PATH, weights_only=False)
+
+    pivot_df = pd.read_csv(DATASET_PATH).pivot_table(
+        index=["Economy", "Year"],
+        columns="Indicator",
+        values="Value"
+    ).reset_index()
+
+    # Node i of the .pt graph is pivot row i, as in the notebook (node_id = range(len(pivot_df))),
+    # renumbered in (Year, Economy) order so that every year is a contiguous node range
+    graph_x, graph_edge_index, nodes_df = graph_node_order(graph.x.numpy(), graph.edge_index.numpy(), pivot_df)
+    node_years = nodes_df["Year"].to_numpy(dtype=np.int64)
+
+    countries = sorted(set(pivot_df["Economy"]) | set(future_graph.countries))
+    country_ids = {country: i for i, country in enumerate(countries)}
+
+    def ids_of(names) -> np.ndarray:
+        return np.array([country_ids.get(name, -1) for name in names], dtype=COUNTRY_ID_DTYPE)
+
+    n_indicators = pivot_df.shape[1] - 2
+    arrays: Dict[str, np.ndarray] = {
+        **feature_arrays("graph_x", graph_x, n_indicators),
+        "graph_edge_index": graph_edge_index,
+        "graph_node_countries": ids_of(nodes_df["Economy"]),
+        "graph_node_years": node_years.astype(YEAR_DTYPE),
+        **feature_arrays("future_x", future_graph.x.numpy(), n_indicators),
+        "future_edge_index": future_graph.edge_index.numpy(),
+        "future_node_countries": ids_of(future_graph.countries),
+        "future_node_years": future_graph.years.numpy().astype(YEAR_DTYPE),
+        "pivot_values": pivot_df.drop(columns=["Economy", "Year"]).to_numpy(dtype=np.float64),
+        "pivot_countries": ids_of(pivot_df["Economy"]),
+        "pivot_years": pivot_df["Year"].to_numpy(dtype=YEAR_DTYPE),
+    }
+    weights = {f"weights/{name}": tensor.numpy() for name, tensor in state_dict.items()}
+
+    feature_predictor = None
+    if os.path.exists(FEATURE_PREDICTOR_WEIGHTS_PATH):
+        predictor_state = torch.load(FEATURE_PREDICTOR_WEIGHTS_PATH, map_location="cpu")
+        predictor_weights = {
+            f"feature_predictor/{name}": tensor.numpy() for name, tensor in predictor_state.items()
+        }
+        feature_predictor = {
+            "input_dim": int(predictor_state["conv1.lin.weight"].shape[1]),
+            "hidden_dim": int(predictor_state["conv1.lin.weight"].shape[0]),
+            "weights": list(predictor_weights),
+        }
+        weights.update(predictor_weights)
+
+    manifest = {
+        "model": {
+            "in_channels": int(state_dict["conv1.lin.weight"].shape[1]),
+            "hidden_channels": int(state_dict["conv1.lin.weight"].shape[0]),
+            "out_channels": int(state_dict["conv2.lin.weight"].shape[0]),
+            "weights": [name for name in weights if name.startswith("weights/")],
+        },
+        "feature_predictor": feature_predictor,
+        "node_offset": {str(year): list(offsets) for year, offsets in node_offsets(node_years).items()},
+        "countries": countries,
+        "indicators": [str(column) for column in pivot_df.columns if column not in ("Economy", "Year")],
+    }
+    return write_bundle(output_dir, version, {**arrays, **weights}, manifest)
+
+
+def graph_node_order(x: np.ndarray, edge_index: np.ndarray, pivot_df: pd.DataFrame):
+    """
+    Features, edges and pivot rows of a notebook graph's nodes, in node order
+
+    The graph's rows must be the pivot rows in pivot_table order, which is checked
+    against the features the pivot rows give: a graph of another dataset or node
+    numbering fails the build instead of serving every node under another name.
+    """
+    if x.shape[0] != len(pivot_df):
+        raise ValueError(f"Graph has {x.shape[0]} nodes, the dataset {len(pivot_df)} (country, year) rows")
+    if not np.allclose(x, build_features(pivot_df), atol=1e-5):
+        raise ValueError("Graph features do not match the dataset rows in (Economy, Year) order")
+
+    order = node_permutation(pivot_df)
+    x, edge_index = reorder_nodes(x, edge_index, order)
+    return x, edge_index, pivot_df.iloc[order].reset_index(drop=True)
+
+
+def feature_arrays(name: str, x: np.ndarray, n_indicators: int) -> Dict[str, np.ndarray]:
+    """
+    Bundle arrays of a node feature matrix
+
+    With binary mask columns it is stored as <name>_values, <name>_masks (bit-packed)
+    and <name>_index, see services.graph.PackedFeatures, otherwise densely as <name>.
+    """
+    packed = PackedFeatures.pack(x, n_indicators)
+    if packed is None:
+        return {name: np.asarray(x, dtype=np.float32)}
+    return {f"{name}_values": packed.values, f"{name}_masks": packed.masks, f"{name}_index": packed.index}
+
+
+def write_bundle(output_dir: str, version: str, arrays: Dict[str, np.ndarray], manifest: Dict) -> str:
+    """
+    Publish arrays and manifest entries as bundle <version>, returns its directory
+
+    Array names with a "/" are stored in that subdirectory (weights/, feature_predictor/).
+    """
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **manifest,
+        "arrays": {},
+    }
+    bundle_dir = os.path.join(output_dir, version)
+
+    # Written next to the final directory and renamed, readers never see half a bundle
+    tmp_dir = os.path.join(output_dir, f".{version}.{os.getpid()}.tmp")
+    for subdir in ("weights", "feature_predictor"):
+        os.makedirs(os.path.join(tmp_dir, subdir), exist_ok=True)
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        manifest["arrays"][name] = {"file": f"{name}.npy", "dtype": str(array.dtype), "shape": list(array.shape)}
+
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    try:
+        os.rename(tmp_dir, bundle_dir)
+    except OSError:
+        # Another process published the same version first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _set_current(output_dir, version)
+    return bundle_dir
+
+
+def _set_current(output_dir: str, version: str):
+    tmp_path = os.path.join(output_dir, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(output_dir, CURRENT_FILE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the served artifacts into a memory-mappable bundle")
+    parser.add_argument("--output", default=BUNDLE_DIR, help="directory holding the versioned bundles")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bundle_dir = build_bundle(args.output)
+    print(f"💾 Bundle written to {bundle_dir} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Builds the country-year graph from the long-format ITU dataset
+
+Same steps as notebooks/dataset_to_graph.ipynb, vectorized:
+pivot -> masks + backwardness index -> min imputation -> standardization,
+temporal edges between consecutive years of a country and cosine kNN edges
+between countries of the same year. Nodes are ordered by (Year, Economy), so
+every year is a contiguous node range described by node_offset.
+
+The notebook numbers the nodes of its graphs in pivot_table (Economy, Year) order
+instead (node_id = range(len(pivot_df))), and the shipped .pt graph is one of those:
+pipeline.build_bundle and utils/add_node_offsets.py renumber it into this node order
+with node_permutation/reorder_nodes. Its edges come from the notebook's last cell,
+a cosine kNN over all nodes (n_neighbors=10) with self-loops and no temporal edges.
+
+    python -m pipeline.graph_builder data/cleaned_final_dataset.csv data/graph.pt --k 4
+
+The dataset can also be a cache written by pipeline.ingest, which is already pivoted:
+
+    python -m pipeline.graph_builder data/ingest data/graph.pt --k 4
+"""
+import argparse
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    # torch is only imported by build_graph, the feature steps run without it
+    from torch_geometric.data import Data
+
+INDEX_COLUMNS = ["Economy", "Year"]
+
+
+def pivot_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per (country, year), one column per indicator, rows ordered by year"""
+    pivot_df = df.pivot_table(
+        index=INDEX_COLUMNS,
+        columns="Indicator",
+        values="Value"
+    ).reset_index()
+    return node_order(pivot_df)
+
+
+def node_order(pivot_df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of a pivoted dataset ordered by (Year, Economy), the order of the graph's nodes"""
+    return pivot_df.iloc[node_permutation(pivot_df)].reset_index(drop=True)
+
+
+def node_permutation(pivot_df: pd.DataFrame) -> np.ndarray:
+    """Positions of the rows of a pivoted dataset in node order, row order[i] is node i"""
+    return pivot_df.reset_index(drop=True).sort_values(["Year", "Economy"], kind="stable").index.to_numpy()
+
+
+def reorder_nodes(x: np.ndarray, edge_index: np.ndarray, order: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Node features and edges of a graph renumbered so that node order[i] becomes node i"""
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+    return x[order], position[edge_index]
+
+
+def load_dataset(path: str) -> pd.DataFrame:
+    """Pivoted dataset in node order, from a long-format CSV or a pipeline.ingest cache directory"""
+    if os.path.isdir(path):
+        from pipeline.ingest import load_pivot
+        return node_order(load_pivot(path))
+    return pivot_dataset(pd.read_csv(path))
+
+
+def feature_scaling(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-indicator (fill value, mean, std) of the raw pivoted values
+
+    Imputation with a "fine": NaN turns into the lowest observed value. Mean and std are
+    those of sklearn's StandardScaler on the imputed values: population std, constant
+    columns are left unscaled.
+    """
+    fill = np.nanmin(values, axis=0)
+    imputed = np.where(np.isnan(values), fill, values)
+    std = imputed.std(axis=0)
+    std[std == 0] = 1.0
+    return fill, imputed.mean(axis=0), std
+
+
+def build_features(pivot_df: pd.DataFrame) -> np.ndarray:
+    """Standardized min-imputed indicators, has-data masks and the digital backwardness index"""
+    values = pivot_df.drop(columns=INDEX_COLUMNS).to_numpy(dtype=np.float64)
+    missing = np.isnan(values)
+
+    masks = (~missing).astype(np.float64)
+    backwards_index = missing.mean(axis=1, keepdims=True)
+
+    fill, mean, std = feature_scaling(values)
+    normalized = (np.where(missing, fill, values) - mean) / std
+
+    return np.concatenate([normalized, masks, backwards_index], axis=1).astype(np.float32)
+
+
+def node_offsets(years: np.ndarray) -> Dict[int, Tuple[int, int]]:
+    """(start, end) node range of every year, years must be sorted"""
+    unique_years, starts, counts = np.unique(years, return_index=True, return_counts=True)
+    return {int(year): (int(start), int(start + count)) for year, start, count in zip(unique_years, starts, counts)}
+
+
+def temporal_edges(countries: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """Edges between consecutive available years of every country (groupby/shift)"""
+    country_codes = pd.factorize(countries)[0]
+    order = np.lexsort((years, country_codes))
+    same_country = country_codes[order][1:] == country_codes[order][:-1]
+    return np.stack([order[:-1][same_country], order[1:][same_country]])
+
+
+def knn_edges(features: np.ndarray, offsets: Dict[int, Tuple[int, int]], k: int, chunk_size: int = 2048) -> np.ndarray:
+    """
+    Cosine kNN edges inside every year
+
+    Rows are L2-normalized once, then each year block is scored by a matrix product in
+    chunks of rows, so memory stays at chunk_size x (nodes in the year).
+    """
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    normalized = features / np.maximum(norms, 1e-12)
+
+    sources, targets = [], []
+    for start_idx, end_idx in offsets.values():
+        n_year = end_idx - start_idx
+        # kNN only makes sense if there are more countries than neighbours
+        if n_year <= k:
+            continue
+
+        block = normalized[start_idx:end_idx]
+        for chunk_start in range(0, n_year, chunk_size):
+            chunk = block[chunk_start:chunk_start + chunk_size]
+            similarity = chunk @ block.T
+            # Exclude the node itself
+            rows = np.arange(len(chunk))
+            similarity[rows, chunk_start + rows] = -np.inf
+
+            top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            sources.append(np.repeat(start_idx + chunk_start + rows, k))
+            targets.append(start_idx + top.ravel())
+
+    if not sources:
+        return np.empty((2, 0), dtype=np.int64)
+    return np.stack([np.concatenate(sources), np.concatenate(targets)])
+
+
+def graph_arrays(df: pd.DataFrame, k: int = 4) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, Dict[int, Tuple[int, int]]]:
+    """
+    Pivot table, node features, edge_index and node_offset of a long-format dataset
+
+    k is the number of neighbours without the node itself (the notebook's n_neighbors=5).
+    Edges are made undirected so messages flow both ways in GCNConv.
+    """
+    return pivot_graph_arrays(pivot_dataset(df), k)
+
+
+def pivot_graph_arrays(
+    pivot_df: pd.DataFrame, k: int = 4
+) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, Dict[int, Tuple[int, int]]]:
+    """graph_arrays of a dataset that is already pivoted and in node order"""
+    features = build_features(pivot_df)
+
+    countries = pivot_df["Economy"].to_numpy()
+    years = pivot_df["Year"].to_numpy(dtype=np.int64)
+    offsets = node_offsets(years)
+
+    edges = np.concatenate([temporal_edges(countries, years), knn_edges(features, offsets, k)], axis=1)
+    edges = np.unique(np.concatenate([edges, edges[::-1]], axis=1), axis=1)
+    return pivot_df, features, edges.astype(np.int64), offsets
+
+
+def build_graph(pivot_df: pd.DataFrame, k: int = 4) -> "Data":
+    """Graph of a pivoted dataset in node order (see load_dataset), see graph_arrays"""
+    import torch
+    from torch_geometric.data import Data
+
+    pivot_df, features, edges, offsets = pivot_graph_arrays(pivot_df, k)
+    countries = pivot_df["Economy"].to_numpy()
+    years = pivot_df["Year"].to_numpy(dtype=np.int64)
+
+    return Data(
+        x=torch.from_numpy(features),
+        edge_index=torch.from_numpy(edges),
+        node_offset=offsets,
+        countries=countries.tolist(),
+        years=torch.from_numpy(years),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the country-year graph from the cleaned ITU dataset")
+    parser.add_argument("dataset", help="long-format CSV or pipeline.ingest cache, e.g. data/ingest")
+    parser.add_argument("output", help="path of the .pt graph to write")
+    parser.add_argument("--k", type=int, default=4, help="kNN neighbours per node inside a year")
+    args = parser.parse_args()
+
+    import torch
+
+    start = time.perf_counter()
+    data = build_graph(load_dataset(args.dataset), k=args.k)
+    torch.save(data, args.output)
+
+    print(f"Graph: {data.num_nodes} nodes, {data.edge_index.shape[1]} edges, "
+          f"{len(data.node_offset)} years, built in {time.perf_counter() - start:.2f}s")
+    print(f"💾 Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
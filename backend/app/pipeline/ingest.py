@@ -0,0 +1,372 @@
+"""
+Streams the raw ITU dump into a cached columnar store of the pivoted dataset
+
+Reads the CSV members of Dataset ITU.zip in chunks, straight from the archive, and
+applies the cleaning rules of notebooks/cleaned data.ipynb:
+
+- rows with more than 8 "0", "-" or empty cells are dropped; as in the notebook a "0"
+  only counts in columns pandas does not parse as numbers
+- rows without an indicator and the indicators of REMOVED_INDICATORS are dropped
+- year columns are melted to (country, indicator, year, value) rows. Values are parsed
+  after stripping "%" and every "-", like the notebook does (exponents such as e-005
+  lose their sign too, which keeps the values of cleaned_final_dataset.csv)
+- duplicate rows are dropped
+
+The rows are pivoted once, to one row per (country, year) and one float32 column per
+indicator, and every year is written as its own partition next to a JSON manifest:
+
+    <cache_dir>/manifest.json
+    <cache_dir>/<year>/countries.npy   int16 ids into the manifest's country table
+    <cache_dir>/<year>/values.npy      float32 [countries, indicators]
+
+Countries and indicators are only ever appended to the manifest tables, so the
+partitions of years whose content did not change stay valid and are kept. If the
+archive members are unchanged (same CRCs), nothing is read at all.
+
+    python -m pipeline.ingest "../../Dataset ITU.zip" --output data/ingest
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import zipfile
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.country_table import COUNTRY_ID_DTYPE, YEAR_DTYPE, CountryTable
+
+INGEST_DIR = os.environ.get("INGEST_DIR", "data/ingest")
+MANIFEST_FILE = "manifest.json"
+# Bump when the cleaning rules or the partition layout change, the next ingest rewrites everything
+FORMAT_VERSION = 1
+
+# Only the per-indicator files of the dump, not the copies of cleaned data next to them
+MEMBER_DIR = "Dataset ITU/"
+CHUNK_ROWS = 10_000
+MAX_MISSING_CELLS = 8
+INDEX_COLUMNS = ["Economy", "Year"]
+
+# Indicators the notebook removes after combining the files
+REMOVED_INDICATORS = frozenset([
+    "Other reason",
+    "Cultural reasons",
+    "Who regulates issues related to the Internet of Things?",
+    "Is the Regulatory Authority a collegial body?",
+    "At least once a day",
+    "Less than once a week",
+    "At least once a week but not every day",
+    "Who's responsible for implementation of mitigation measures for e-waste/ obsolete ICT equipment (e.g., recycling/disposal facilities or eco-design)",
+    "If the ICT Regulatory Authority is a collegial body, what is the total number of members/commissioners (including the Head)?",
+    "Number of female members",
+    "Is the Head of the Commission also responsible for day-to-day administrative matters?",
+    "Is there a billing framework to support charging mechanisms for IoT services and applications?",
+    "Information on licensing process",
+    "Sanctions for non-conformance with QoS requirements exist",
+    "Sanctions for non-conformance with QoS requirements applied",
+    "Frequency arrangements (Band Plans)",
+    "Significant reforms planned on IoT/M2M",
+    "International Gateways",
+    "Responsibility for handling consumer complaints",
+    "Responsibility for consumer education",
+    "Responsibility for ensuring consumer participation in the work of regulator",
+    "Responsibility for supporting consumer representation",
+    "Responsibility for providing comparable tariff information",
+    "Environment agency ",
+    "Legal instrument where the provision of e-waste is defined",
+    "Mechanisms of collaboration with the ICT regulator",
+    "Jurisdiction over e-waste",
+    "Games toys and hobbies",
+    "Internet of Things (IoT) regulations",
+    "Other Government Ministry or agency mandates",
+    "Separate regulatory entity for e-waste exist",
+    "Cloud computing policies",
+    "National entity responsible for cloud computing",
+    "National strategy, policy or initiative focusing on emerging technologies",
+    "Information on licensing agreements",
+    "Information on licensing requests",
+    "Allowed foreign ownership in Value-added service providers",
+    "ICT consumer protection legislation",
+    "Regulatory framework for e-Applications",
+    "ICT Regulator responsible for e-Applications",
+    "National Emergency Telecommunications Plan adopted",
+    "Regulatory or legislative framework on emergency telecommunications",
+    "Internet recognized as a legal right",
+    "Restriction to foreign participation or ownership in the ICT sector",
+    "Legal act that addresses foreign participation and ownership in ICTs",
+    "Other entity responsible for e-Applications",
+    "ICT regulator's mandate",
+    "Measure or initiatives for implementing the National Emergency Telecommunications Plan",
+    "Provisions for foreign suppliers/licensees",
+    "Regulatory treatment of foreign providers",
+    "Allowed foreign ownership in Internet Service Providers (ISPs)",
+    "Allowed foreign ownership in facilities-based operators",
+    "Allowed foreign ownership in international service operators",
+    "Allowed foreign ownership in local service operators",
+    "Allowed foreign ownership in other operators",
+    "Allowed foreign ownership in long-distance service operators",
+    "Allowed foreign ownership in spectrum-based operators",
+    "Are operators taken any measures to reduce the risk of bill shock",
+    "Broader regulatory incentives for telecom/ICT operators",
+    "BSS (Satellite TV)",
+])
+
+
+def archive_members(archive_path: str) -> Dict[str, Dict[str, int]]:
+    """CRC and size of every CSV member that is ingested, as recorded in the zip directory"""
+    with zipfile.ZipFile(archive_path) as archive:
+        return {
+            info.filename: {"crc": info.CRC, "size": info.file_size}
+            for info in archive.infolist()
+            if info.filename.startswith(MEMBER_DIR) and info.filename.endswith(".csv")
+        }
+
+
+def member_rows(archive: zipfile.ZipFile, name: str, chunk_rows: int = CHUNK_ROWS) -> Optional[pd.DataFrame]:
+    """
+    Cleaned long-format rows of one archive member, None if it has no Indicator column
+
+    Cells are read as text, chunk by chunk. Whether a column would have been parsed as
+    numbers (and its zeros not counted) is only known at the end of the member, so rows
+    are kept by their "-" and empty cells first and their zeros are counted afterwards.
+    """
+    kept, missing, zeros = [], [], []
+    numeric = None
+    with archive.open(name) as f:
+        for chunk in pd.read_csv(f, dtype=str, chunksize=chunk_rows):
+            if "Indicator" not in chunk.columns:
+                return None
+            # The notebook counts every column but the first (country names)
+            cells = chunk.iloc[:, 1:]
+            parsed = cells.apply(pd.to_numeric, errors="coerce")
+            chunk_numeric = (parsed.notna() | cells.isna()).all(axis=0).to_numpy()
+            numeric = chunk_numeric if numeric is None else numeric & chunk_numeric
+
+            chunk_missing = ((cells == "-") | cells.isna()).sum(axis=1).to_numpy()
+            keep = chunk_missing <= MAX_MISSING_CELLS
+            kept.append(chunk[keep])
+            missing.append(chunk_missing[keep])
+            zeros.append((cells[keep] == "0").to_numpy())
+
+    if not kept:
+        return None
+    rows = pd.concat(kept, ignore_index=True)
+    bad = np.concatenate(missing) + np.concatenate(zeros)[:, ~numeric].sum(axis=1)
+    rows = rows[bad <= MAX_MISSING_CELLS]
+
+    rows = rows.dropna(subset=["Indicator"])
+    rows = rows[~rows["Indicator"].isin(REMOVED_INDICATORS)]
+
+    year_columns = [column for column in rows.columns if str(column).isdigit()]
+    long_rows = rows.melt(
+        id_vars=["Economy", "Indicator"], value_vars=year_columns, var_name="Year", value_name="Value"
+    )
+    long_rows["Year"] = long_rows["Year"].astype(np.int64)
+    long_rows["Value"] = parse_values(long_rows["Value"])
+    return long_rows.dropna(subset=["Economy", "Value"])
+
+
+def parse_values(values: pd.Series) -> pd.Series:
+    """Numbers of the text cells, "%" and "-" stripped as in the notebook, NaN where that fails"""
+    text = values.str.replace("%", "", regex=False).str.replace("-", "", regex=False).str.strip()
+    return pd.to_numeric(text, errors="coerce")
+
+
+def cleaned_rows(archive_path: str, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Cleaned long-format (Economy, Indicator, Year, Value) rows of every member of the archive"""
+    frames = []
+    with zipfile.ZipFile(archive_path) as archive:
+        for name in sorted(archive_members(archive_path)):
+            rows = member_rows(archive, name, chunk_rows)
+            if rows is not None:
+                frames.append(rows)
+
+    if not frames:
+        return pd.DataFrame({"Economy": [], "Indicator": [], "Year": [], "Value": []})
+    return pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+def ingest(archive_path: str, cache_dir: str = INGEST_DIR, chunk_rows: int = CHUNK_ROWS) -> Dict[str, List[int]]:
+    """
+    Bring the cache up to date with the archive, returns the years written, kept and removed
+
+    Years are rewritten only if their countries, indicators or values changed.
+    """
+    members = archive_members(archive_path)
+    previous = read_manifest(cache_dir)
+    if previous is not None and previous["members"] == members and _partitions_exist(cache_dir, previous):
+        return {"written": [], "unchanged": sorted(int(year) for year in previous["years"]), "removed": []}
+
+    pivot_df = cleaned_rows(archive_path, chunk_rows).pivot_table(
+        index=INDEX_COLUMNS,
+        columns="Indicator",
+        values="Value"
+    ).reset_index()
+
+    # Append-only tables, ids and columns of the kept partitions keep their meaning
+    countries = CountryTable(previous["countries"] if previous else [])
+    indicators = list(previous["indicators"]) if previous else []
+    present = [str(column) for column in pivot_df.columns if column not in INDEX_COLUMNS]
+    indicators += [indicator for indicator in present if indicator not in indicators]
+
+    values = np.full((len(pivot_df), len(indicators)), np.nan, dtype=np.float32)
+    values[:, [indicators.index(indicator) for indicator in present]] = pivot_df[present].to_numpy(dtype=np.float32)
+    country_ids = countries.intern(pivot_df["Economy"].tolist())
+    years = pivot_df["Year"].to_numpy(dtype=np.int64)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    summary = {"written": [], "unchanged": [], "removed": []}
+    partitions = {}
+    for year in np.unique(years).tolist():
+        rows = np.flatnonzero(years == year)
+        # Rows of a partition in country order, as pivot_table sorts them
+        year_ids, year_values = country_ids[rows], values[rows]
+        digest = _partition_digest(countries.names_of(year_ids.tolist()), indicators, year_values)
+
+        old = previous["years"].get(str(year)) if previous else None
+        if old is not None and old["digest"] == digest and _partition_exists(cache_dir, year):
+            partitions[str(year)] = old
+            summary["unchanged"].append(year)
+            continue
+
+        _write_partition(cache_dir, year, year_ids, year_values)
+        partitions[str(year)] = {"rows": len(rows), "columns": len(indicators), "digest": digest}
+        summary["written"].append(year)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "members": members,
+        "countries": countries.names,
+        "indicators": indicators,
+        # Indicators with data in the current archive, a subset of the append-only table
+        "present_indicators": present,
+        "years": partitions,
+    }
+    _write_manifest(cache_dir, manifest)
+
+    # Years that disappeared from the archive, only after the manifest stopped naming them
+    if previous:
+        for year in sorted(set(previous["years"]) - set(partitions)):
+            shutil.rmtree(os.path.join(cache_dir, year), ignore_errors=True)
+            summary["removed"].append(int(year))
+    return summary
+
+
+def read_manifest(cache_dir: str = INGEST_DIR) -> Optional[Dict]:
+    """Manifest of the cache, None if there is none or it has another format"""
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    return manifest if manifest.get("format_version") == FORMAT_VERSION else None
+
+
+def load_pivot(cache_dir: str = INGEST_DIR, years: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """
+    Pivoted dataset of the cache, laid out like pivot_table(index=["Economy", "Year"]).reset_index()
+
+    Only the partitions of the requested years (all by default) are read. Economy is a
+    categorical over the country table in name order, indicators are float32 columns in
+    name order.
+    """
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No ingested dataset in {cache_dir}, run python -m pipeline.ingest")
+
+    indicators = manifest["indicators"]
+    selected = sorted(int(year) for year in manifest["years"]) if years is None else sorted(set(years))
+    country_ids, year_column, values = [], [], []
+    for year in selected:
+        directory = os.path.join(cache_dir, str(year))
+        if str(year) not in manifest["years"]:
+            continue
+        year_ids = np.load(os.path.join(directory, "countries.npy"))
+        year_values = np.load(os.path.join(directory, "values.npy"))
+
+        # Kept partitions are narrower than the table if indicators were appended since
+        padded = np.full((len(year_ids), len(indicators)), np.nan, dtype=np.float32)
+        padded[:, :year_values.shape[1]] = year_values
+        country_ids.append(year_ids)
+        year_column.append(np.full(len(year_ids), year, dtype=YEAR_DTYPE))
+        values.append(padded)
+
+    country_ids = np.concatenate(country_ids) if country_ids else np.empty(0, dtype=COUNTRY_ID_DTYPE)
+    year_column = np.concatenate(year_column) if year_column else np.empty(0, dtype=YEAR_DTYPE)
+    values = np.concatenate(values) if values else np.empty((0, len(indicators)), dtype=np.float32)
+
+    # Name order for categories and columns, so sorting gives the order pivot_table gives
+    names = manifest["countries"]
+    name_order = np.argsort(np.array(names, dtype=object), kind="stable")
+    codes = np.empty(len(names), dtype=np.int64)
+    codes[name_order] = np.arange(len(names))
+    rows = np.lexsort((year_column, codes[country_ids]))
+    columns = sorted(manifest["present_indicators"])
+
+    pivot_df = pd.DataFrame(
+        values[rows][:, [indicators.index(indicator) for indicator in columns]],
+        columns=columns
+    )
+    pivot_df.insert(0, "Economy", pd.Categorical.from_codes(
+        codes[country_ids[rows]], dtype=pd.CategoricalDtype([names[i] for i in name_order])
+    ))
+    pivot_df.insert(1, "Year", year_column[rows])
+    return pivot_df
+
+
+def _partition_digest(countries: List[str], indicators: List[str], values: np.ndarray) -> str:
+    """Content hash of a year: its countries and the indicators it has values for, with the values"""
+    with_data = ~np.isnan(values).all(axis=0)
+    digest = hashlib.sha256(json.dumps(
+        [countries, [indicator for indicator, present in zip(indicators, with_data) if present]]
+    ).encode())
+    digest.update(np.ascontiguousarray(values[:, with_data]).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _write_partition(cache_dir: str, year: int, country_ids: np.ndarray, values: np.ndarray):
+    directory = os.path.join(cache_dir, str(year))
+    os.makedirs(directory, exist_ok=True)
+    for name, array in (("countries", country_ids.astype(COUNTRY_ID_DTYPE)), ("values", values)):
+        # Renamed over the previous file, readers of the old manifest never see half an array
+        tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(array))
+        os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+
+def _write_manifest(cache_dir: str, manifest: Dict):
+    tmp_path = os.path.join(cache_dir, f".{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, MANIFEST_FILE))
+
+
+def _partition_exists(cache_dir: str, year) -> bool:
+    directory = os.path.join(cache_dir, str(year))
+    return all(os.path.exists(os.path.join(directory, f"{name}.npy")) for name in ("countries", "values"))
+
+
+def _partitions_exist(cache_dir: str, manifest: Dict) -> bool:
+    return all(_partition_exists(cache_dir, year) for year in manifest["years"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest the raw ITU archive into a columnar cache")
+    parser.add_argument("archive", help='path of the raw dump, e.g. "../../Dataset ITU.zip"')
+    parser.add_argument("--output", default=INGEST_DIR, help="directory of the cache")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="CSV rows read at a time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = ingest(args.archive, args.output, args.chunk_rows)
+    print(f"Years written: {summary['written'] or 'none'}, unchanged: {len(summary['unchanged'])}, "
+          f"removed: {summary['removed'] or 'none'} ({time.perf_counter() - start:.2f}s)")
+    print(f"💾 Cache in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+# Reloading through the API is disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+
+@router.post("/reload")
+async def reload_models(
+    request: Request,
+    force: bool = False,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Load the artifact bundle version CURRENT points to and swap it in without downtime
+
+    Only reloads the worker that answers, the others pick the version up by watching
+    the bundle directory (BUNDLE_POLL_SECONDS).
+
+    - **force**: Reload even if the version is already served
+    - **X-Admin-Token**: Must match the ADMIN_TOKEN of the server
+    """
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="A valid X-Admin-Token header is required")
+
+    try:
+        return await request.app.state.registry.reload(force=force)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error when loading the bundle, the previous version is still served: {str(e)}")
@@ -1,7 +1,20 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
+
+from services.metrics import PROMETHEUS_MEDIA_TYPE, render
 
 router = APIRouter(prefix="/api", tags=["Health"])
 
 @router.get("/health")
-def health_check():
-    return {"status": "safe and sound!"}
+def health_check(request: Request):
+    registry = request.app.state.registry
+    return {
+        "status": "safe and sound!",
+        "artifact_version": registry.artifact_version,
+        "version": registry.version,
+    }
+
+@router.get("/metrics")
+def metrics(request: Request):
+    """Metrics of this worker process in the Prometheus text format"""
+    request.app.state.registry.update_metrics()
+    return Response(render(), media_type=PROMETHEUS_MEDIA_TYPE)
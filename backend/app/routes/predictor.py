@@ -1,8 +1,13 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from services.prediction_service import PredictionService
-from schemas.responses import CountryCluster, PredictionResponse, ClusterTrend, CountryTrendResponse
-from models.gcn_model import GCN
+from services.registry import LoadedModel, get_loaded_model, get_prediction_service, get_forecast_cache, get_forecast_range_cache, get_trends_cache, get_country_trends_cache, get_similar_cache, get_executor
+from services.executor import InferenceExecutor
+from services.serialization import COLUMNAR_MEDIA_TYPE, dump_model, dumps
+from services.http_cache import ResponseCache, cached_response, cache_headers, not_modified_response
+from schemas.responses import CountryCluster, PredictionResponse, ClusterTrend, CountryTrendResponse, BulkTrendResponse, TransitionsResponse, SimilarCountriesResponse, WhatIfResponse
+from schemas.requests import WhatIfRequest
 
 router = APIRouter(
     prefix="/predict",
@@ -10,34 +15,237 @@ router = APIRouter(
     responses={404: {"description": "Not allowed"}}
 )
 
-predictionService = PredictionService()
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MAX_SCENARIOS = 1000
+MAX_SIMILAR_COUNTRIES = 1000
+MAX_NEIGHBOURS = 100
+
+
+@router.get("/clusters")
+async def predict_clusters_range(
+    request: Request,
+    from_year: int = Query(2014, alias="from"),
+    to_year: int = Query(2028, alias="to"),
+    format: Optional[str] = None,
+    predictionService: PredictionService = Depends(get_prediction_service),
+    model: LoadedModel = Depends(get_loaded_model)
+):
+    """
+    Streams the clusters of every year in a range as NDJSON, one year per line
+
+    Years are sent as soon as they are ready: future years that are not forecast yet
+    follow one by one while they are rolled out, after the years that are.
+
+    - **from**: First year (default: 2014)
+    - **to**: Last year (default: 2028)
+    - **format**: "columnar" for parallel arrays, the first line is then the country table
+    """
+    if from_year < 2014 or to_year > 2028 or from_year > to_year:
+        raise HTTPException(status_code=400, detail="Years must be an ordered range within 2014-2028")
+    if format not in (None, "default", "columnar"):
+        raise HTTPException(status_code=400, detail="Format must be 'default' or 'columnar'")
+
+    columnar = format == "columnar"
+    if predictionService.ready_until(to_year) < to_year:
+        # The served version changes while the forecast lands, so the stream has no ETag
+        registry = request.app.state.registry
+        lines = (
+            dumps(payload) + b"\n"
+            async for payload in registry.iter_clusters_range(from_year, to_year, columnar, model)
+        )
+        return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE, headers={"Cache-Control": "no-cache"})
+
+    cache = model.response_cache
+    key = ("clusters-range", from_year, to_year, columnar)
+    not_modified = not_modified_response(request, cache, key)
+    if not_modified is not None:
+        return not_modified
+
+    lines = (
+        dumps(payload) + b"\n"
+        for payload in predictionService.iter_clusters_range(from_year, to_year, columnar=columnar)
+    )
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE, headers=cache_headers(cache, key))
+
 
 @router.get("/clusters/{year}")
-async def predict_clusters(year: int):
+async def predict_clusters(
+    year: int,
+    request: Request,
+    format: Optional[str] = None,
+    predictionService: PredictionService = Depends(get_prediction_service),
+    cache: ResponseCache = Depends(get_forecast_cache)
+):
     """
     Predicts the clusters of digital development for the current year
     
     - **year**: Year of prediction
+    - **format**: "columnar" for parallel arrays against a country table
+      (also selected by `Accept: application/vnd.digital-inequality.columnar+json`)
     """
     if year < 2014 or year > 2028:
         raise HTTPException(status_code=400, detail="Year must be in range 2014-2028")
+    if format not in (None, "default", "columnar"):
+        raise HTTPException(status_code=400, detail="Format must be 'default' or 'columnar'")
     
     try:
-        results = predictionService.predict_clusters(year)
-        return PredictionResponse(
-            year=year,
-            total_countries=results.total_countries,
-            clusters=results.clusters,
-            cluster_distribution=results.cluster_distribution
-        )
+        if _wants_columnar(request, format):
+            response = await cached_response(
+                request, cache, ("clusters", year, "columnar"),
+                lambda: dumps(predictionService.predict_clusters_columnar(year)),
+                media_type=COLUMNAR_MEDIA_TYPE
+            )
+        else:
+            response = await cached_response(
+                request, cache, ("clusters", year),
+                lambda: dump_model(predictionService.predict_clusters(year))
+            )
+
+        # The representation of the same URL depends on the Accept header
+        response.headers["Vary"] = "Accept"
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error when making a prediction: {str(e)}")
     
 
+@router.get("/transitions", response_model=TransitionsResponse)
+async def get_transitions(
+    request: Request,
+    from_year: int = Query(2014, alias="from"),
+    to_year: int = Query(2028, alias="to"),
+    predictionService: PredictionService = Depends(get_prediction_service),
+    cache: ResponseCache = Depends(get_forecast_range_cache)
+):
+    """
+    Cluster transition matrices of every pair of consecutive years, with Sankey nodes and links
+    
+    - **from**: First year (default: 2014)
+    - **to**: Last year (default: 2028)
+    """
+    if from_year < 2014 or to_year > 2028 or from_year > to_year:
+        raise HTTPException(status_code=400, detail="Years must be an ordered range within 2014-2028")
+
+    try:
+        return await cached_response(
+            request, cache, ("transitions", from_year, to_year),
+            lambda: dump_model(predictionService.get_transitions(from_year, to_year))
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+@router.get("/similar", response_model=SimilarCountriesResponse)
+async def get_similar_countries(
+    request: Request,
+    countries: List[str] = Query(...),
+    year: Optional[int] = None,
+    k: int = Query(10, ge=1, le=MAX_NEIGHBOURS),
+    same_year: bool = False,
+    predictionService: PredictionService = Depends(get_prediction_service),
+    cache: ResponseCache = Depends(get_similar_cache)
+):
+    """
+    Most similar countries of many countries at once, by their GCN embeddings
+    
+    - **countries**: Names of countries, repeat the parameter for several
+    - **year**: Year of the countries (default: every year, to follow the neighbours over time)
+    - **k**: Similar countries per country and year (default: 10)
+    - **same_year**: Only compare with countries in the same year
+    """
+    if len(countries) > MAX_SIMILAR_COUNTRIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SIMILAR_COUNTRIES} countries per request")
+    if year is not None and (year < 2014 or year > 2028):
+        raise HTTPException(status_code=400, detail="Year must be in range 2014-2028")
+
+    try:
+        return await cached_response(
+            request, cache, ("similar-bulk", tuple(countries), year, k, same_year),
+            lambda: dump_model(predictionService.get_similar_countries(countries, year, k, same_year))
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+@router.get("/similar/{country}", response_model=SimilarCountriesResponse)
+async def get_country_similar(
+    request: Request,
+    country: str,
+    year: Optional[int] = None,
+    k: int = Query(10, ge=1, le=MAX_NEIGHBOURS),
+    same_year: bool = False,
+    predictionService: PredictionService = Depends(get_prediction_service),
+    cache: ResponseCache = Depends(get_similar_cache)
+):
+    """
+    Most similar countries of one country, by their GCN embeddings
+    
+    - **country**: Name of country
+    - **year**: Year of the country (default: every year, to follow the neighbours over time)
+    - **k**: Similar countries per year (default: 10)
+    - **same_year**: Only compare with countries in the same year
+    """
+    if year is not None and (year < 2014 or year > 2028):
+        raise HTTPException(status_code=400, detail="Year must be in range 2014-2028")
+
+    def render():
+        result = predictionService.get_similar_countries([country], year, k, same_year)
+        return dump_model(result) if result.results else None
+
+    try:
+        # Its own key: the bulk response of the same country is a 200 even without data
+        result = await cached_response(request, cache, ("similar-country", country, year, k, same_year), render)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"There is no data about {country}..")
+    return result
+
+
+@router.get("/trends", response_model=BulkTrendResponse)
+async def get_bulk_trends(
+    request: Request,
+    countries: Optional[List[str]] = Query(None),
+    from_year: int = 2015,
+    to_year: int = 2025,
+    include_trends: bool = False,
+    predictionService: PredictionService = Depends(get_prediction_service),
+    cache: ResponseCache = Depends(get_trends_cache)
+):
+    """
+    Get trend statistics for many countries at once
+    
+    - **countries**: Names of countries, repeat the parameter for several (default: all)
+    - **from_year**: First year of the window (default: 2015)
+    - **to_year**: Last year of the window (default: 2025)
+    - **include_trends**: Also return the year-by-year cluster history
+    """
+    if from_year > to_year:
+        raise HTTPException(status_code=400, detail="from_year must not be greater than to_year")
+    
+    try:
+        key = (
+            "trends",
+            tuple(countries) if countries is not None else None,
+            from_year,
+            to_year,
+            include_trends
+        )
+        return await cached_response(
+            request, cache, key,
+            lambda: dump_model(predictionService.get_bulk_trends(countries, from_year, to_year, include_trends))
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
 @router.get("/trends/{country}", response_model=CountryTrendResponse)
 async def get_country_trends(
+    request: Request,
     country: str, 
-    years_back: int = 10
+    years_back: int = 10,
+    predictionService: PredictionService = Depends(get_prediction_service),
+    cache: ResponseCache = Depends(get_country_trends_cache)
 ):
     """
     Get clusters history for current country
@@ -45,11 +253,51 @@ async def get_country_trends(
     - **country**: Name of country
     - **years_back**: Years back for analyse (default: 5)
     """
-    try:
+    def render():
         result = predictionService.get_country_trends(country, years_back)
-        if result:
-            return result
-        else:
-            raise HTTPException(status_code=404, detail=f"There is no trends data about {country}..")
+        # The response echoes the requested spelling of the country
+        return dump_model(result) if result else None
+
+    try:
+        result = await cached_response(request, cache, ("trend", country, years_back), render)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")    
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"There is no trends data about {country}..")
+    return result
+
+
+@router.post("/what-if", response_model=WhatIfResponse)
+async def what_if(
+    body: WhatIfRequest,
+    predictionService: PredictionService = Depends(get_prediction_service),
+    executor: InferenceExecutor = Depends(get_executor)
+):
+    """
+    Clusters after changing indicators of countries, for a batch of scenarios
+    
+    - **scenarios**: (country, year, {indicator: new value}) of every scenario
+    - **all_neighbours**: Return every affected neighbour, not only those that change cluster
+    """
+    if len(body.scenarios) > MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SCENARIOS} scenarios per request")
+    
+    try:
+        result = await executor.run(
+            ("what-if", body.model_dump_json()),
+            lambda: predictionService.score_scenarios(body.scenarios, body.all_neighbours)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error when scoring the scenarios: {str(e)}")
+
+    return Response(dump_model(result), media_type="application/json")
+
+
+def _wants_columnar(request: Request, format: Optional[str]) -> bool:
+    """Columnar output is opt-in, through ?format=columnar or the Accept header"""
+    if format is not None:
+        return format == "columnar"
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "")
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import List, Dict
+
+class WhatIfScenario(BaseModel):
+    country: str
+    year: int
+    indicators: Dict[str, float]  # Indicator name -> new raw value
+
+class WhatIfRequest(BaseModel):
+    scenarios: List[WhatIfScenario]
+    all_neighbours: bool = False  # Also return neighbours whose cluster did not change
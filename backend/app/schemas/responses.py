@@ -1,6 +1,10 @@
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 
+# Part of every ETag: bump it with any change to what an endpoint returns for the same
+# artifact bundle (fields, ordering, computations), or clients keep revalidating old bodies
+RESPONSE_SCHEMA_VERSION = 1
+
 class CountryCluster(BaseModel):
     country: str
     cluster: int
@@ -23,6 +27,22 @@ class CountryTrendResponse(BaseModel):
     stability_score: float
     current_trend: str  # "improving", "declining", "stable" 
 
+class CountryTrendSummary(BaseModel):
+    country: str
+    first_year: int  # First year with data inside the window
+    last_year: int  # Last year with data inside the window
+    cluster_changes: int
+    stability_score: float
+    current_trend: str  # "improving", "declining", "stable"
+    trends: Optional[List[ClusterTrend]] = None  # Only when requested
+
+class BulkTrendResponse(BaseModel):
+    from_year: int
+    to_year: int
+    total_countries: int
+    countries: List[CountryTrendSummary]
+    missing: List[str]  # Requested countries without data in the window
+
 class ClusterIndicatorStats(BaseModel):
     indicator: str
     avg_value: float
@@ -40,4 +60,67 @@ class ClusterStatsResponse(BaseModel):
     stability: float  # Percentage of countries in cluster for 2+ years
     indicators: List[ClusterIndicatorStats]  # Stats for each indicator
     transitions: Dict[str, int]  # Transitions to/from other clusters
-    regional_distribution: Dict[str, int]  # Distribution across regions    
\ No newline at end of file
+    regional_distribution: Dict[str, int]  # Distribution across regions
+
+class ClusterTransitionMatrix(BaseModel):
+    from_year: int
+    to_year: int
+    matrix: List[List[int]]  # [cluster in from_year][cluster in to_year] -> countries
+
+class SankeyNode(BaseModel):
+    year: int
+    cluster: int
+    name: str
+    count: int  # Countries in the cluster that year
+
+class SankeyLink(BaseModel):
+    source: int  # Index into nodes
+    target: int  # Index into nodes
+    value: int  # Countries moving between the two
+
+class TransitionsResponse(BaseModel):
+    from_year: int
+    to_year: int
+    matrices: List[ClusterTransitionMatrix]  # One per consecutive year pair
+    nodes: List[SankeyNode]
+    links: List[SankeyLink]
+
+class WhatIfNodeResult(BaseModel):
+    country: str
+    year: int
+    cluster: int
+    previous_cluster: int
+    logits: List[float]
+
+class WhatIfScenarioResult(BaseModel):
+    country: str
+    year: int
+    cluster: int
+    previous_cluster: int
+    logits: List[float]
+    affected_nodes: int  # Nodes within two hops whose output was recomputed
+    neighbours: List[WhatIfNodeResult]  # Affected neighbours (only changed clusters unless requested)
+
+class WhatIfResponse(BaseModel):
+    total_scenarios: int
+    results: List[WhatIfScenarioResult]
+    missing: List[str]  # "Country (year)" of scenarios without a node
+
+class SimilarCountry(BaseModel):
+    country: str
+    year: int
+    cluster: int
+    similarity: float  # Cosine similarity of the GCN hidden-layer embeddings
+
+class SimilarCountriesResult(BaseModel):
+    country: str
+    year: int
+    cluster: int
+    similar: List[SimilarCountry]  # Most similar first
+
+class SimilarCountriesResponse(BaseModel):
+    k: int
+    same_year: bool
+    total_results: int
+    results: List[SimilarCountriesResult]  # One per (country, year) queried
+    missing: List[str]  # Requested countries without a node in the requested years
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from pipeline.build_bundle import BUNDLE_DIR, CURRENT_FILE, FORMAT_VERSION, MANIFEST_FILE, build_bundle
+from services.graph import PackedFeatures
+
+logger = logging.getLogger(__name__)
+
+
+def current_version(bundle_dir: str = BUNDLE_DIR) -> Optional[str]:
+    """Version bundle_dir/CURRENT points to, None before the first build"""
+    try:
+        with open(os.path.join(bundle_dir, CURRENT_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+class ArtifactBundle:
+    """
+    Read side of a bundle written by pipeline.build_bundle
+
+    Arrays are plain .npy files opened as copy-on-write memory maps: nothing is
+    unpickled, pages are read on first touch and shared with every other process
+    mapping the same file until someone writes to them.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+
+        if self.manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Bundle {directory} has format {self.manifest['format_version']}, expected {FORMAT_VERSION}"
+            )
+
+    @classmethod
+    def open(cls, bundle_dir: str = BUNDLE_DIR, build_missing: bool = True) -> "ArtifactBundle":
+        """
+        Bundle that bundle_dir/CURRENT points to
+
+        Without one (fresh checkout, mounted source tree) it is built from the
+        source files first, which only happens once per version.
+        """
+        current_path = os.path.join(bundle_dir, CURRENT_FILE)
+        if not os.path.exists(current_path):
+            if not build_missing:
+                raise FileNotFoundError(f"No artifact bundle in {bundle_dir}, run python -m pipeline.build_bundle")
+            logger.warning("⚠️ No artifact bundle in %s, building it from the source files...", bundle_dir)
+            return cls(build_bundle(bundle_dir))
+
+        with open(current_path) as f:
+            directory = os.path.join(bundle_dir, f.read().strip())
+        if build_missing and _format_version(directory) != FORMAT_VERSION:
+            logger.warning("⚠️ Bundle %s has an older format, rebuilding it from the source files...", directory)
+            return cls(build_bundle(bundle_dir))
+        return cls(directory)
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    @property
+    def countries(self) -> List[str]:
+        return self.manifest["countries"]
+
+    @property
+    def indicators(self) -> List[str]:
+        return self.manifest["indicators"]
+
+    @property
+    def node_offset(self) -> Dict[int, Tuple[int, int]]:
+        return {int(year): tuple(offsets) for year, offsets in self.manifest["node_offset"].items()}
+
+    def array(self, name: str) -> np.ndarray:
+        """Memory-mapped array, copy-on-write so in-place updates stay private to the process"""
+        entry = self.manifest["arrays"][name]
+        array = np.load(os.path.join(self.directory, entry["file"]), mmap_mode="c")
+        if list(array.shape) != entry["shape"] or str(array.dtype) != entry["dtype"]:
+            raise ValueError(f"Bundle array {name} does not match its manifest entry")
+        return array
+
+    def features(self, name: str) -> Union[np.ndarray, PackedFeatures]:
+        """Node feature matrix ("graph_x", "future_x"), packed if it was stored packed"""
+        if f"{name}_masks" in self.manifest["arrays"]:
+            return PackedFeatures(self.array(f"{name}_values"), self.array(f"{name}_masks"), self.array(f"{name}_index"))
+        return self.array(name)
+
+    def country_names(self, name: str) -> np.ndarray:
+        """Country names of an int id array, None where the id is -1"""
+        table = np.array(self.countries + [None], dtype=object)
+        return table[self.array(name)]
+
+    def state_dict(self, model: str = "model") -> Dict[str, np.ndarray]:
+        """Weights of a manifest model entry ("model" or "feature_predictor") in state_dict layout"""
+        return {
+            name.split("/", 1)[1]: self.array(name)
+            for name in self.manifest[model]["weights"]
+        }
+
+    @property
+    def has_feature_predictor(self) -> bool:
+        return self.manifest.get("feature_predictor") is not None
+
+
+def _format_version(directory: str) -> Optional[int]:
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return json.load(f).get("format_version")
@@ -0,0 +1,74 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+from services.country_table import CLUSTER_DTYPE, CountryTable
+
+
+class ClusterTable:
+    """
+    Dense year × country table of GCN cluster assignments and logits
+
+    Columns are the ids of the shared CountryTable, -1 marks a country without a node.
+    """
+
+    def __init__(self, years: List[int], countries: CountryTable, n_clusters: int):
+        self.years = np.asarray(sorted(years), dtype=np.int64)
+        self.countries = countries
+        self.n_clusters = n_clusters
+
+        self.year_index: Dict[int, int] = {int(y): i for i, y in enumerate(self.years)}
+
+        shape = (len(self.years), len(self.countries))
+        self.clusters = np.full(shape, -1, dtype=CLUSTER_DTYPE)
+        self.logits = np.full(shape + (n_clusters,), np.nan, dtype=np.float32)
+
+    def fill_year(self, year: int, country_ids: np.ndarray, logits: np.ndarray):
+        """Store the logits of one year's nodes, given in the same order as country_ids"""
+        row = self.year_index[year]
+        cols = np.asarray(country_ids, dtype=np.int64)
+        self.logits[row, cols] = logits
+        self.clusters[row, cols] = logits.argmax(axis=1)
+
+    def extended(self, years: List[int], countries: Optional[CountryTable] = None) -> "ClusterTable":
+        """
+        Copy of the table with new years and the countries of a grown table, cells are kept
+
+        This table is left as it is, it may still be serving requests.
+        """
+        grown = ClusterTable(sorted(set(self.years.tolist()) | set(years)), countries or self.countries, self.n_clusters)
+        rows = np.array([grown.year_index[int(year)] for year in self.years], dtype=np.int64)
+        grown.clusters[rows, :self.clusters.shape[1]] = self.clusters
+        grown.logits[rows, :self.logits.shape[1]] = self.logits
+        return grown
+
+    def clear_year(self, year: int):
+        """Forget every assignment of a year"""
+        row = self.year_index[year]
+        self.clusters[row] = -1
+        self.logits[row] = np.nan
+
+    def find_country(self, country: str) -> Optional[int]:
+        """Case-insensitive country id lookup"""
+        return self.countries.find(country)
+
+    def has_year(self, year: int) -> bool:
+        return year in self.year_index
+
+    def year_slice(self, year: int):
+        """Country ids and cluster ids of all countries present in a year"""
+        row = self.year_index.get(year)
+        if row is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        clusters = self.clusters[row]
+        country_ids = np.flatnonzero(clusters >= 0)
+        return country_ids, clusters[country_ids]
+
+    def lookup(self, country_id: int, year: int) -> Optional[int]:
+        """Cluster of one country in one year, None if the node does not exist"""
+        row = self.year_index.get(year)
+        if row is None:
+            return None
+
+        cluster = self.clusters[row, country_id]
+        return int(cluster) if cluster >= 0 else None
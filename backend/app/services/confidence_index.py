@@ -0,0 +1,77 @@
+import numpy as np
+
+from services.cluster_table import ClusterTable
+
+
+class ConfidenceIndex:
+    """
+    Softmax confidence and logit margins of the cluster table, ranked per (year, cluster)
+
+    The margin of a node is the gap between the logit of its cluster and the next highest
+    one, so the countries with the smallest margins are those on the edge of a transition.
+    The k most confident and the k least settled countries of every year and cluster are
+    selected at once with argpartition, a request only reads its row.
+    """
+
+    def __init__(self, table: ClusterTable, k: int = 5):
+        self.table = table
+        clusters = table.clusters
+        present = clusters >= 0
+        n_clusters = table.n_clusters
+
+        # Absent cells hold NaN logits, zeros keep them out of the reductions
+        logits = np.where(present[..., None], table.logits, 0).astype(np.float32)
+        exp = np.exp(logits - logits.max(axis=2, keepdims=True))
+        self.probabilities = exp / exp.sum(axis=2, keepdims=True)
+        self.confidence = np.where(present, self.probabilities.max(axis=2), np.nan)
+
+        # Ranked by the log-odds of the assigned cluster, log(p / (1 - p)), which keeps
+        # ordering confident nodes whose probability rounds to 1
+        others = np.where(np.arange(n_clusters) == clusters[..., None], -np.inf, logits)
+        log_odds = logits.max(axis=2) - np.logaddexp.reduce(others, axis=2)
+
+        if n_clusters > 1:
+            top_two = np.partition(logits, n_clusters - 2, axis=2)[..., n_clusters - 2:]
+            self.margins = np.where(present, top_two[..., 1] - top_two[..., 0], np.nan)
+        else:
+            self.margins = np.where(present, np.inf, np.nan)
+
+        # [year row, cluster, rank] -> country id, -1 past the size of the cluster
+        shape = clusters.shape[:1] + (n_clusters, min(k, clusters.shape[1]))
+        self.top = np.full(shape, -1, dtype=np.int64)
+        self.edge = np.full(shape, -1, dtype=np.int64)
+        for cluster in range(n_clusters):
+            member = clusters == cluster
+            self.top[:, cluster] = _largest(np.where(member, log_odds, -np.inf), k)
+            self.edge[:, cluster] = _largest(np.where(member, -self.margins, -np.inf), k)
+
+    def top_countries(self, year: int, cluster: int) -> np.ndarray:
+        """Country ids of the most confidently assigned members, most confident first"""
+        return self._ranked(self.top, year, cluster)
+
+    def edge_countries(self, year: int, cluster: int) -> np.ndarray:
+        """Country ids of the members closest to another cluster, smallest margin first"""
+        return self._ranked(self.edge, year, cluster)
+
+    def _ranked(self, ranking: np.ndarray, year: int, cluster: int) -> np.ndarray:
+        row = self.table.year_index.get(year)
+        if row is None or not 0 <= cluster < self.table.n_clusters:
+            return np.empty(0, dtype=np.int64)
+        ids = ranking[row, cluster]
+        return ids[ids >= 0]
+
+
+def _largest(scores: np.ndarray, k: int) -> np.ndarray:
+    """Columns of the k largest finite scores of every row, in decreasing order (ties by column), -1 padded"""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+
+    columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    selected = np.take_along_axis(scores, columns, axis=1)
+
+    # Only k values per row are left to order
+    order = np.lexsort((columns, -selected), axis=1)
+    columns = np.take_along_axis(columns, order, axis=1)
+    selected = np.take_along_axis(selected, order, axis=1)
+    return np.where(np.isfinite(selected), columns, -1)
@@ -0,0 +1,57 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Country ids and years fit 16 bits, cluster ids 8 (-1 marks a missing value in all three)
+COUNTRY_ID_DTYPE = np.int16
+YEAR_DTYPE = np.int16
+CLUSTER_DTYPE = np.int8
+
+
+def normalize_country(country: str) -> str:
+    """Key used for case-insensitive country lookups"""
+    return country.strip().casefold()
+
+
+class CountryTable:
+    """
+    Interned country names
+
+    Every country is a small int id into one list of names shared by the node
+    indexes and the cluster table. Arrays hold ids, joins compare ids, and names
+    are only looked up to build responses.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = list(names)
+        self._ids: Dict[str, int] = {normalize_country(name): i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, country_id: int) -> str:
+        return self.names[country_id]
+
+    def find(self, country: str) -> Optional[int]:
+        """Case-insensitive id lookup, None for an unknown country"""
+        return self._ids.get(normalize_country(country))
+
+    def ids(self, countries: Sequence[str]) -> np.ndarray:
+        """Ids of many names, -1 for the unknown ones"""
+        return np.fromiter(
+            (self._ids.get(normalize_country(country), -1) for country in countries),
+            dtype=COUNTRY_ID_DTYPE,
+            count=len(countries),
+        )
+
+    def intern(self, countries: Sequence[str]) -> np.ndarray:
+        """Ids of many names, new names are added to the end of the table"""
+        for country in countries:
+            key = normalize_country(country)
+            if key not in self._ids:
+                self._ids[key] = len(self.names)
+                self.names.append(country)
+        return self.ids(countries)
+
+    def names_of(self, country_ids: Iterable[int]) -> List[str]:
+        return [self.names[country_id] for country_id in country_ids]
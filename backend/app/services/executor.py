@@ -0,0 +1,45 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+from services.metrics import COALESCED
+
+# Requests run side by side on the executor threads. Forecasts (the only torch code) get
+# few threads per op instead of all of them fighting over the cores
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", 1))
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for the synchronous numpy/pandas work of the endpoints
+
+    Keeps the event loop free while responses are computed. Calls with the same key
+    that overlap in time are coalesced (single flight): only the first one runs, the
+    others await its result.
+    """
+
+    def __init__(self, max_workers: int = INFERENCE_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Result of fn() computed on the pool, shared with concurrent calls of the same key"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._pool, fn)
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            COALESCED.inc()
+
+        # A waiter that goes away (client disconnect) must not cancel the others' result
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
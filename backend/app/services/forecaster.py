@@ -0,0 +1,140 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import torch
+
+from models.feature_predictor import FeaturePredictor
+from pipeline.graph_builder import knn_edges
+from services.executor import TORCH_NUM_THREADS
+from services.metrics import span
+from services.propagation import GCNWeights, gcn_logits
+
+# Only imported when a FeaturePredictor is loaded, the serving path itself runs without torch
+torch.set_num_threads(TORCH_NUM_THREADS)
+
+# Similarity graph of a forecast year, as in the notebook: 5 nearest countries above 0.3 cosine
+FORECAST_NEIGHBOURS = 5
+MIN_SIMILARITY = 0.3
+
+
+@dataclass
+class ForecastStep:
+    """Rolled-out features of every country for one future year and their GCN logits"""
+    year: int
+    x: np.ndarray
+    edge_index: np.ndarray
+    logits: np.ndarray
+    # Country of every row, ids into the service's CountryTable
+    country_ids: np.ndarray
+
+
+class Forecaster:
+    """
+    Autoregressive rollout of the FeaturePredictor (DigitalInequalityForecaster of the notebook)
+
+    Every country starts from its latest node at or before base_year. One step is a single
+    batched FeaturePredictor pass over all countries on the subgraph induced by those nodes;
+    the predicted features of a year are then linked by cosine kNN and classified by the GCN.
+    Steps are cached, so a longer horizon continues from the last computed year instead of
+    starting over, and they run on a background thread.
+    """
+
+    def __init__(
+        self,
+        predictor: FeaturePredictor,
+        gcn_weights: GCNWeights,
+        x: np.ndarray,
+        edge_index: np.ndarray,
+        node_country_ids: np.ndarray,
+        node_years: np.ndarray,
+        base_year: int
+    ):
+        self.predictor = predictor
+        self.gcn_weights = gcn_weights
+        self.base_year = base_year
+
+        # Latest node of every country up to the base year
+        candidates = np.flatnonzero((node_years <= base_year) & (node_years >= 0) & (node_country_ids >= 0))
+        order = candidates[np.lexsort((node_years[candidates], node_country_ids[candidates]))]
+        last_of_country = np.append(node_country_ids[order][1:] != node_country_ids[order][:-1], True)
+        nodes = order[last_of_country]
+
+        # Ids into the service's CountryTable, the order of the forecast graph's nodes
+        self.country_ids: np.ndarray = node_country_ids[nodes]
+        self._x0 = np.asarray(x[nodes], dtype=np.float32)
+        self._edge_index = _induced_subgraph(edge_index, nodes, x.shape[0])
+
+        self._steps: List[ForecastStep] = []
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="forecast")
+
+    def forecast(self, horizon: int) -> "Future[List[ForecastStep]]":
+        """
+        Steps 1..horizon years after base_year, computed in the background on first use
+
+        Calls for an already computed horizon return a finished future, concurrent
+        calls for the same horizon share one computation.
+        """
+        with self._lock:
+            if horizon <= len(self._steps):
+                done: Future = Future()
+                done.set_result(self._steps[:horizon])
+                return done
+
+            future = self._pending.get(horizon)
+            if future is None:
+                future = self._executor.submit(self._roll_out, horizon)
+                self._pending[horizon] = future
+            return future
+
+    def _roll_out(self, horizon: int) -> List[ForecastStep]:
+        with self._lock:
+            steps = list(self._steps)
+
+        x = torch.from_numpy(steps[-1].x if steps else self._x0)
+        with torch.no_grad():
+            for step in range(len(steps) + 1, horizon + 1):
+                with span("forecast.step"):
+                    x = self.predictor(x, self._edge_index)
+                    features = x.numpy()
+                    edge_index = similarity_edges(features)
+                    logits = gcn_logits(self.gcn_weights, features, edge_index)
+                steps.append(ForecastStep(self.base_year + step, features, edge_index, logits, self.country_ids))
+
+        with self._lock:
+            if len(steps) > len(self._steps):
+                self._steps = steps
+            self._pending.pop(horizon, None)
+        return steps[:horizon]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def similarity_edges(features: np.ndarray) -> np.ndarray:
+    """Undirected cosine kNN graph of one year, a chain if no pair is similar enough"""
+    n_nodes = len(features)
+    edges = knn_edges(features, {None: (0, n_nodes)}, min(FORECAST_NEIGHBOURS, n_nodes - 1))
+
+    normalized = features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+    similarity = np.einsum("ij,ij->i", normalized[edges[0]], normalized[edges[1]])
+    edges = edges[:, similarity > MIN_SIMILARITY]
+
+    if edges.shape[1] == 0:
+        edges = np.stack([np.arange(n_nodes - 1), np.arange(1, n_nodes)])
+
+    return np.unique(np.concatenate([edges, edges[::-1]], axis=1), axis=1).astype(np.int64)
+
+
+def _induced_subgraph(edge_index: np.ndarray, nodes: np.ndarray, num_nodes: int) -> torch.Tensor:
+    """Edges between the given nodes only, relabeled to their position in nodes"""
+    relabel = np.full(num_nodes, -1, dtype=np.int64)
+    relabel[nodes] = np.arange(len(nodes))
+
+    mapped = relabel[edge_index]
+    keep = (mapped >= 0).all(axis=0)
+    return torch.from_numpy(mapped[:, keep])
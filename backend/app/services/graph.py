@@ -0,0 +1,108 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+
+class PackedFeatures:
+    """
+    Node features [indicators | has-data masks | backwardness index] with bit-packed masks
+
+    The masks are half of the columns but only 0 or 1, packed they take one bit per
+    value instead of four bytes. Rows are unpacked when they are read: x[nodes] gives
+    dense float32 rows, x[nodes, :n_features] reads the indicator columns without
+    unpacking anything and np.asarray(x) gives the dense matrix, so it stands in for
+    the float32 array wherever rows or the whole matrix are read.
+    """
+
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, values: np.ndarray, masks: np.ndarray, index: np.ndarray):
+        self.values = values  # [nodes, n_features] float32
+        self.masks = masks  # [nodes, ceil(n_features / 8)] uint8, little bit order
+        self.index = index  # [nodes] float32
+
+    @classmethod
+    def pack(cls, x: np.ndarray, n_features: int) -> Optional["PackedFeatures"]:
+        """Packed copy of a dense feature matrix, None if its layout or masks do not allow it"""
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != 2 * n_features + 1:
+            return None
+        masks = x[:, n_features:2 * n_features]
+        if not np.isin(masks, (0.0, 1.0)).all():
+            return None
+        return cls(
+            np.ascontiguousarray(x[:, :n_features]),
+            np.packbits(masks.astype(np.uint8), axis=1, bitorder="little"),
+            np.ascontiguousarray(x[:, 2 * n_features])
+        )
+
+    @property
+    def n_features(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape[0], 2 * self.n_features + 1
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.masks.nbytes + self.index.nbytes
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def rows(self, nodes) -> np.ndarray:
+        """Dense float32 rows of the given nodes (an int array or a slice)"""
+        values = self.values[nodes]
+        out = np.empty((values.shape[0], 2 * self.n_features + 1), dtype=np.float32)
+        out[:, :self.n_features] = values
+        out[:, self.n_features:2 * self.n_features] = np.unpackbits(
+            self.masks[nodes], axis=1, count=self.n_features, bitorder="little"
+        )
+        out[:, 2 * self.n_features] = self.index[nodes]
+        return out
+
+    def __getitem__(self, key):
+        rows, columns = key if isinstance(key, tuple) else (key, None)
+        if np.ndim(rows) == 0 and not isinstance(rows, slice):
+            return self[np.array([rows]), columns][0]
+
+        # Indicator columns only, straight from the unpacked part
+        if isinstance(columns, slice):
+            start, stop, step = columns.indices(self.shape[1])
+            if step == 1 and stop <= self.n_features:
+                return np.asarray(self.values[rows, start:stop])
+
+        dense = self.rows(rows)
+        return dense if columns is None else dense[:, columns]
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.rows(slice(None))
+        return dense if dtype is None else dense.astype(dtype, copy=False)
+
+    def append(self, x_new: np.ndarray) -> Union["PackedFeatures", np.ndarray]:
+        """Features with rows added, dense again if the new rows can not be packed"""
+        packed = PackedFeatures.pack(x_new, self.n_features)
+        if packed is None:
+            return np.concatenate([np.asarray(self), np.asarray(x_new, dtype=np.float32)])
+        return PackedFeatures(
+            np.concatenate([self.values, packed.values]),
+            np.concatenate([self.masks, packed.masks]),
+            np.concatenate([self.index, packed.index])
+        )
+
+
+def append_rows(x: Union[np.ndarray, PackedFeatures], x_new: np.ndarray) -> Union[np.ndarray, PackedFeatures]:
+    """Node features with new rows at the end, packed ones stay packed"""
+    if isinstance(x, PackedFeatures):
+        return x.append(x_new)
+    return np.concatenate([x, x_new])
+
+
+@dataclass
+class Graph:
+    """Node features and edges of one graph as plain arrays, what the service keeps of a PyG Data"""
+    x: Union[np.ndarray, PackedFeatures]
+    edge_index: np.ndarray
+    node_offset: Dict[int, Tuple[int, int]] = field(default_factory=dict)
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from fastapi import Request, Response
+
+from schemas.responses import RESPONSE_SCHEMA_VERSION
+from services.executor import InferenceExecutor
+from services.metrics import RESPONSE_CACHE, span
+
+# Responses only change with the served graph or the response schema, both change the ETag
+CACHE_CONTROL = os.environ.get("CACHE_CONTROL", "public, max-age=86400, stale-while-revalidate=604800")
+
+
+class ResponseCache:
+    """
+    Pre-rendered response bodies of one artifact version
+
+    ETags are derived from the response schema version, the served version and the
+    request key only, so a matching If-None-Match is answered without rendering
+    anything. They are weak: GZipMiddleware sends the same body compressed or not.
+    Misses are rendered on the executor, if there is one.
+    """
+
+    def __init__(self, version: str, executor: Optional[InferenceExecutor] = None, max_entries: int = 2048):
+        self.version = version
+        self.executor = executor
+        self.max_entries = max_entries
+        self._bodies: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def etag(self, key: Hashable) -> str:
+        digest = hashlib.sha256(f"{RESPONSE_SCHEMA_VERSION}:{self.version}:{key!r}".encode()).hexdigest()[:32]
+        return f'W/"{digest}"'
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        body = self._lookup(key)
+        RESPONSE_CACHE.inc("hit" if body is not None else "miss")
+        return body
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """Cached body of a key, rendered on first use. Renders returning None are not cached"""
+        body = self.get(key)
+        if body is not None:
+            return body
+        return self._render(key, render)
+
+    async def get_or_render_async(self, key: Hashable, render: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """
+        get_or_render without blocking the event loop
+
+        Hits are answered directly, misses render on the executor and concurrent
+        misses of the same key wait for one render.
+        """
+        body = self.get(key)
+        if body is not None:
+            return body
+        if self.executor is None:
+            return self._render(key, render)
+
+        return await self.executor.run((self.version, key), lambda: self._render(key, render))
+
+    def prerender(self, key: Hashable, render: Callable[[], Optional[bytes]]):
+        """Render a key before anyone asks for it, without counting a lookup"""
+        self._render(key, render)
+
+    def _lookup(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def _render(self, key: Hashable, render: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """Render and store a missed key, unless another call stored it in the meantime"""
+        body = self._lookup(key)
+        if body is not None:
+            return body
+
+        # Keys start with the kind of response ("clusters", "trend", ...)
+        with span(f"render.{key[0] if isinstance(key, tuple) else key}"):
+            body = render()
+        if body is None:
+            return None
+
+        with self._lock:
+            self._bodies[key] = body
+            if len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        return body
+
+
+async def cached_response(
+    request: Request,
+    cache: ResponseCache,
+    key: Hashable,
+    render: Callable[[], Optional[bytes]],
+    media_type: str = "application/json"
+) -> Optional[Response]:
+    """
+    Conditional response for a cache key: 304 if the client's ETag matches,
+    otherwise the (possibly pre-rendered) body. None if render found nothing.
+    """
+    not_modified = not_modified_response(request, cache, key)
+    if not_modified is not None:
+        return not_modified
+
+    body = await cache.get_or_render_async(key, render)
+    if body is None:
+        return None
+    return Response(body, media_type=media_type, headers=cache_headers(cache, key))
+
+
+def not_modified_response(request: Request, cache: ResponseCache, key: Hashable) -> Optional[Response]:
+    """304 response if the client already has the current version of a key"""
+    if _etag_matches(request.headers.get("if-none-match"), cache.etag(key)):
+        RESPONSE_CACHE.inc("not_modified")
+        return Response(status_code=304, headers=cache_headers(cache, key))
+    return None
+
+
+def cache_headers(cache: ResponseCache, key: Hashable) -> dict:
+    return {"ETag": cache.etag(key), "Cache-Control": CACHE_CONTROL}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, the W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
@@ -0,0 +1,85 @@
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+from services.propagation import GCNWeights, PropagationEngine
+
+
+class IncrementalGCN:
+    """
+    Cached activations of the 2-layer GCN over a growing graph
+
+    GCNConv normalizes every edge with 1/sqrt(deg(source) * deg(target)), so appending
+    nodes and edges only changes the outputs of nodes within two hops of the new edges.
+    append() recomputes exactly those rows from the cached first-layer activations.
+    """
+
+    def __init__(self, weights: GCNWeights, x: np.ndarray, edge_index: np.ndarray,
+                 engine: Optional[PropagationEngine] = None):
+        self.weights = weights
+        # GCNConv adds one self-loop per node itself, existing ones are dropped
+        edge_index = np.asarray(edge_index)
+        self.edge_index = edge_index[:, edge_index[0] != edge_index[1]]
+        self.deg = 1.0 + np.bincount(self.edge_index[1], minlength=x.shape[0]).astype(np.float32)
+
+        if engine is None:
+            engine = PropagationEngine(weights, x, edge_index)
+        self.xw1 = np.asarray(x, dtype=np.float32) @ weights.w1.T
+        self.h1 = engine.hidden()
+        self.xw2 = self.h1 @ weights.w2.T
+        self.out = engine.logits(hidden=self.h1)
+
+    @property
+    def num_nodes(self) -> int:
+        return self.xw1.shape[0]
+
+    def append(self, x_new: np.ndarray, edge_index_new: np.ndarray) -> np.ndarray:
+        """
+        Add nodes (numbered after the existing ones) and edges, update the affected outputs
+
+        edge_index_new may connect new nodes with each other and with existing nodes.
+        Returns the ids of all nodes whose output was recomputed. The cached arrays are
+        replaced, not written to, so a copy.copy() taken before still holds the old outputs.
+        """
+        n_old, n_new = self.num_nodes, x_new.shape[0]
+        new_edges = edge_index_new[:, edge_index_new[0] != edge_index_new[1]]
+        new_nodes = np.arange(n_old, n_old + n_new)
+
+        self.edge_index = np.concatenate([self.edge_index, new_edges], axis=1)
+        self.deg = np.concatenate([self.deg, np.ones(n_new, dtype=np.float32)])
+        self.deg += np.bincount(new_edges[1], minlength=len(self.deg)).astype(np.float32)
+
+        self.xw1 = np.concatenate([self.xw1, np.asarray(x_new, dtype=np.float32) @ self.weights.w1.T])
+        self.h1 = np.concatenate([self.h1, np.zeros((n_new, self.h1.shape[1]), dtype=np.float32)])
+        self.xw2 = np.concatenate([self.xw2, np.zeros((n_new, self.xw2.shape[1]), dtype=np.float32)])
+        self.out = np.concatenate([self.out, np.zeros((n_new, self.out.shape[1]), dtype=np.float32)])
+
+        # Nodes whose degree changed, every message they send or receive is renormalized
+        changed = np.unique(np.concatenate([new_edges[1], new_nodes]))
+
+        layer1 = np.union1d(changed, self._targets_of(changed))
+        self.h1[layer1] = np.maximum(self._propagate(self.xw1, layer1) + self.weights.b1, 0)
+        self.xw2[layer1] = self.h1[layer1] @ self.weights.w2.T
+
+        layer2 = np.union1d(layer1, self._targets_of(layer1))
+        self.out[layer2] = self._propagate(self.xw2, layer2) + self.weights.b2
+
+        return layer2
+
+    def _targets_of(self, nodes: np.ndarray) -> np.ndarray:
+        """Nodes receiving a message from any of the given nodes"""
+        mask = np.isin(self.edge_index[0], nodes)
+        return np.unique(self.edge_index[1, mask])
+
+    def _propagate(self, h: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Rows of D^-1/2 (A + I) D^-1/2 h for sorted target nodes only"""
+        mask = np.isin(self.edge_index[1], targets)
+        row, col = self.edge_index[:, mask]
+        norm = 1.0 / np.sqrt(self.deg[row] * self.deg[col])
+
+        # Rows of Â restricted to the targets, duplicate edges are summed
+        rows = sp.csr_matrix(
+            (norm, (np.searchsorted(targets, col), row)), shape=(len(targets), h.shape[0]), dtype=np.float32
+        )
+        return h[targets] / self.deg[targets, None] + rows @ h  # self-loops + messages
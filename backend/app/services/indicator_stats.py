@@ -0,0 +1,88 @@
+import numpy as np
+from typing import List, Tuple
+
+
+class IndicatorStats:
+    """
+    Mean/min/max/std/count of every indicator for every (year, cluster)
+
+    All statistics come from one segment reduction over the node features sorted by
+    (year, cluster), so a cluster-stats request only has to pick the top indicators.
+    """
+
+    def __init__(
+        self,
+        features: np.ndarray,
+        year_rows: np.ndarray,
+        clusters: np.ndarray,
+        n_years: int,
+        n_clusters: int,
+        feature_names: List[str]
+    ):
+        self.feature_names = list(feature_names)
+        self.n_clusters = n_clusters
+
+        n_features = len(self.feature_names)
+        shape = (n_years * n_clusters, n_features)
+        self.count = np.zeros(n_years * n_clusters, dtype=np.int64)
+        self.mean = np.full(shape, np.nan, dtype=np.float32)
+        self.min = np.full(shape, np.nan, dtype=np.float32)
+        self.max = np.full(shape, np.nan, dtype=np.float32)
+        self.std = np.full(shape, np.nan, dtype=np.float32)
+
+        if len(features):
+            self._reduce(np.asarray(features, dtype=np.float64), year_rows * n_clusters + clusters)
+
+        self.count = self.count.reshape(n_years, n_clusters)
+        self.mean = self.mean.reshape(n_years, n_clusters, n_features)
+        self.min = self.min.reshape(n_years, n_clusters, n_features)
+        self.max = self.max.reshape(n_years, n_clusters, n_features)
+        self.std = self.std.reshape(n_years, n_clusters, n_features)
+
+    def _reduce(self, features: np.ndarray, segments: np.ndarray):
+        order = np.argsort(segments, kind="stable")
+        segments = segments[order]
+        features = features[order]
+
+        starts = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+        ids = segments[starts]
+        counts = np.diff(np.r_[starts, len(segments)])
+
+        mean = np.add.reduceat(features, starts, axis=0) / counts[:, None]
+        deviations = features - np.repeat(mean, counts, axis=0)
+        variance = np.add.reduceat(deviations * deviations, starts, axis=0) / counts[:, None]
+
+        self.count[ids] = counts
+        self.mean[ids] = mean
+        self.min[ids] = np.minimum.reduceat(features, starts, axis=0)
+        self.max[ids] = np.maximum.reduceat(features, starts, axis=0)
+        self.std[ids] = np.sqrt(variance)
+
+    def top_indicators(
+        self,
+        year_row: int,
+        cluster: int,
+        k: int = 10,
+        min_std: float = 0.001
+    ) -> List[Tuple[str, float, float, float, float]]:
+        """
+        The k indicators with the highest spread inside a cluster
+
+        Returns (indicator, mean, min, max, std) tuples sorted by std, indicators that are
+        (almost) constant inside the cluster are skipped.
+        """
+        if self.count[year_row, cluster] == 0:
+            return []
+
+        std = self.std[year_row, cluster]
+        candidates = np.flatnonzero(std >= min_std)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-std[candidates], k - 1)[:k]]
+        # Highest std first, ties in feature order
+        candidates = candidates[np.lexsort((candidates, -std[candidates]))]
+
+        mean, low, high = self.mean[year_row, cluster], self.min[year_row, cluster], self.max[year_row, cluster]
+        return [
+            (self.feature_names[i], float(mean[i]), float(low[i]), float(high[i]), float(std[i]))
+            for i in candidates.tolist()
+        ]
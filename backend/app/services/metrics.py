@@ -0,0 +1,202 @@
+"""
+In-process metrics in the Prometheus text format
+
+Counters, gauges and histograms with labels, kept per worker process: every uvicorn
+worker exposes its own values and Prometheus sums them over the scraped instances.
+span() times one stage of a hot path into a histogram, which costs about a
+microsecond, so the instrumentation stays on in production.
+"""
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# The response adds "; charset=utf-8" to text/ media types
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4"
+PREFIX = "digital_inequality"
+
+# Seconds, from a cached response (~100us) to a cold start of the model (~seconds)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_METRICS: List["_Metric"] = []
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = f"{PREFIX}_{name}"
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _METRICS.append(self)
+
+        # Unlabelled counters and gauges are exported from the start, at 0
+        if not self.labels and self.kind in ("counter", "gauge"):
+            self._values[()] = 0.0
+
+    def _key(self, label_values: Sequence) -> Tuple[str, ...]:
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} expects the labels {self.labels}")
+        return tuple(str(value) for value in label_values)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterator[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, tuple(zip(self.labels, key)), value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1.0):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values):
+        key = self._key(label_values)
+        # Counts per bucket (+Inf last), then sum; made cumulative when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self) -> Iterator[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in values:
+            labels = tuple(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, state[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+STAGE_SECONDS = Histogram("stage_seconds", "Duration of the stages of model loading and request handling", ["stage"])
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status", ["method", "route", "status"])
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request duration until the last body byte",
+                                 ["method", "route"])
+RESPONSE_CACHE = Counter("response_cache_total", "Response cache lookups: hit, miss or not_modified (304)", ["result"])
+COALESCED = Counter("inference_coalesced_total", "Executor calls that joined an identical call already running")
+MODEL_INFO = Gauge("model_info", "Loaded artifact bundle, always 1", ["artifact_version", "feature_predictor"])
+MODEL_RELOADS = Counter("model_reloads_total", "Hot reload attempts: reloaded, unchanged or failed", ["result"])
+DATA_REVISION = Gauge("data_revision", "In-place graph updates (appended nodes, forecasts) since the bundle was loaded")
+GRAPH_NODES = Gauge("graph_nodes", "Nodes of the served graphs", ["graph"])
+GRAPH_EDGES = Gauge("graph_edges", "Edges of the served graphs", ["graph"])
+FORECAST_YEARS = Gauge("forecast_years", "Future years rolled out by the FeaturePredictor so far")
+
+
+class span:
+    """
+    Context manager timing a stage into the stage_seconds histogram
+
+    Also logs the duration at DEBUG level. A class rather than a @contextmanager
+    generator, which would cost several times as much per span.
+    """
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("stage=%s duration_ms=%.3f", self.stage, elapsed * 1000)
+
+
+def render() -> bytes:
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _METRICS:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{label}="{_escape(label_value)}"' for label, label_value in labels)
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting and timing requests per route template
+
+    Routes are labelled by their template (/predict/clusters/{year}), not the
+    raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], template, status)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], template)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
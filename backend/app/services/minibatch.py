@@ -0,0 +1,175 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from services.propagation import GCNWeights, normalized_adjacency
+
+
+class MiniBatchGCN:
+    """
+    Inference of the 2-layer GCN for chosen nodes, in batches of bounded size
+
+    The output of a node only depends on its 2-hop in-neighbourhood, so every batch of
+    target nodes gathers the Â rows of the targets, the rows of their neighbours and the
+    features of the nodes those reach, then runs both layers on that subgraph only.
+    Degrees come from the whole graph, so with full neighbourhoods (fanouts=None) the
+    logits are those of full-batch inference. With fanouts=(f1, f2) at most f1 neighbours
+    of every target and f2 of every first-hop node are sampled (GraphSAGE style), their
+    weights scaled up to keep the sums unbiased, which caps the subgraph of a batch at
+    batch_size * (1 + f1) * (1 + f2) nodes however dense the graph is.
+
+    Memory is the CSR structure of the graph (12 bytes per edge) plus one batch's
+    subgraph, x is only gathered row-wise and may be a memory-mapped array. With workers
+    the batches run on a process pool, which inherits the graph when processes fork.
+    """
+
+    def __init__(
+        self,
+        weights: GCNWeights,
+        x: np.ndarray,
+        edge_index: np.ndarray,
+        batch_size: int = 1024,
+        fanouts: Optional[Tuple[int, int]] = None,
+        workers: int = 0,
+        seed: int = 0
+    ):
+        self.weights = weights
+        self.x = x
+        self.adjacency = normalized_adjacency(np.asarray(edge_index), x.shape[0])
+        self.batch_size = batch_size
+        self.fanouts = fanouts
+        self.seed = seed
+
+        self._pool = None
+        if workers > 0:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.weights, self.x, self.adjacency, self.fanouts, self.seed)
+            )
+            self._workers = workers
+
+    def logits(self, nodes: Sequence[int]) -> np.ndarray:
+        """GCN logits of the given nodes, in their order"""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        out = np.empty((len(nodes), self.weights.b2.shape[0]), dtype=np.float32)
+        for positions, block in self.iter_batches(nodes):
+            out[positions] = block
+        return out
+
+    def iter_batches(self, nodes: Sequence[int]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (positions in nodes, logits) of one batch at a time
+
+        Nodes are batched in id order, where neighbours overlap most (a year is a
+        contiguous node range). With a pool only a few batches are in flight at once,
+        so results never pile up faster than they are consumed.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        order = np.argsort(nodes, kind="stable")
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+        if self._pool is None:
+            for index, positions in enumerate(batches):
+                yield positions, batch_logits(
+                    self.weights, self.x, self.adjacency, nodes[positions], self.fanouts, _batch_rng(self.seed, index)
+                )
+            return
+
+        pending: Deque[Tuple[np.ndarray, Future]] = deque()
+        for index, positions in enumerate(batches):
+            pending.append((positions, self._pool.submit(_run_batch, nodes[positions], index)))
+            if len(pending) >= 2 * self._workers:
+                positions, future = pending.popleft()
+                yield positions, future.result()
+        while pending:
+            positions, future = pending.popleft()
+            yield positions, future.result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+
+def batch_logits(
+    weights: GCNWeights,
+    x: np.ndarray,
+    adjacency: sp.csr_matrix,
+    targets: np.ndarray,
+    fanouts: Optional[Tuple[int, int]] = None,
+    rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
+    """Logits of the target nodes from their (sampled) 2-hop neighbourhood"""
+    rows2 = adjacency[targets]
+    if fanouts is not None:
+        rows2 = _sample_rows(rows2, targets, fanouts[0], rng)
+    hop1 = np.unique(rows2.indices)  # includes the targets through their self-loops
+
+    rows1 = adjacency[hop1]
+    if fanouts is not None:
+        rows1 = _sample_rows(rows1, hop1, fanouts[1], rng)
+    hop2 = np.unique(rows1.indices)
+
+    propagated = _local_columns(rows1, hop2) @ np.asarray(x[hop2], dtype=np.float32)
+    hidden = np.maximum(propagated @ weights.w1.T + weights.b1, 0)
+    return _local_columns(rows2, hop1) @ (hidden @ weights.w2.T) + weights.b2
+
+
+def _local_columns(rows: sp.csr_matrix, columns: np.ndarray) -> sp.csr_matrix:
+    """Same rows with their global column ids renumbered to positions in sorted columns"""
+    return sp.csr_matrix(
+        (rows.data, np.searchsorted(columns, rows.indices), rows.indptr),
+        shape=(rows.shape[0], len(columns))
+    )
+
+
+def _sample_rows(rows: sp.csr_matrix, row_nodes: np.ndarray, fanout: int, rng: np.random.Generator) -> sp.csr_matrix:
+    """
+    Keep the self-loop and at most fanout random neighbours of every row
+
+    Kept neighbour weights are scaled by neighbours / fanout, so a sampled row
+    sums to the full row in expectation.
+    """
+    counts = np.diff(rows.indptr)
+    row_of = np.repeat(np.arange(rows.shape[0]), counts)
+    is_self = rows.indices == row_nodes[row_of]
+
+    # Self-loops sort first in their row and are always kept
+    keys = rng.random(rows.nnz)
+    keys[is_self] = -1.0
+    order = np.lexsort((keys, row_of))
+    rank = np.empty(rows.nnz, dtype=np.int64)
+    rank[order] = np.arange(rows.nnz) - rows.indptr[row_of[order]]
+    keep = rank <= fanout
+
+    neighbours = counts - 1
+    scale = np.where(neighbours > fanout, neighbours / max(fanout, 1), 1.0)
+    data = np.where(is_self, rows.data, rows.data * scale[row_of]).astype(np.float32)
+
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(row_of[keep], minlength=rows.shape[0]))])
+    return sp.csr_matrix((data[keep], rows.indices[keep], indptr), shape=rows.shape)
+
+
+def _batch_rng(seed: int, index: int) -> np.random.Generator:
+    """Sampling of a batch depends on its index only, not on the worker that runs it"""
+    return np.random.default_rng([seed, index])
+
+
+_worker_state = None
+
+
+def _init_worker(weights, x, adjacency, fanouts, seed):
+    global _worker_state
+    _worker_state = (weights, x, adjacency, fanouts, seed)
+
+
+def _run_batch(targets: np.ndarray, index: int) -> np.ndarray:
+    weights, x, adjacency, fanouts, seed = _worker_state
+    return batch_logits(weights, x, adjacency, targets, fanouts, _batch_rng(seed, index))
@@ -0,0 +1,104 @@
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services.country_table import COUNTRY_ID_DTYPE, YEAR_DTYPE, CountryTable
+
+
+class NodeIndex:
+    """
+    Index between (country, year) pairs and the node ids of one graph
+
+    Countries are ids of a shared CountryTable. Lookups go through a dense
+    country × year array of node ids, so a whole year of countries is joined
+    with one gather instead of one hash lookup per name.
+    """
+
+    def __init__(self, node_country_ids: Sequence[int], node_years: Sequence[int], countries: CountryTable):
+        self.countries = countries
+        self.node_country_ids = np.asarray(node_country_ids, dtype=COUNTRY_ID_DTYPE)
+        self.node_years = np.asarray(node_years, dtype=YEAR_DTYPE)
+
+        self.first_year = 0
+        self._lookup = np.full((0, 0), -1, dtype=np.int32)
+        self._year_nodes: Dict[int, np.ndarray] = {}
+        self._register(np.arange(len(self.node_years)))
+
+    def copy(self, countries: Optional[CountryTable] = None) -> "NodeIndex":
+        """Index that can be appended to without changing this one, optionally over a grown country table"""
+        index = NodeIndex.__new__(NodeIndex)
+        index.countries = countries or self.countries
+        index.node_country_ids = self.node_country_ids
+        index.node_years = self.node_years
+        index.first_year = self.first_year
+        index._lookup = self._lookup.copy()
+        index._year_nodes = dict(self._year_nodes)
+        return index
+
+    def append(self, country_ids: Sequence[int], years: Sequence[int]) -> np.ndarray:
+        """Register nodes appended at the end of the graph, returns their ids"""
+        first = len(self.node_country_ids)
+        node_ids = np.arange(first, first + len(country_ids))
+
+        self.node_country_ids = np.concatenate([self.node_country_ids, np.asarray(country_ids, dtype=COUNTRY_ID_DTYPE)])
+        self.node_years = np.concatenate([self.node_years, np.asarray(years, dtype=YEAR_DTYPE)])
+        self._register(node_ids)
+        return node_ids
+
+    @property
+    def years(self) -> List[int]:
+        return sorted(self._year_nodes)
+
+    def node_id(self, country: str, year: int) -> Optional[int]:
+        """Node of a country in a year, None if the graph has no such node"""
+        country_id = self.countries.find(country)
+        if country_id is None:
+            return None
+        node_id = int(self.node_ids(np.array([country_id]), year)[0])
+        return node_id if node_id >= 0 else None
+
+    def node_ids(self, country_ids: np.ndarray, year: int) -> np.ndarray:
+        """Nodes of many countries in one year, -1 for the missing ones"""
+        country_ids = np.asarray(country_ids, dtype=np.int64)
+        column = year - self.first_year
+        if not 0 <= column < self._lookup.shape[1]:
+            return np.full(len(country_ids), -1, dtype=np.int64)
+
+        known = (country_ids >= 0) & (country_ids < self._lookup.shape[0])
+        return np.where(known, self._lookup[np.where(known, country_ids, 0), column], -1).astype(np.int64)
+
+    def year_nodes(self, year: int) -> np.ndarray:
+        """All nodes of a year in graph order"""
+        return self._year_nodes.get(year, np.empty(0, dtype=np.int64))
+
+    def country_year(self, node_id: int) -> Tuple[str, int]:
+        """Inverse lookup: (country name, year) of a node, for responses"""
+        return self.countries[self.node_country_ids[node_id]], int(self.node_years[node_id])
+
+    def country_names(self, node_ids: np.ndarray) -> np.ndarray:
+        """Country names of many nodes, None for nodes without a country"""
+        names = np.array(self.countries.names + [None], dtype=object)
+        return names[self.node_country_ids[node_ids]]
+
+    def _register(self, node_ids: np.ndarray):
+        """Add nodes to the lookup array, growing it to new countries and years"""
+        country_ids = self.node_country_ids[node_ids].astype(np.int64)
+        years = self.node_years[node_ids].astype(np.int64)
+        valid = (country_ids >= 0) & (years >= 0)
+        node_ids, country_ids, years = node_ids[valid], country_ids[valid], years[valid]
+        if len(node_ids) == 0:
+            return
+
+        first_year, last_year = int(years.min()), int(years.max())
+        if self._lookup.size:
+            first_year = min(first_year, self.first_year)
+            last_year = max(last_year, self.first_year + self._lookup.shape[1] - 1)
+        shape = (max(len(self.countries), int(country_ids.max()) + 1), last_year - first_year + 1)
+        if shape != self._lookup.shape or first_year != self.first_year:
+            grown = np.full(shape, -1, dtype=np.int32)
+            offset = self.first_year - first_year
+            grown[:self._lookup.shape[0], offset:offset + self._lookup.shape[1]] = self._lookup
+            self._lookup, self.first_year = grown, first_year
+
+        self._lookup[country_ids, years - self.first_year] = node_ids
+        for year in np.unique(years).tolist():
+            self._year_nodes[year] = np.flatnonzero(self.node_years == year)
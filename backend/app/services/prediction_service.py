@@ -1,71 +1,157 @@
 import sys
 import os
+import logging
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-import torch
+import copy
+import hashlib
+import threading
+from dataclasses import replace
+
 import pandas as pd
-from typing import List, Dict, Optional
-from models.feature_predictor import FeaturePredictor
-from schemas.responses import CountryCluster, PredictionResponse, ClusterTrend, CountryTrendResponse, ClusterIndicatorStats, ClusterStatsResponse
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, List, Dict, Iterator, Optional
+from schemas.responses import CountryCluster, PredictionResponse, ClusterTrend, CountryTrendResponse, CountryTrendSummary, BulkTrendResponse, ClusterIndicatorStats, ClusterStatsResponse, ClusterTransitionMatrix, SankeyNode, SankeyLink, TransitionsResponse, SimilarCountry, SimilarCountriesResult, SimilarCountriesResponse, WhatIfNodeResult, WhatIfScenarioResult, WhatIfResponse
+from schemas.requests import WhatIfScenario
 import numpy as np
-from models.gcn_model import GCN
+from services.artifact_bundle import ArtifactBundle
+from services.graph import Graph, append_rows
+from services.country_table import CountryTable
+from services.cluster_table import ClusterTable
+from services.trend_index import TrendIndex
+from services.transition_index import TransitionIndex
+from services.confidence_index import ConfidenceIndex
+from services.similarity_index import SimilarityIndex
+from services.serving_state import ServingState
+from services.node_index import NodeIndex
+from services.indicator_stats import IndicatorStats
+from services.incremental import IncrementalGCN
+from services.propagation import GCNWeights, PropagationEngine, gcn_logits
+from services.what_if import WhatIfEngine
+from services.metrics import span
+from pipeline.graph_builder import feature_scaling
+
+if TYPE_CHECKING:
+    # Imports torch, only loaded at runtime when there is a FeaturePredictor
+    from services.forecaster import Forecaster, ForecastStep
+
+logger = logging.getLogger(__name__)
+
+# Last year the API serves, forecasts are never rolled out further
+LAST_FORECAST_YEAR = 2028
+# Year the trends of one country end in
+CURRENT_YEAR = 2025
+
+# Sign of (last cluster - first cluster): higher value of cluster - improvement
+TREND_NAMES = {1: "improving", -1: "declining", 0: "stable"}
 
 
 class PredictionService:
     def __init__(self):
-        self.gcn_model = None
+        self.artifact_version = None
+        self.gcn_weights = None
         self.feature_predictor = None
-        self.data = None
         self.future_data = None
         self.pivot_df = None
-        self.countries = None
+        self.future_node_index = None
+        self.feature_names = None
+        self.feature_scaling = None
+        self.what_if_engines = {}
+        # Graph, cluster table and indexes, replaced as a whole by in-place updates
+        self.state: Optional[ServingState] = None
+        self._update_lock = threading.Lock()
         self.load_models()
     
     def load_models(self):
-        """Load trained models"""
-        try:
-            # Load GCN model
-            print("🔄 Loading GCN model...")
-            self.gcn_model = GCN(in_channels=123, hidden_channels=64, out_channels=3)
-            #self.gcn_model = torch.load("data/simple_gcn_model.pth", map_location='cpu', weights_only=False)
-            self.gcn_model.load_state_dict(torch.load(
-                "data/simple_gcn_model_dict.pth", map_location="cpu"
-            ))
-            self.gcn_model.eval()
-            print("✅ GCN model loaded!")
-            
-            # Load FeaturePredictor
-            self.feature_predictor = FeaturePredictor(input_dim=123)
-            
-            # Load the graphs
-            self.data = torch.load("data/digital_inequality_graph_with_years.pt", weights_only=False)
-            self.future_data = torch.load("data/future_predictions_graph.pt", weights_only=False)
-            self.countries = self.future_data.countries[:99]
-
-            # Load the dataset and create a pivot_df
-            df = pd.read_csv("data/cleaned_final_dataset.csv")
-            self.pivot_df = df.pivot_table(
-                index=["Economy", "Year"],
-                columns="Indicator",
-                values="Value"
-            ).reset_index()
-            
-            print("Models and data was updated succesfully!")
-            
-        except Exception as e:
-            print(f"Error when uploading the models: {e}")
+        """
+        Load the trained model and the graphs from the artifact bundle
+
+        Errors are not caught: a service without its model can not answer anything,
+        so the worker should fail to start instead of serving 500s.
+        """
+        with span("load.total"):
+            self._load_models()
+
+    def _load_models(self):
+        with span("load.bundle"):
+            bundle = ArtifactBundle.open()
+        self.artifact_version = bundle.version
+
+        # Load GCN model, inference runs on NumPy/SciPy with its weights
+        logger.info("🔄 Loading GCN model from bundle %s...", bundle.version)
+        self.gcn_weights = GCNWeights.from_state_dict(bundle.state_dict())
+        logger.info("✅ GCN model loaded!")
+
+        # Load FeaturePredictor, only bundles built with trained weights can forecast
+        if bundle.has_feature_predictor:
+            with span("load.feature_predictor"):
+                self.feature_predictor = self._load_feature_predictor(bundle)
+            logger.info("✅ FeaturePredictor loaded!")
+        else:
+            logger.warning("⚠️ No FeaturePredictor weights, future years come from the forecast graph")
+
+        # Load the graphs
+        data = Graph(
+            x=bundle.features("graph_x"),
+            edge_index=bundle.array("graph_edge_index"),
+            node_offset=bundle.node_offset
+        )
+        self.future_data = Graph(
+            x=bundle.features("future_x"),
+            edge_index=bundle.array("future_edge_index")
+        )
+
+        # One interned name table, everything else refers to countries by id
+        countries = CountryTable(bundle.countries)
+
+        # Indicator values of every (country, year), as pivoted at build time
+        self.pivot_df = pd.DataFrame(bundle.array("pivot_values"), columns=bundle.indicators)
+        self.pivot_df.insert(0, "Economy", pd.Categorical.from_codes(
+            bundle.array("pivot_countries"), dtype=pd.CategoricalDtype(countries.names)
+        ))
+        self.pivot_df.insert(1, "Year", bundle.array("pivot_years"))
+        self.feature_names = self._get_feature_names()
+
+        # Index (country, year) <-> node for both graphs
+        node_index = NodeIndex(bundle.array("graph_node_countries"), bundle.array("graph_node_years"), countries)
+        self.future_node_index = NodeIndex(
+            bundle.array("future_node_countries"), bundle.array("future_node_years"), countries
+        )
+
+        # Run the GCN once per loaded model/graph and keep every year's assignments
+        with span("gcn.forward"):
+            propagation = PropagationEngine(self.gcn_weights, data.x, data.edge_index)
+            incremental = IncrementalGCN(self.gcn_weights, data.x, data.edge_index, propagation)
+        with span("load.cluster_table"):
+            table = self._build_cluster_table(node_index, incremental.out, countries)
+        state = ServingState(data, countries, node_index, propagation, incremental, table)
+        with span("load.indicator_stats"):
+            state = self._with_table(state, table)
+        state.forecaster = self._create_forecaster(data, node_index)
+        self.state = state
+
+        # Raw indicator value -> standardized feature, for what-if scenarios
+        self.feature_scaling = feature_scaling(self.pivot_df[self.feature_names].to_numpy(dtype=np.float64))
+
+        logger.info("Models and data was updated succesfully!")
     
     def predict_clusters(self, year: int) -> PredictionResponse:
         """Main method: predicts the clusters for the agrument year"""
-        if year < 2025:
-            clusters_list = self._get_historical_clusters(year)
-        else:
-            clusters_list = self._get_future_clusters(year)
+        return self._predict_clusters(self.state.cluster_table, year)
 
-        cluster_distribution = {}
-        for item in clusters_list:
-            cluster_distribution[item.cluster] = cluster_distribution.get(item.cluster, 0) + 1  
+    def _predict_clusters(self, table: ClusterTable, year: int) -> PredictionResponse:
+        with span("predict_clusters.year_slice"):
+            country_ids, clusters = table.year_slice(year)
+            counts = np.bincount(clusters, minlength=table.n_clusters)
+        countries = table.countries
+
+        with span("predict_clusters.models"):
+            clusters_list = [
+                CountryCluster(country=countries[country_id], cluster=cluster, year=year)
+                for country_id, cluster in zip(country_ids.tolist(), clusters.tolist())
+            ]
+        cluster_distribution = {cluster: int(count) for cluster, count in enumerate(counts) if count > 0}
 
         return PredictionResponse(
             year=year,
@@ -74,190 +160,672 @@ class PredictionService:
             cluster_distribution=cluster_distribution
         )       
     
-    def _get_historical_clusters(self, year: int) -> List[CountryCluster]:
-        """Get clusters for historical data"""
-        # Filter nodes by year
-        year_mask = self._get_year_mask(year)
-        if year_mask.sum() == 0:
-            return []
+    def predict_clusters_columnar(self, year: int) -> Dict:
+        """
+        Same clusters as predict_clusters as parallel arrays
 
-        # Use GCN model for predictions
-        with torch.no_grad():
-            embeddings = self.gcn_model(self.data.x, self.data.edge_index)
-            clusters = embeddings.argmax(dim=1)[year_mask].cpu().numpy()
-        
-        return self._format_results(clusters, year, "historical")
-    
-    def _get_future_clusters(self, year: int) -> List[CountryCluster]:
-        """Get feature clusters"""
-        # Filter nodes years by year
-        year_mask = self.future_data.years == year
-        if year_mask.sum() == 0:
-            return []
+        country_ids index into the countries table, which is the same for every year.
+        """
+        table = self.state.cluster_table
+        country_ids, clusters = table.year_slice(year)
+        counts = np.bincount(clusters, minlength=table.n_clusters)
 
-        # Use GCN model for predictions
-        with torch.no_grad():
-            embeddings = self.gcn_model(self.future_data.x, self.future_data.edge_index)
-            clusters = embeddings.argmax(dim=1)[year_mask].cpu().numpy()
-        
-        return self._format_results(clusters, year, "future")
-    
-    def _get_year_mask(self, year: int):
-        """Create mask for current year nodes"""
-        start_idx, end_idx = self.data.node_offset[year]
-        year_mask = torch.zeros(self.data.x.shape[0], dtype=torch.bool)
-        year_mask[start_idx:end_idx] = True
+        return {
+            "year": year,
+            "total_countries": len(country_ids),
+            "countries": table.countries.names,
+            "country_ids": country_ids,
+            "clusters": clusters,
+            "cluster_distribution": {cluster: int(count) for cluster, count in enumerate(counts) if count > 0},
+        }
 
-        return year_mask
-    
-    def _format_results(self, clusters, year: int, data_type: str = "historical") -> List[CountryCluster]:
+    def iter_clusters_range(self, from_year: int, to_year: int, columnar: bool = False) -> Iterator[Dict]:
         """
-        Universal function for formatting clustering results
-        
-        Args:
-            clusters: predicted clusters array
-            mask: boolean mask for selected nodes
-            year: target year
-            data_type: "historical" or "future"
+        Clusters of every year in a range, one payload per year
+
+        The whole range is sliced from the cluster table and counted at once, the generator
+        only formats one year at a time. In columnar mode the first payload is the country table.
         """
-        results = []
-        
-        if data_type == "historical":
-            year_countries = self.pivot_df[self.pivot_df['Year'] == year]['Economy'].values
-            for i in range(len(clusters)):
-                results.append(
-                    CountryCluster(
-                        country=year_countries[i],
-                        cluster=int(clusters[i]),
-                        year=year
-                    )
+        table = self.state.cluster_table
+        years = [year for year in range(from_year, to_year + 1) if table.has_year(year)]
+        clusters = table.clusters[[table.year_index[year] for year in years]]
+
+        # Distribution of every year in one pass: counts of (row, cluster) pairs
+        present = clusters >= 0
+        rows = np.broadcast_to(np.arange(len(years))[:, None], clusters.shape)
+        distribution = np.bincount(
+            rows[present] * table.n_clusters + clusters[present],
+            minlength=len(years) * table.n_clusters
+        ).reshape(len(years), table.n_clusters)
+
+        if columnar:
+            yield {"countries": table.countries.names}
+
+        for row, year in enumerate(years):
+            country_ids = np.flatnonzero(present[row])
+            year_clusters = clusters[row, country_ids]
+            payload = {"year": year, "total_countries": len(country_ids)}
+
+            if columnar:
+                payload["country_ids"] = country_ids
+                payload["clusters"] = year_clusters
+            else:
+                payload["clusters"] = [
+                    {"country": table.countries[country_id], "cluster": cluster, "year": year}
+                    for country_id, cluster in zip(country_ids.tolist(), year_clusters.tolist())
+                ]
+            payload["cluster_distribution"] = {
+                cluster: int(count) for cluster, count in enumerate(distribution[row]) if count > 0
+            }
+            yield payload
+
+    def _build_cluster_table(self, node_index: NodeIndex, historical_logits: np.ndarray,
+                             countries: CountryTable) -> ClusterTable:
+        """Run the GCN once over the forecast graph and store logits for every (year, country)"""
+        future_logits = self._run_gcn(self.future_data)
+
+        # Years with real data come from the historical graph, the rest from the forecast graph
+        historical_years = node_index.years
+        future_years = [year for year in self.future_node_index.years if year not in historical_years]
+        table = ClusterTable(historical_years + future_years, countries, n_clusters=historical_logits.shape[1])
+
+        for years, index, logits in (
+            (historical_years, node_index, historical_logits),
+            (future_years, self.future_node_index, future_logits),
+        ):
+            for year in years:
+                nodes = index.year_nodes(year)
+                table.fill_year(year, index.node_country_ids[nodes], logits[nodes])
+
+        return table
+
+    def _with_table(self, state: ServingState, table: ClusterTable, **changes) -> ServingState:
+        """
+        New state around a cluster table, with the trend, transition and confidence indexes
+        and the indicator stats of that table
+
+        The given state is not modified. The nodes behind the table changed too, so the
+        embeddings are indexed again on first use.
+        """
+        state = replace(state, cluster_table=table, similarity_index=None, **changes)
+        state.trend_index = TrendIndex(table)
+        state.transition_index = TransitionIndex(table)
+        state.confidence_index = ConfidenceIndex(table)
+        state.indicator_stats = self._build_indicator_stats(state)
+        return state
+
+    def _build_indicator_stats(self, state: ServingState) -> IndicatorStats:
+        """Gather the indicator features of every (year, country) node and reduce them per cluster"""
+        table = state.cluster_table
+        n_features = len(self.feature_names)
+
+        features, year_rows, clusters = [], [], []
+        for year_row, year in enumerate(table.years.tolist()):
+            country_ids, year_clusters = table.year_slice(year)
+            graph, index = self._graph_for_year(state, year)
+            nodes = index.node_ids(country_ids, year)
+
+            # Only original features, masks and backwardness index are excluded
+            features.append(graph.x[nodes, :n_features])
+            year_rows.append(np.full(len(nodes), year_row))
+            clusters.append(year_clusters)
+
+        return IndicatorStats(
+            np.concatenate(features),
+            np.concatenate(year_rows),
+            np.concatenate(clusters),
+            n_years=len(table.years),
+            n_clusters=table.n_clusters,
+            feature_names=self.feature_names
+        )
+
+    def _graph_for_year(self, state: ServingState, year: int):
+        """Graph and node index that serve a year"""
+        if year in state.data.node_offset:
+            return state.data, state.node_index
+        if year in state.forecast_graphs:
+            return state.forecast_graphs[year]
+        return self.future_data, self.future_node_index
+
+    # --- Forecasting --- #
+
+    def _load_feature_predictor(self, bundle: ArtifactBundle):
+        """FeaturePredictor of the bundle, the only model that still runs on torch"""
+        import torch
+        from models.feature_predictor import FeaturePredictor
+
+        predictor_config = bundle.manifest["feature_predictor"]
+        feature_predictor = FeaturePredictor(
+            input_dim=predictor_config["input_dim"],
+            hidden_dim=predictor_config["hidden_dim"]
+        )
+        state_dict = bundle.state_dict("feature_predictor")
+        feature_predictor.load_state_dict({name: torch.from_numpy(array) for name, array in state_dict.items()})
+        feature_predictor.eval()
+        return feature_predictor
+
+    def _create_forecaster(self, data: Graph, node_index: NodeIndex) -> Optional["Forecaster"]:
+        """Forecaster rolling out from the last year of the historical graph, None without weights"""
+        if self.feature_predictor is None:
+            return None
+
+        from services.forecaster import Forecaster
+        return Forecaster(
+            self.feature_predictor,
+            self.gcn_weights,
+            data.x,
+            data.edge_index,
+            node_index.node_country_ids,
+            node_index.node_years,
+            base_year=max(data.node_offset)
+        )
+
+    def request_forecast(self, year: int) -> Optional[Future]:
+        """
+        Start (or join) the forecast up to a year in the background
+
+        None if there is nothing to compute: no FeaturePredictor, a historical or
+        out-of-range year, or a year whose forecast is already in the cluster table.
+        """
+        state = self.state
+        forecaster = state.forecaster
+        if forecaster is None or year in state.forecast_graphs:
+            return None
+        if year <= forecaster.base_year or year > LAST_FORECAST_YEAR:
+            return None
+        return forecaster.forecast(year - forecaster.base_year)
+
+    def ready_until(self, year: int) -> int:
+        """Last year up to a year whose clusters do not wait for a forecast anymore"""
+        state = self.state
+        if state.forecaster is None:
+            return year
+        return min(year, max([state.forecaster.base_year, *state.forecast_graphs]))
+
+    def apply_forecast(self, steps: List["ForecastStep"]) -> bool:
+        """
+        Put forecast years into the cluster table, returns whether anything changed
+
+        The grown table, its indexes and the forecast graphs are built next to the served
+        state and published with one assignment, requests still running keep the previous one.
+        """
+        with self._update_lock:
+            state = self.state
+            # Years appended to the historical graph since the forecast started are not overwritten
+            steps = [
+                step for step in steps
+                if step.year not in state.forecast_graphs and step.year not in state.data.node_offset
+            ]
+            if not steps:
+                return False
+
+            table = state.cluster_table.extended([step.year for step in steps])
+            forecast_graphs = dict(state.forecast_graphs)
+            for step in steps:
+                # Replaces what the forecast graph had for this year
+                table.clear_year(step.year)
+                table.fill_year(step.year, step.country_ids, step.logits)
+                forecast_graphs[step.year] = (
+                    Graph(x=step.x, edge_index=step.edge_index),
+                    NodeIndex(step.country_ids, [step.year] * len(step.country_ids), state.countries)
                 )
-        
-        elif data_type == "future":
-            # use self.countries
-            for i in range(len(self.countries)):
-                results.append(
-                    CountryCluster(
-                        country=self.countries[i],
-                        cluster=int(clusters[i]),
-                        year=year
-                    )
-                )      
 
-        return results
+            self.state = self._with_table(state, table, forecast_graphs=forecast_graphs)
+        return True
+
+    def append_nodes(
+        self,
+        year: int,
+        countries: List[str],
+        x_new: np.ndarray,
+        edge_index_new: np.ndarray
+    ) -> np.ndarray:
+        """
+        Append one year's country nodes to the historical graph without a full recompute
+
+        The new nodes get ids after the existing ones and must belong to a new year or to the
+        last year of the graph, so node_offset stays contiguous. edge_index_new uses global ids.
+        Only outputs within two hops of the new edges are recomputed. The grown graph, node
+        index and cluster table are built next to the served state and published with one
+        assignment, requests still running keep the previous one. Returns the recomputed node ids.
+        """
+        with self._update_lock:
+            state = self.state
+            data = state.data
+            offsets = data.node_offset
+            n_old = data.x.shape[0]
+            last_year = max(offsets, key=lambda y: offsets[y][1])
+            if year in offsets and year != last_year:
+                raise ValueError(f"Nodes can only be appended to a new year or to {last_year}")
+            if len(countries) != x_new.shape[0]:
+                raise ValueError("One country name is needed for every new node")
+            is_new_year = year not in offsets
+
+            x_new = np.asarray(x_new, dtype=data.x.dtype)
+            edge_index_new = np.asarray(edge_index_new, dtype=data.edge_index.dtype)
+            incremental = copy.copy(state.incremental)
+            with span("gcn.incremental"):
+                affected = incremental.append(x_new, edge_index_new)
+
+            start_idx = n_old if is_new_year else offsets[year][0]
+            grown = Graph(
+                x=append_rows(data.x, x_new),
+                edge_index=np.concatenate([data.edge_index, edge_index_new], axis=1),
+                node_offset={**offsets, year: (start_idx, n_old + len(countries))}
+            )
+            country_table = CountryTable(state.countries.names)
+            node_index = state.node_index.copy(country_table)
+            node_index.append(country_table.intern(countries), [year] * len(countries))
+
+            table = state.cluster_table.extended([year], country_table)
+            if is_new_year:
+                # The year may have been served from the forecast graph until now
+                table.clear_year(year)
+
+            logits = incremental.out[affected]
+            node_years = node_index.node_years[affected]
+            for affected_year in np.unique(node_years).tolist():
+                in_year = node_years == affected_year
+                table.fill_year(affected_year, node_index.node_country_ids[affected[in_year]], logits[in_year])
+
+            # Same appends give the same digest on every worker, see ServingState.revision
+            appended = hashlib.sha256(b"".join([
+                state.appended.encode(), repr((year, list(countries))).encode(), x_new.tobytes(), edge_index_new.tobytes()
+            ])).hexdigest()
+
+            changes = dict(
+                data=grown, countries=country_table, node_index=node_index, incremental=incremental, appended=appended,
+                propagation=PropagationEngine(self.gcn_weights, grown.x, grown.edge_index)
+            )
+            # Forecasts have to start from the new last year
+            if state.forecaster is not None:
+                changes.update(forecaster=self._create_forecaster(grown, node_index), forecast_graphs={})
+            self.state = self._with_table(state, table, **changes)
+
+            if state.forecaster is not None:
+                state.forecaster.shutdown()
+            self.what_if_engines.pop(id(data), None)
+        return affected
+
+    def _run_gcn(self, data: Graph) -> np.ndarray:
+        """Full-graph GCN forward pass, returns logits as a numpy array"""
+        with span("gcn.forward"):
+            return gcn_logits(self.gcn_weights, data.x, data.edge_index)
     
 
+    # --- What-if scenarios --- #
+
+    def score_scenarios(self, scenarios: List[WhatIfScenario], all_neighbours: bool = False) -> WhatIfResponse:
+        """
+        Clusters after overriding indicators of (country, year) nodes, one scenario each
+
+        Raw indicator values are standardized like the graph features and the node's
+        has-data masks and backwardness index are updated with them. Scenarios are grouped
+        by the graph serving their year and scored together, see WhatIfEngine.
+        """
+        n_features = len(self.feature_names)
+        feature_columns = {name: i for i, name in enumerate(self.feature_names)}
+        unknown = sorted({name for scenario in scenarios for name in scenario.indicators} - set(feature_columns))
+        if unknown:
+            raise ValueError(f"Unknown indicators: {', '.join(unknown)}")
+
+        _, mean, std = self.feature_scaling
+        state = self.state
+        groups: Dict[int, List[int]] = {}
+        node_ids, missing = {}, []
+        for i, scenario in enumerate(scenarios):
+            graph, index = self._graph_for_year(state, scenario.year)
+            node_id = index.node_id(scenario.country, scenario.year)
+            if node_id is None:
+                missing.append(f"{scenario.country} ({scenario.year})")
+                continue
+            node_ids[i] = node_id
+            groups.setdefault(id(graph), []).append(i)
+
+        results = {}
+        for members in groups.values():
+            graph, index = self._graph_for_year(state, scenarios[members[0]].year)
+            engine = self._what_if_engine(state, graph)
+
+            nodes = np.array([node_ids[i] for i in members])
+            new_x = np.array(graph.x[nodes])
+            for row, i in enumerate(members):
+                columns = [feature_columns[name] for name in scenarios[i].indicators]
+                values = np.fromiter(scenarios[i].indicators.values(), dtype=np.float64)
+                new_x[row, columns] = (values - mean[columns]) / std[columns]
+                new_x[row, [n_features + column for column in columns]] = 1.0
+            new_x[:, 2 * n_features] = 1.0 - new_x[:, n_features:2 * n_features].mean(axis=1)
+
+            with span("what_if.score"):
+                scenario_rows, affected, logits = engine.score(nodes, new_x - graph.x[nodes])
+            previous = engine.out[affected].argmax(axis=1)
+            clusters = logits.argmax(axis=1)
+
+            bounds = np.searchsorted(scenario_rows, np.arange(len(members) + 1)).tolist()
+            for row, i in enumerate(members):
+                results[i] = self._what_if_result(
+                    index, int(nodes[row]), affected[bounds[row]:bounds[row + 1]],
+                    logits[bounds[row]:bounds[row + 1]], clusters[bounds[row]:bounds[row + 1]],
+                    previous[bounds[row]:bounds[row + 1]], all_neighbours
+                )
+
+        return WhatIfResponse(
+            total_scenarios=len(scenarios),
+            results=[results[i] for i in sorted(results)],
+            missing=missing
+        )
+
+    def _what_if_result(self, index: NodeIndex, node_id: int, affected, logits, clusters, previous,
+                        all_neighbours: bool) -> WhatIfScenarioResult:
+        """Result of one scenario from its slice of affected nodes"""
+        neighbours, changed_node = [], None
+        for node, node_logits, cluster, previous_cluster in zip(
+            affected.tolist(), logits.tolist(), clusters.tolist(), previous.tolist()
+        ):
+            country, year = index.country_year(node)
+            result = WhatIfNodeResult(
+                country=country, year=year, cluster=cluster, previous_cluster=previous_cluster, logits=node_logits
+            )
+            if node == node_id:
+                changed_node = result
+            elif all_neighbours or cluster != previous_cluster:
+                neighbours.append(result)
+
+        return WhatIfScenarioResult(
+            **changed_node.model_dump(),
+            affected_nodes=len(affected),
+            neighbours=neighbours
+        )
+
+    def _what_if_engine(self, state: ServingState, graph: Graph) -> WhatIfEngine:
+        """Scenario engine of a graph, built on first use"""
+        cached = self.what_if_engines.get(id(graph))
+        if cached is None or cached[0] is not graph:
+            engine = state.propagation if graph is state.data else PropagationEngine(self.gcn_weights, graph.x, graph.edge_index)
+            cached = (graph, WhatIfEngine(engine))
+            self.what_if_engines[id(graph)] = cached
+        return cached[1]
+
     # --- Trends in clusters --- #
 
     def get_country_trends(self, country: str, years_back: int = 5) -> Optional[CountryTrendResponse]:
         """Get the cluster's trends for current coutry"""
-        print(f"🔍 Analyzing trends for {country} for the {years_back} years")
-        
-        trends = []
-        current_year = 2025
-        cluster_history = []
+        logger.debug("🔍 Analyzing trends for %s for the %d years", country, years_back)
         
-        for year in range(current_year - years_back, current_year + 1):
-            clusters_data = self.predict_clusters(year)
-            if clusters_data:
-                country_cluster = self._find_country_in_clusters(clusters_data.clusters, country)
-                if country_cluster:
-                    trends.append(ClusterTrend(
-                        year=year,
-                        cluster=country_cluster.cluster
-                    ))
-                    cluster_history.append(country_cluster.cluster)
-        
-        if not trends:
-            print(f"❌ There is no data for {country}")
+        current_year = CURRENT_YEAR
+        from_year = current_year - years_back
+
+        state = self.state
+        country_id = state.cluster_table.find_country(country)
+        summary = None
+        if country_id is not None:
+            with span("trends.summarize"):
+                summary = state.trend_index.summarize(np.array([country_id]), from_year, current_year)
+        
+        if summary is None or summary["n_years"][0] == 0:
+            logger.debug("❌ There is no data for %s", country)
             return None
         
-        cluster_changes = self._calculate_cluster_changes(cluster_history)
-        stability_score = self._calculate_stability_score(cluster_history)
-        current_trend = self._determine_current_trend(cluster_history)
-        
-        return CountryTrendResponse(
-            country=country,
-            trends=trends,
-            cluster_changes=cluster_changes,
-            stability_score=stability_score,
-            current_trend=current_trend
-        )
-    
-    def _find_country_in_clusters(self, clusters: List[CountryCluster], country: str) -> Optional[CountryCluster]:
-        """Found country in the list of clusters"""
-        for cluster in clusters:
-            if cluster.country.lower() == country.lower():
-                return cluster
-        return None
-    
-    def _calculate_cluster_changes(self, cluster_history: List[int]) -> int:
-        """Calculate number of cluster changes"""
-        changes = 0
-        for i in range(1, len(cluster_history)):
-            if cluster_history[i] != cluster_history[i-1]:
-                changes += 1
-        return changes
-    
-    def _calculate_stability_score(self, cluster_history: List[int]) -> float:
-        """Calculate stability score (0-1)"""
-        if len(cluster_history) <= 1:
-            return 1.0
-        
-        changes = self._calculate_cluster_changes(cluster_history)
-        max_possible_changes = len(cluster_history) - 1
-        return 1.0 - (changes / max_possible_changes)
-    
-    def _determine_current_trend(self, cluster_history: List[int]) -> str:
-        """Determine current trend"""
-        if len(cluster_history) < 2:
-            return "stable"
-        
-        # simple logic - higher value of cluster - improvement
-        current = cluster_history[-1]
-        previous = cluster_history[0]
-        
-        if current > previous:
-            return "improving"
-        elif current < previous:
-            return "declining"
+        with span("trends.models"):
+            return CountryTrendResponse(
+                country=country,
+                trends=self._get_trend_history(state.cluster_table, country_id, summary["first"][0], summary["last"][0]),
+                cluster_changes=int(summary["changes"][0]),
+                stability_score=float(summary["stability"][0]),
+                current_trend=TREND_NAMES[int(summary["trend"][0])]
+            )
+
+    def get_bulk_trends(
+        self,
+        countries: Optional[List[str]],
+        from_year: int,
+        to_year: int,
+        include_trends: bool = False
+    ) -> BulkTrendResponse:
+        """Trend statistics of many countries (all of them by default) over one year window"""
+        state = self.state
+        table = state.cluster_table
+        missing = []
+
+        if countries is None:
+            country_ids = np.arange(len(table.countries))
         else:
-            return "stable"
-        
-    
+            found = []
+            for country in countries:
+                country_id = table.find_country(country)
+                if country_id is None:
+                    missing.append(country)
+                else:
+                    found.append(country_id)
+            country_ids = np.array(found, dtype=np.int64)
+
+        with span("trends.summarize"):
+            summary = state.trend_index.summarize(country_ids, from_year, to_year)
+
+        results = []
+        for i, country_id in enumerate(country_ids.tolist()):
+            if summary["n_years"][i] == 0:
+                if countries is not None:
+                    missing.append(table.countries[country_id])
+                continue
+
+            first, last = int(summary["first"][i]), int(summary["last"][i])
+            results.append(CountryTrendSummary(
+                country=table.countries[country_id],
+                first_year=int(table.years[first]),
+                last_year=int(table.years[last]),
+                cluster_changes=int(summary["changes"][i]),
+                stability_score=float(summary["stability"][i]),
+                current_trend=TREND_NAMES[int(summary["trend"][i])],
+                trends=self._get_trend_history(table, country_id, first, last) if include_trends else None
+            ))
+
+        return BulkTrendResponse(
+            from_year=from_year,
+            to_year=to_year,
+            total_countries=len(results),
+            countries=results,
+            missing=missing
+        )
+
+    def _get_trend_history(self, table: ClusterTable, country_id: int, first: int, last: int) -> List[ClusterTrend]:
+        """Cluster of a country for every observed year between two table rows"""
+        clusters = table.clusters[first:last + 1, country_id]
+        years = table.years[first:last + 1]
+        return [
+            ClusterTrend(year=year, cluster=cluster)
+            for year, cluster in zip(years[clusters >= 0].tolist(), clusters[clusters >= 0].tolist())
+        ]
+
+    # --- Transitions --- #
+
+    def get_transitions(self, from_year: int, to_year: int) -> TransitionsResponse:
+        """
+        Cluster transition matrices of every consecutive year pair within a range
+
+        Also lays them out for a Sankey diagram: one node per (year, cluster) with the
+        cluster size, one link per non-zero matrix cell, indexed by node position.
+        """
+        state = self.state
+        table = state.cluster_table
+        transition_index = state.transition_index
+        n_clusters = table.n_clusters
+        pairs = transition_index.window(from_year, to_year)
+        if pairs is None:
+            return TransitionsResponse(from_year=from_year, to_year=to_year, matrices=[], nodes=[], links=[])
+        start, end = pairs
+
+        years = table.years[start:end + 2].tolist()
+        matrices = transition_index.matrices[start:end + 1]
+        counts = transition_index.counts[start:end + 2]
+
+        # Node of (year row, cluster) is row * n_clusters + cluster
+        pair_rows, sources, targets = np.nonzero(matrices)
+        values = matrices[pair_rows, sources, targets]
+
+        with span("transitions.models"):
+            return TransitionsResponse(
+                from_year=from_year,
+                to_year=to_year,
+                matrices=[
+                    ClusterTransitionMatrix(from_year=years[row], to_year=years[row + 1], matrix=matrix)
+                    for row, matrix in enumerate(matrices.tolist())
+                ],
+                nodes=[
+                    SankeyNode(year=year, cluster=cluster, name=self._get_cluster_name(cluster), count=count)
+                    for year, year_counts in zip(years, counts.tolist())
+                    for cluster, count in enumerate(year_counts)
+                ],
+                links=[
+                    SankeyLink(source=source, target=target, value=value)
+                    for source, target, value in zip(
+                        (pair_rows * n_clusters + sources).tolist(),
+                        ((pair_rows + 1) * n_clusters + targets).tolist(),
+                        values.tolist()
+                    )
+                ]
+            )
+
+    # --- Similar countries --- #
+
+    def get_similar_countries(
+        self,
+        countries: List[str],
+        year: Optional[int] = None,
+        k: int = 10,
+        same_year: bool = False
+    ) -> SimilarCountriesResponse:
+        """
+        Nearest countries of each requested one in the GCN's embedding space
+
+        A country is queried in one year, or in every year it has a node in, which shows
+        how its neighbourhood changed over time. All queries go through one batched search
+        of the similarity index, optionally restricted to the year of the query.
+        """
+        state = self.state
+        table = state.cluster_table
+        index = self._similarity_index(state)
+
+        query_rows, missing = [], []
+        years = table.years if year is None else np.array([year])
+        for country in countries:
+            country_id = table.find_country(country)
+            rows = index.rows(np.full(len(years), -1 if country_id is None else country_id), years)
+            rows = rows[rows >= 0]
+            if len(rows) == 0:
+                missing.append(country)
+            query_rows.append(rows)
+        query_rows = np.concatenate(query_rows) if query_rows else np.empty(0, dtype=np.int64)
+
+        with span("similar.search"):
+            neighbour_rows, similarities = index.neighbours(query_rows, k, same_year)
+
+        def similar_country(row: int) -> Dict:
+            country_id, node_year = int(index.country_ids[row]), int(index.years[row])
+            cluster = int(table.clusters[table.year_index[node_year], country_id])
+            return {"country": table.countries[country_id], "year": node_year, "cluster": cluster}
+
+        with span("similar.models"):
+            results = [
+                SimilarCountriesResult(
+                    **similar_country(row),
+                    similar=[
+                        SimilarCountry(**similar_country(neighbour), similarity=similarity)
+                        for neighbour, similarity in zip(neighbours, row_similarities)
+                        if neighbour >= 0
+                    ]
+                )
+                for row, neighbours, row_similarities in zip(
+                    query_rows.tolist(), neighbour_rows.tolist(), similarities.tolist()
+                )
+            ]
+
+        return SimilarCountriesResponse(
+            k=k,
+            same_year=same_year,
+            total_results=len(results),
+            results=results,
+            missing=missing
+        )
+
+    def get_similarity_index(self) -> SimilarityIndex:
+        """Similarity index of the nodes behind the cluster table, built on first use"""
+        return self._similarity_index(self.state)
+
+    def _similarity_index(self, state: ServingState) -> SimilarityIndex:
+        index = state.similarity_index
+        if index is None:
+            with span("similar.index"):
+                index = state.similarity_index = self._build_similarity_index(state)
+        return index
+
+    def _build_similarity_index(self, state: ServingState) -> SimilarityIndex:
+        """Hidden-layer embeddings of the node behind every (year, country) of the cluster table"""
+        hidden = {}
+        embeddings, country_ids, years = [], [], []
+        for year in state.cluster_table.years.tolist():
+            graph, index = self._graph_for_year(state, year)
+            if id(graph) not in hidden:
+                # The incremental GCN keeps the activations of the historical graph
+                hidden[id(graph)] = (
+                    state.incremental.h1 if graph is state.data
+                    else PropagationEngine(self.gcn_weights, graph.x, graph.edge_index).hidden()
+                )
+            nodes = index.year_nodes(year)
+            nodes = nodes[index.node_country_ids[nodes] >= 0]
+            embeddings.append(hidden[id(graph)][nodes])
+            country_ids.append(index.node_country_ids[nodes])
+            years.append(index.node_years[nodes])
+
+        return SimilarityIndex(np.concatenate(embeddings), np.concatenate(country_ids), np.concatenate(years))
+
     # --- Cluster stats --- #
 
     def get_cluster_stats(self, year: int, cluster: int) -> Optional[ClusterStatsResponse]:
         """Get detailed statistics for a specific cluster"""
-        print(f"Analyzing cluster {cluster} for year {year}")
+        logger.debug("Analyzing cluster %d for year %d", cluster, year)
         
+        # One state for the whole response, see ServingState
+        state = self.state
+
         # Get current year data
-        current_data = self.predict_clusters(year)
+        current_data = self._predict_clusters(state.cluster_table, year)
         if not current_data:
             return None
         
         # Get countries in target cluster
         cluster_countries = [c for c in current_data.clusters if c.cluster == cluster]
         if not cluster_countries:
-            print(f"❌ No countries in cluster {cluster} for year {year}")
+            logger.debug("❌ No countries in cluster %d for year %d", cluster, year)
             return None
         
         # Collect statistics
         cluster_name = self._get_cluster_name(cluster)
         cluster_color = self._get_cluster_color(cluster)
         
-        return ClusterStatsResponse(
-            cluster=cluster,
-            name=cluster_name,
-            color=cluster_color,
-            countries_count=len(cluster_countries),
-            top_countries=self._get_top_countries(cluster_countries),
-            bottom_countries=self._get_bottom_countries(cluster_countries),
-            stability=self._calculate_cluster_stability(cluster, year),
-            indicators=self._get_cluster_indicators(cluster_countries, year),
-            transitions=self._get_cluster_transitions(cluster, year),
-            regional_distribution=self._get_regional_distribution(cluster_countries)
-        )
+        with span("cluster_stats.stability"):
+            stability = self._calculate_cluster_stability(state, cluster, year)
+        with span("cluster_stats.indicators"):
+            indicators = self._get_cluster_indicators(state, cluster, year)
+        with span("cluster_stats.transitions"):
+            transitions = self._get_cluster_transitions(state, cluster, year)
+        with span("cluster_stats.ranking"):
+            top_countries = self._get_top_countries(state, cluster, year)
+            bottom_countries = self._get_bottom_countries(state, cluster, year)
+
+        with span("cluster_stats.models"):
+            return ClusterStatsResponse(
+                cluster=cluster,
+                name=cluster_name,
+                color=cluster_color,
+                countries_count=len(cluster_countries),
+                top_countries=top_countries,
+                bottom_countries=bottom_countries,
+                stability=stability,
+                indicators=indicators,
+                transitions=transitions,
+                regional_distribution=self._get_regional_distribution(cluster_countries)
+            )
     
     def _get_cluster_name(self, cluster: int) -> str:
         """Get human-readable cluster name"""
@@ -277,101 +845,48 @@ class PredictionService:
         }
         return colors.get(cluster, "#666666")
     
-    def _get_top_countries(self, cluster_countries: List[CountryCluster]) -> List[str]:
-        """Get top 5 countries in cluster (placeholder)"""
-        # TODO: Sort by development metrics later
-        return [c.country for c in cluster_countries[:5]]
+    def _get_top_countries(self, state: ServingState, cluster: int, year: int) -> List[str]:
+        """Get the 5 countries most confidently assigned to the cluster"""
+        countries = state.cluster_table.countries
+        return [countries[i] for i in state.confidence_index.top_countries(year, cluster).tolist()]
     
-    def _get_bottom_countries(self, cluster_countries: List[CountryCluster]) -> List[str]:
-        """Get countries on the edge of transition (last 5)"""
-        return [c.country for c in cluster_countries[-5:]]
+    def _get_bottom_countries(self, state: ServingState, cluster: int, year: int) -> List[str]:
+        """Get countries on the edge of transition (5 smallest logit margins to another cluster)"""
+        countries = state.cluster_table.countries
+        return [countries[i] for i in state.confidence_index.edge_countries(year, cluster).tolist()]
     
-    def _calculate_cluster_stability(self, cluster: int, year: int) -> float:
-        """Calculate cluster stability (% of countries in cluster for 2+ years)"""
+    def _calculate_cluster_stability(self, state: ServingState, cluster: int, year: int) -> float:
+        """Calculate cluster stability (% of the cluster's countries already in it the year before)"""
         if year < 2015:  # Not enough historical data
             return 0.7
         
-        # Get previous year data
-        previous_data = self.predict_clusters(year - 1)
-        if not previous_data:
+        stability = state.transition_index.stability(cluster, year)
+        if stability is None:
             return 0.5
-        
-        # Count countries that remained in the cluster
-        current_countries = {c.country for c in previous_data.clusters if c.cluster == cluster}
-        previous_countries = {c.country for c in previous_data.clusters if c.cluster == cluster}
-        
-        stable_countries = current_countries.intersection(previous_countries)
-        
-        if len(current_countries) == 0:
-            return 0.0
-        
-        return len(stable_countries) / len(current_countries)
+        return stability
     
-    def _get_cluster_indicators(self, cluster_countries: List[CountryCluster], year: int) -> List[ClusterIndicatorStats]:
-        """Get real statistics from graph features using actual feature names"""
-        
-        # Get feature mapping
-        feature_mapping = self._get_feature_mapping()
-        
-        # Get node indices for countries in this cluster
-        cluster_node_indices = []
-        for country_cluster in cluster_countries:
-            node_id = self._get_node_id_for_country_year(country_cluster.country, year)
-            if node_id is not None:
-                cluster_node_indices.append(node_id)
-        
-        if not cluster_node_indices:
+    def _get_cluster_indicators(self, state: ServingState, cluster: int, year: int) -> List[ClusterIndicatorStats]:
+        """Top 10 most informative indicators (highest variance) of a cluster, from the precomputed stats"""
+        year_row = state.cluster_table.year_index.get(year)
+        if year_row is None:
             return []
-        
-        # Extract features for these nodes (only original features, exclude masks)
-        cluster_features = self.data.x[cluster_node_indices]
-        n_original_features = len(feature_mapping)
-        
-        # Calculate statistics only for original features (not masks)
-        stats = []
-        for feature_idx, feature_name in feature_mapping.items():
-            if feature_idx >= n_original_features:
-                continue  # Skip if beyond original features
-                
-            feature_values = cluster_features[:, feature_idx].cpu().numpy()
-            
-            # Skip if all values are the same or mostly zeros
-            if np.std(feature_values) < 0.001:
-                continue
-                
-            stats.append(ClusterIndicatorStats(
-                indicator=feature_name,
-                avg_value=float(np.mean(feature_values)),
-                min_value=float(np.min(feature_values)),
-                max_value=float(np.max(feature_values)),
-                std_dev=float(np.std(feature_values))
-            ))
-        
-        # Return top 10 most informative features (highest variance)
-        stats.sort(key=lambda x: x.std_dev, reverse=True)
-        return stats[:10]
+
+        return [
+            ClusterIndicatorStats(
+                indicator=indicator,
+                avg_value=avg_value,
+                min_value=min_value,
+                max_value=max_value,
+                std_dev=std_dev
+            )
+            for indicator, avg_value, min_value, max_value, std_dev
+            in state.indicator_stats.top_indicators(year_row, cluster, k=10)
+        ]
     
     def _get_node_id_for_country_year(self, country: str, year: int) -> Optional[int]:
-        """Find node ID for specific country and year"""
-        try:
-            # For historical data - use pivot_df mapping
-            country_data = self.pivot_df[
-                (self.pivot_df['Economy'] == country) & 
-                (self.pivot_df['Year'] == year)
-            ]
-            if not country_data.empty:
-                return country_data['node_id'].iloc[0]
-            
-            # For future data - check future_data
-            if hasattr(self, 'future_data') and hasattr(self.future_data, 'countries'):
-                for i, (c, y) in enumerate(zip(self.future_data.countries, self.future_data.years)):
-                    if c == country and y == year:
-                        return i
-                        
-        except Exception as e:
-            print(f"Error finding node for {country} {year}: {e}")
-        
-        return None
+        """Find node ID for specific country and year in the graph serving that year"""
+        _, index = self._graph_for_year(self.state, year)
+        return index.node_id(country, year)
     
     def _get_feature_names(self) -> List[str]:
         """Extract actual feature names from pivot_df structure"""
@@ -385,51 +900,13 @@ class PredictionService:
             if not col.startswith('mask_') and col != 'digital_backwards_index':
                 original_features.append(col)
         
-        print(f"🔍 Found {len(original_features)} original features")
         return original_features
 
-    def _get_feature_mapping(self) -> Dict[int, str]:
-        """Create mapping from feature index to feature name"""
-        feature_names = self._get_feature_names()
-        
-        n_original = len(feature_names)
-        
-        feature_mapping = {}
-        for i, feature_name in enumerate(feature_names):
-            feature_mapping[i] = feature_name
-        
-        print(f"Feature mapping created: {n_original} features")
-        return feature_mapping
-    
-    def _get_cluster_transitions(self, cluster: int, year: int) -> Dict[str, int]:
+    def _get_cluster_transitions(self, state: ServingState, cluster: int, year: int) -> Dict[str, int]:
         """Get transitions between clusters"""
         if year < 2015:
             return {}
-        
-        # Analyze transitions from previous year
-        transitions = {}
-        current_data = self.predict_clusters(year)
-        previous_data = self.predict_clusters(year - 1)
-        
-        if not current_data or not previous_data:
-            return {}
-        
-        # Create country to cluster mapping
-        previous_clusters = {c.country: c.cluster for c in previous_data.clusters}
-        
-        for country_cluster in current_data.clusters:
-            if country_cluster.country in previous_clusters:
-                prev_cluster = previous_clusters[country_cluster.country]
-                if prev_cluster != country_cluster.cluster:
-                    # Transition from prev_cluster to current_cluster
-                    if country_cluster.cluster == cluster:
-                        key = f"from_{prev_cluster}"
-                        transitions[key] = transitions.get(key, 0) + 1
-                    elif prev_cluster == cluster:
-                        key = f"to_{country_cluster.cluster}"
-                        transitions[key] = transitions.get(key, 0) + 1
-        
-        return transitions
+        return state.transition_index.transitions(cluster, year)
     
     def _get_regional_distribution(self, cluster_countries: List[CountryCluster]) -> Dict[str, int]:
         """Get regional distribution of countries in cluster"""
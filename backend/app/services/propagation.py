@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+
+@dataclass
+class GCNWeights:
+    """Parameters of the 2-layer GCN (models.gcn_model.GCN) as plain arrays"""
+    w1: np.ndarray  # conv1.lin.weight, [hidden, in]
+    b1: np.ndarray
+    w2: np.ndarray  # conv2.lin.weight, [out, hidden]
+    b2: np.ndarray
+
+    @classmethod
+    def from_state_dict(cls, state_dict: Dict[str, np.ndarray]) -> "GCNWeights":
+        return cls(
+            w1=np.asarray(state_dict["conv1.lin.weight"], dtype=np.float32),
+            b1=np.asarray(state_dict["conv1.bias"], dtype=np.float32),
+            w2=np.asarray(state_dict["conv2.lin.weight"], dtype=np.float32),
+            b2=np.asarray(state_dict["conv2.bias"], dtype=np.float32),
+        )
+
+
+def normalized_adjacency(edge_index: np.ndarray, num_nodes: int) -> sp.csr_matrix:
+    """
+    D^-1/2 (A + I) D^-1/2 of GCNConv as a CSR matrix, rows are message targets
+
+    Same normalization as PyG's gcn_norm: existing self-loops are replaced by exactly one
+    per node, duplicate edges are summed and the degree is counted at the target.
+    """
+    edge_index = edge_index[:, edge_index[0] != edge_index[1]]
+    loops = np.arange(num_nodes)
+    row = np.concatenate([edge_index[0], loops])
+    col = np.concatenate([edge_index[1], loops])
+
+    deg_inv_sqrt = 1.0 / np.sqrt(np.bincount(col, minlength=num_nodes).astype(np.float32))
+    values = deg_inv_sqrt[row] * deg_inv_sqrt[col]
+
+    # Duplicate (target, source) pairs are summed on conversion
+    return sp.csr_matrix((values, (col, row)), shape=(num_nodes, num_nodes), dtype=np.float32)
+
+
+class PropagationEngine:
+    """
+    Inference fast path of the 2-layer GCN for a graph that does not change
+
+    GCNConv computes Â (X W) + b and renormalizes edge_index on every call. Here Â is
+    built once as a CSR operator, and since Â (X W) = (Â X) W, the first layer's
+    propagation Â X of the fixed features is precomputed too: a forward pass is then
+    one dense matmul, one small sparse-dense matmul and the biases.
+    Runs on NumPy/SciPy only, with the same outputs as the PyG model.
+    """
+
+    def __init__(self, weights: GCNWeights, x: np.ndarray, edge_index: np.ndarray):
+        self.weights = weights
+        self.adjacency = normalized_adjacency(np.asarray(edge_index), x.shape[0])
+        self.propagated_x = self.adjacency @ np.asarray(x, dtype=np.float32)
+
+    @property
+    def num_nodes(self) -> int:
+        return self.adjacency.shape[0]
+
+    def pre_activation(self, x: Optional[np.ndarray] = None) -> np.ndarray:
+        """Â X W1 + b1, for the cached features by default"""
+        propagated = self.propagated_x if x is None else self.adjacency @ np.asarray(x, dtype=np.float32)
+        return propagated @ self.weights.w1.T + self.weights.b1
+
+    def hidden(self, x: Optional[np.ndarray] = None) -> np.ndarray:
+        """First-layer activations (the 64-d node embeddings), for the cached features by default"""
+        return np.maximum(self.pre_activation(x), 0)
+
+    def logits(self, x: Optional[np.ndarray] = None, hidden: Optional[np.ndarray] = None) -> np.ndarray:
+        """Output of the GCN in eval mode, from the first-layer activations if they are known"""
+        if hidden is None:
+            hidden = self.hidden(x)
+        # 64 -> 3 first, so the sparse product only moves 3 columns per edge
+        return self.adjacency @ (hidden @ self.weights.w2.T) + self.weights.b2
+
+
+def gcn_logits(weights: GCNWeights, x: np.ndarray, edge_index: np.ndarray) -> np.ndarray:
+    """One-off GCN forward pass through the fused path, for graphs that are used once"""
+    return PropagationEngine(weights, x, edge_index).logits()
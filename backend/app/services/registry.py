@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import os
+import shutil
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import Query, Request
+
+from services.artifact_bundle import BUNDLE_DIR, current_version
+from services.prediction_service import CURRENT_YEAR, LAST_FORECAST_YEAR, PredictionService
+from services.shared_arrays import SHARED_DIR, share_array
+from services.http_cache import ResponseCache
+from services.executor import InferenceExecutor
+from services.metrics import DATA_REVISION, FORECAST_YEARS, GRAPH_EDGES, GRAPH_NODES, MODEL_INFO, MODEL_RELOADS, span
+from services.serialization import dump_model
+
+logger = logging.getLogger(__name__)
+
+# Seconds the previous model stays usable after a reload, for requests still running on it
+RETIRE_SECONDS = float(os.environ.get("MODEL_RETIRE_SECONDS", 60))
+
+
+class LoadedModel:
+    """
+    One loaded artifact version: its service, in-place update count and response cache
+
+    Requests pin the LoadedModel they start on, a reload swaps in another one.
+    """
+
+    def __init__(self, service: PredictionService, executor: InferenceExecutor):
+        self.service = service
+        self.artifact_version = service.artifact_version
+        self.revision = 0
+        self.executor = executor
+        self.response_cache = ResponseCache(self.version, executor)
+
+    @property
+    def version(self) -> str:
+        """Artifact version, suffixed with the digest of the in-place graph updates since loading"""
+        revision = self.service.state.revision
+        if not revision:
+            return self.artifact_version
+        return f"{self.artifact_version}+{revision}"
+
+    def bump_revision(self):
+        """The graph changed in place, responses of the previous content are not served anymore"""
+        self.revision += 1
+        self.response_cache = ResponseCache(self.version, self.executor)
+
+    def warm(self):
+        """Index the embeddings and pre-render the responses of the historical years, keyed like the endpoints key them"""
+        service = self.service
+        state = service.state
+        cache = self.response_cache
+        service.get_similarity_index()
+        for year in state.node_index.years:
+            cache.prerender(("clusters", year), lambda: dump_model(service.predict_clusters(year)))
+            for cluster in range(state.cluster_table.n_clusters):
+                cache.prerender(
+                    ("cluster-stats", year, cluster),
+                    lambda: _dump_optional(service.get_cluster_stats(year, cluster))
+                )
+
+    def close(self):
+        forecaster = self.service.state.forecaster
+        if forecaster is not None:
+            forecaster.shutdown()
+
+
+class ModelRegistry:
+    """
+    Single owner of the loaded models and data of a worker process
+
+    Created once by the FastAPI lifespan and handed to the endpoints through
+    dependency injection. The graphs are memory-mapped from the artifact bundle
+    and the cluster table computed at startup is moved into memory-mapped files
+    keyed by the artifact version, so N uvicorn workers map one copy instead of
+    holding N private ones.
+
+    reload() loads and warms the version the bundle CURRENT pointer names on a
+    background thread, then swaps it in with a single assignment. Requests keep the
+    model they started on, the previous one is closed after a grace period and its
+    shared files are removed. Mappings that workers still hold stay valid.
+    """
+
+    def __init__(self, shared_dir: str = SHARED_DIR, bundle_dir: str = BUNDLE_DIR):
+        self.shared_dir = shared_dir
+        self.bundle_dir = bundle_dir
+        self.model: Optional[LoadedModel] = None
+        self.executor = InferenceExecutor()
+        self._reload_lock = asyncio.Lock()
+        self._failed_version: Optional[str] = None
+
+    @property
+    def service(self) -> Optional[PredictionService]:
+        return self.model.service if self.model else None
+
+    @property
+    def artifact_version(self) -> Optional[str]:
+        return self.model.artifact_version if self.model else None
+
+    @property
+    def revision(self) -> int:
+        return self.model.revision if self.model else 0
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.model.version if self.model else None
+
+    @property
+    def response_cache(self) -> Optional[ResponseCache]:
+        return self.model.response_cache if self.model else None
+
+    def load(self) -> PredictionService:
+        """Load the models and data, blocking, for the startup of the worker"""
+        self.model = self._load_model()
+        return self.model.service
+
+    async def reload(self, force: bool = False) -> Dict[str, Optional[str]]:
+        """
+        Load the current bundle version and swap it in, unless it is already served
+
+        Loading runs on a thread, so requests are answered by the previous model
+        meanwhile. If it fails, the previous model keeps serving and the error is raised.
+        """
+        async with self._reload_lock:
+            previous = self.model
+            version = current_version(self.bundle_dir)
+            if not force and (version is None or version == previous.artifact_version):
+                MODEL_RELOADS.inc("unchanged")
+                return {"status": "unchanged", "version": previous.artifact_version}
+
+            logger.info("🔄 Reloading artifact bundle %s (serving %s)...", version, previous.artifact_version)
+            loop = asyncio.get_running_loop()
+            try:
+                with span("reload.total"):
+                    model = await loop.run_in_executor(None, self._load_model)
+            except Exception:
+                MODEL_RELOADS.inc("failed")
+                self._failed_version = version
+                raise
+
+            # The swap: requests that already pinned the previous model finish on it
+            self.model = model
+            self._failed_version = None
+            loop.call_later(RETIRE_SECONDS, self._retire, previous)
+
+            MODEL_RELOADS.inc("reloaded")
+            logger.info("✅ Serving artifact bundle %s", model.artifact_version)
+            return {"status": "reloaded", "version": model.artifact_version, "previous_version": previous.artifact_version}
+
+    async def watch(self, interval: float):
+        """Reload whenever the CURRENT pointer moves to another version, checked every interval seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            version = current_version(self.bundle_dir)
+            if version is None or version in (self.artifact_version, self._failed_version):
+                continue
+            try:
+                await self.reload()
+            except Exception:
+                logger.exception("❌ Could not load bundle %s, still serving %s", version, self.artifact_version)
+
+    def append_nodes(self, *args, **kwargs):
+        """PredictionService.append_nodes, then invalidate the responses of the previous graph"""
+        affected = self.service.append_nodes(*args, **kwargs)
+        self.model.bump_revision()
+        return affected
+
+    async def ensure_forecast(self, year: int, model: Optional[LoadedModel] = None):
+        """
+        Wait for the forecast up to a year, computed in the background on first use
+
+        Once it lands in the cluster table the revision is bumped, so responses
+        rendered from the forecast graph are not served anymore.
+        """
+        model = model or self.model
+        future = model.service.request_forecast(year)
+        if future is None:
+            return
+
+        steps = await asyncio.wrap_future(future)
+        if model.service.apply_forecast(steps):
+            model.bump_revision()
+
+    async def iter_clusters_range(
+        self, from_year: int, to_year: int, columnar: bool = False, model: Optional[LoadedModel] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        PredictionService.iter_clusters_range without waiting for the whole forecast first
+
+        Years the cluster table already holds are sent right away, the forecast of every
+        later year is awaited on its own, so each year is sent as soon as it is rolled out.
+        """
+        model = model or self.model
+        service = model.service
+        ready_to = service.ready_until(to_year)
+        for payload in service.iter_clusters_range(from_year, ready_to, columnar):
+            yield payload
+
+        for year in range(max(from_year, ready_to + 1), to_year + 1):
+            await self.ensure_forecast(year, model)
+            payloads = service.iter_clusters_range(year, year, columnar)
+            if columnar:
+                # The country table was the first line already
+                next(payloads)
+            for payload in payloads:
+                yield payload
+
+    def update_metrics(self):
+        """Set the version and graph size gauges, called before every scrape"""
+        service = self.service
+        state = service.state
+        MODEL_INFO.clear()
+        MODEL_INFO.set(1, self.artifact_version, str(service.feature_predictor is not None).lower())
+        DATA_REVISION.set(self.revision)
+        for graph, data in (("historical", state.data), ("future", service.future_data)):
+            GRAPH_NODES.set(data.x.shape[0], graph)
+            GRAPH_EDGES.set(data.edge_index.shape[1], graph)
+        FORECAST_YEARS.set(len(state.forecast_graphs))
+
+    def close(self):
+        self.executor.shutdown()
+        if self.model is not None:
+            self.model.close()
+
+    def _load_model(self) -> LoadedModel:
+        """Load, move the computed buffers to shared memory and pre-render the common responses"""
+        service = PredictionService()
+        self._share_buffers(service)
+
+        model = LoadedModel(service, self.executor)
+        with span("load.warm"):
+            model.warm()
+        return model
+
+    def _retire(self, model: LoadedModel):
+        """Close a model swapped out by reload and drop its shared buffers, unless its version is served again"""
+        model.close()
+        if model.artifact_version != self.artifact_version:
+            shutil.rmtree(os.path.join(self.shared_dir, model.artifact_version), ignore_errors=True)
+
+    def _share_buffers(self, service: PredictionService):
+        directory = os.path.join(self.shared_dir, service.artifact_version)
+        table = service.state.cluster_table
+        # Read-only: appended nodes and forecasts publish a new table, this one is never written
+        table.clusters = share_array(table.clusters, os.path.join(directory, "clusters.npy"))
+        table.logits = share_array(table.logits, os.path.join(directory, "logits.npy"))
+
+
+def _dump_optional(result) -> Optional[bytes]:
+    return dump_model(result) if result else None
+
+
+def _pinned_model(request: Request) -> LoadedModel:
+    """Model of the registry when the request first asked for it, kept across a reload"""
+    model = getattr(request.state, "model", None)
+    if model is None:
+        model = request.state.model = request.app.state.registry.model
+    return model
+
+
+def get_loaded_model(request: Request) -> LoadedModel:
+    """FastAPI dependency returning the model the request is served from"""
+    return _pinned_model(request)
+
+
+def get_prediction_service(request: Request) -> PredictionService:
+    """FastAPI dependency returning the service of the app's registry"""
+    return _pinned_model(request).service
+
+
+def get_executor(request: Request) -> InferenceExecutor:
+    """FastAPI dependency returning the worker's inference executor"""
+    return request.app.state.registry.executor
+
+
+def get_response_cache(request: Request) -> ResponseCache:
+    """FastAPI dependency returning the response cache of the loaded artifact version"""
+    return _pinned_model(request).response_cache
+
+
+async def get_forecast_cache(request: Request, year: int) -> ResponseCache:
+    """get_response_cache for endpoints of one year, after forecasting it if needed"""
+    return await _forecast_cache(request, year)
+
+
+async def get_forecast_range_cache(request: Request, to_year: int = Query(2028, alias="to")) -> ResponseCache:
+    """get_response_cache for endpoints of a year range, after forecasting it if needed"""
+    return await _forecast_cache(request, to_year)
+
+
+async def get_trends_cache(request: Request, to_year: int = 2025) -> ResponseCache:
+    """get_response_cache for trends over a year window, after forecasting the future years it covers"""
+    return await _forecast_cache(request, min(to_year, LAST_FORECAST_YEAR))
+
+
+async def get_country_trends_cache(request: Request) -> ResponseCache:
+    """get_response_cache for the trends of one country, which end in the current year"""
+    return await _forecast_cache(request, CURRENT_YEAR)
+
+
+async def get_similar_cache(request: Request, year: Optional[int] = None) -> ResponseCache:
+    """get_response_cache for similar countries in one year, or in every year of the table"""
+    return await _forecast_cache(request, LAST_FORECAST_YEAR if year is None else year)
+
+
+async def _forecast_cache(request: Request, year: int) -> ResponseCache:
+    """
+    Response cache after the forecast up to a year landed in the cluster table
+
+    Responses that cover future years are then rendered from the rolled-out years only,
+    not from whichever mix of rolled-out and forecast-graph years another request left.
+    """
+    model = _pinned_model(request)
+    await request.app.state.registry.ensure_forecast(year, model)
+    return model.response_cache
@@ -0,0 +1,32 @@
+import json
+
+from pydantic import BaseModel
+
+from services.metrics import span
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is only slower
+    orjson = None
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.digital-inequality.columnar+json"
+
+
+def dumps(payload) -> bytes:
+    """Encode a payload that may contain numpy arrays and int dict keys to JSON bytes"""
+    with span("serialize"):
+        if orjson is not None:
+            return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(payload, default=_to_builtin, separators=(",", ":")).encode()
+
+
+def dump_model(model: BaseModel) -> bytes:
+    """JSON bytes of a response model"""
+    with span("serialize"):
+        return model.model_dump_json().encode()
+
+
+def _to_builtin(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,62 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from services.cluster_table import ClusterTable
+from services.confidence_index import ConfidenceIndex
+from services.country_table import CountryTable
+from services.graph import Graph
+from services.incremental import IncrementalGCN
+from services.indicator_stats import IndicatorStats
+from services.node_index import NodeIndex
+from services.propagation import PropagationEngine
+from services.similarity_index import SimilarityIndex
+from services.transition_index import TransitionIndex
+from services.trend_index import TrendIndex
+
+if TYPE_CHECKING:
+    from services.forecaster import Forecaster
+
+
+@dataclass
+class ServingState:
+    """
+    What the service answers from and in-place updates change, published as one object
+
+    Appending nodes and applying forecasts build a new state next to the served one and
+    swap it in with a single assignment to PredictionService.state, like a reload swaps
+    the whole model. A request reads the state once, so it never sees a grown cluster
+    table together with the indexes of the previous one. Parts that a new state shares
+    with the previous one are not modified anymore.
+    """
+    data: Graph
+    countries: CountryTable
+    node_index: NodeIndex
+    propagation: PropagationEngine
+    incremental: IncrementalGCN
+    cluster_table: ClusterTable
+    # Derived from the cluster table, see PredictionService._with_table
+    trend_index: Optional[TrendIndex] = None
+    transition_index: Optional[TransitionIndex] = None
+    confidence_index: Optional[ConfidenceIndex] = None
+    indicator_stats: Optional[IndicatorStats] = None
+    forecaster: Optional["Forecaster"] = None
+    # Year -> (graph, node index) of forecasts that replaced the forecast graph
+    forecast_graphs: Dict[int, Tuple[Graph, NodeIndex]] = field(default_factory=dict)
+    # Built on first use, see PredictionService.get_similarity_index
+    similarity_index: Optional[SimilarityIndex] = None
+    # Chained digest of the nodes appended since loading, see PredictionService.append_nodes
+    appended: str = ""
+
+    @property
+    def revision(self) -> str:
+        """
+        Digest of the in-place updates since loading, empty if there were none
+
+        Derived from the content: workers that applied the same appends and rolled the
+        forecast out to the same years serve the same bodies under the same revision.
+        """
+        if not self.appended and not self.forecast_graphs:
+            return ""
+        updates = f"{self.appended}:{sorted(self.forecast_graphs)}"
+        return hashlib.sha256(updates.encode()).hexdigest()[:12]
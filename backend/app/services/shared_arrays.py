@@ -0,0 +1,56 @@
+import hashlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARED_DIR = os.environ.get(
+    "SHARED_ARRAY_DIR",
+    "/dev/shm/digital-inequality" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "digital-inequality"),
+)
+
+
+def share_array(array: np.ndarray, path: str, writable: bool = False) -> np.ndarray:
+    """
+    Back an array by a memory-mapped .npy file so that every worker maps the same pages
+
+    The first process to get here writes the file through a temporary file and a rename,
+    the others only map it. A file is only served if its shape, dtype and content match
+    the array this process computed itself; anything else (a file of another build with
+    the same version string, a foreign file) is left alone and the private array returned.
+    Writable mappings are copy-on-write: pages stay shared until someone writes to them.
+    """
+    array = np.ascontiguousarray(array)
+    try:
+        if not os.path.exists(path):
+            _write(array, path)
+        shared = np.load(path, mmap_mode="c" if writable else "r")
+    except (OSError, ValueError):
+        logger.warning("⚠️ Could not share %s, serving a private copy", path, exc_info=True)
+        return array
+
+    if shared.shape != array.shape or shared.dtype != array.dtype or _digest(shared) != _digest(array):
+        logger.warning("⚠️ %s does not hold the computed array, serving a private copy", path)
+        return array
+    return shared
+
+
+def _write(array: np.ndarray, path: str):
+    """Write a .npy file that other processes only ever see complete"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _digest(array: np.ndarray) -> bytes:
+    return hashlib.sha256(np.ascontiguousarray(array).view(np.uint8)).digest()
@@ -0,0 +1,139 @@
+from typing import Tuple
+
+import numpy as np
+
+# Index rows and queries scored per matmul, the score block is QUERY_BATCH × BLOCK_ROWS floats
+BLOCK_ROWS = 16384
+QUERY_BATCH = 256
+
+
+class SimilarityIndex:
+    """
+    Cosine nearest neighbours of (country, year) nodes in the GCN's hidden-layer embedding space
+
+    Embeddings are L2-normalized once, so cosine similarity is a dot product and the
+    neighbours of a batch of queries come from matmuls against blocks of the index.
+    Only the k best candidates of every query are kept across blocks, later blocks only
+    contribute the scores above a query's current k-th best, so memory stays at
+    queries × block and selection stays cheap whatever the node count. Rows are sorted by
+    (year, country): a query restricted to its own year only scans that year's rows.
+    """
+
+    def __init__(self, embeddings: np.ndarray, country_ids: np.ndarray, years: np.ndarray):
+        country_ids = np.asarray(country_ids, dtype=np.int64)
+        years = np.asarray(years, dtype=np.int64)
+        order = np.lexsort((country_ids, years))
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)[order]
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        # A node whose activations are all zero is similar to nothing
+        self.embeddings = embeddings / np.where(norms > 0, norms, 1)
+        self.country_ids = country_ids[order]
+        self.years = years[order]
+
+        # Rows of a year are one contiguous range, (year, country) keys are sorted
+        self.year_values, self.year_starts = np.unique(self.years, return_index=True)
+        self.year_ends = np.append(self.year_starts[1:], len(self.years))
+        self._stride = int(self.country_ids.max()) + 1 if len(self.country_ids) else 1
+        self._keys = self.years * self._stride + self.country_ids
+
+    def __len__(self) -> int:
+        return len(self.country_ids)
+
+    def rows(self, country_ids: np.ndarray, years: np.ndarray) -> np.ndarray:
+        """Index rows of (country, year) pairs, -1 for pairs without a node"""
+        country_ids = np.asarray(country_ids, dtype=np.int64)
+        keys = np.asarray(years, dtype=np.int64) * self._stride + country_ids
+        if len(self._keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+
+        rows = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        # Ids past the stride would alias a key of another year
+        found = (country_ids >= 0) & (country_ids < self._stride) & (self._keys[rows] == keys)
+        return np.where(found, rows, -1)
+
+    def neighbours(self, rows: np.ndarray, k: int, same_year: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k most similar rows of every query row, other countries only, most similar first
+
+        Returns (rows, similarities), both [queries, k], rows are -1 past the number
+        of candidates. With same_year, candidates are the query's year only.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        best_rows = np.full((len(rows), k), -1, dtype=np.int64)
+        best_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+        if len(rows) == 0 or k == 0:
+            return best_rows, best_scores
+
+        if same_year:
+            year_rows = np.searchsorted(self.year_values, self.years[rows])
+            for year_row in np.unique(year_rows).tolist():
+                queries = np.flatnonzero(year_rows == year_row)
+                best_rows[queries], best_scores[queries] = self._search(
+                    rows[queries], k, int(self.year_starts[year_row]), int(self.year_ends[year_row])
+                )
+        else:
+            best_rows, best_scores = self._search(rows, k, 0, len(self))
+        return best_rows, best_scores
+
+    def _search(self, rows: np.ndarray, k: int, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top k of index rows [start, end) for every query row, in query batches and row blocks"""
+        best_rows = np.full((len(rows), k), -1, dtype=np.int64)
+        best_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+
+        for first in range(0, len(rows), QUERY_BATCH):
+            batch = slice(first, first + QUERY_BATCH)
+            queries = self.embeddings[rows[batch]]
+            query_countries = self.country_ids[rows[batch], None]
+            top_rows, top_scores = best_rows[batch], best_scores[batch]
+
+            for block in range(start, end, BLOCK_ROWS):
+                block_end = min(block + BLOCK_ROWS, end)
+                scores = queries @ self.embeddings[block:block_end].T
+                # The query country is not its own neighbour, in any year
+                scores[self.country_ids[block:block_end] == query_countries] = -np.inf
+
+                threshold = top_scores.min(axis=1)
+                if np.isneginf(threshold).any():
+                    columns = _top_columns(scores, k)
+                    top_rows = np.concatenate([top_rows, columns + block], axis=1)
+                    top_scores = np.concatenate([top_scores, np.take_along_axis(scores, columns, axis=1)], axis=1)
+                    keep = _top_columns(top_scores, k)
+                    top_rows = np.take_along_axis(top_rows, keep, axis=1)
+                    top_scores = np.take_along_axis(top_scores, keep, axis=1)
+                else:
+                    # Once every top k is full, only scores above its k-th best can enter it
+                    query, column = np.nonzero(scores > threshold[:, None])
+                    if len(query):
+                        top_rows, top_scores = _merge(top_rows, top_scores, query, column + block, scores[query, column])
+
+            # Only k candidates per query are left to order, ties by row
+            order = np.lexsort((top_rows, -top_scores), axis=1)
+            top_rows = np.take_along_axis(top_rows, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            best_rows[batch] = np.where(np.isfinite(top_scores), top_rows, -1)
+            best_scores[batch] = top_scores
+
+        return best_rows, best_scores
+
+
+def _merge(top_rows: np.ndarray, top_scores: np.ndarray, query: np.ndarray, rows: np.ndarray,
+           scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Top k of every query after adding (query, row, score) candidates, by one sort of the candidates"""
+    n_queries, k = top_rows.shape
+    query = np.concatenate([np.repeat(np.arange(n_queries), k), query])
+    rows = np.concatenate([top_rows.ravel(), rows])
+    scores = np.concatenate([top_scores.ravel(), scores])
+
+    order = np.lexsort((-scores, query))
+    query, rows, scores = query[order], rows[order], scores[order]
+    # Every query keeps at least its k current entries, so exactly k survive per query
+    keep = np.arange(len(query)) - np.searchsorted(query, query) < k
+    return rows[keep].reshape(n_queries, k), scores[keep].reshape(n_queries, k)
+
+
+def _top_columns(scores: np.ndarray, k: int) -> np.ndarray:
+    """Columns of the k largest scores of every row, unordered"""
+    if scores.shape[1] <= k:
+        return np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
@@ -0,0 +1,76 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from services.cluster_table import ClusterTable
+
+
+class TransitionIndex:
+    """
+    K×K cluster transition matrices of every pair of consecutive years of the cluster table
+
+    matrices[i, a, b] counts the countries in cluster a in years[i] and in cluster b in
+    years[i + 1]. Countries are aligned by their column in the table, one without a node
+    in either year is not counted. counts[i, k] is the size of cluster k in years[i].
+    """
+
+    def __init__(self, table: ClusterTable):
+        self.table = table
+        clusters = table.clusters
+        n_years = clusters.shape[0]
+        k = table.n_clusters
+
+        present = clusters >= 0
+        rows = np.broadcast_to(np.arange(n_years)[:, None], clusters.shape)
+        self.counts = np.bincount(
+            (rows * k + clusters)[present], minlength=n_years * k
+        ).reshape(n_years, k)
+
+        # One bincount over (pair, from, to) keys of all consecutive rows at once
+        n_pairs = max(n_years - 1, 0)
+        both = present[:-1] & present[1:]
+        keys = (rows[:-1] * k + clusters[:-1]) * k + clusters[1:]
+        self.matrices = np.bincount(keys[both], minlength=n_pairs * k * k).reshape(n_pairs, k, k)
+
+    def pair(self, year: int) -> Optional[int]:
+        """Index of the matrix from the previous table year into year, None for the first or an unknown year"""
+        row = self.table.year_index.get(year)
+        if row is None or row == 0:
+            return None
+        return row - 1
+
+    def window(self, from_year: int, to_year: int):
+        """Matrix range [start, end] of the consecutive pairs within the year window, None if empty"""
+        start = int(np.searchsorted(self.table.years, from_year, side="left"))
+        end = int(np.searchsorted(self.table.years, to_year, side="right")) - 2
+        if start > end:
+            return None
+        return start, end
+
+    def stability(self, cluster: int, year: int) -> Optional[float]:
+        """Share of the countries of a cluster in year that were already in it the year before"""
+        pair = self.pair(year)
+        if pair is None:
+            return None
+
+        size = self.counts[pair + 1, cluster]
+        if size == 0:
+            return 0.0
+        return float(self.matrices[pair, cluster, cluster] / size)
+
+    def transitions(self, cluster: int, year: int) -> Dict[str, int]:
+        """Countries that moved into the cluster (from_<k>) and out of it (to_<k>) since the year before"""
+        pair = self.pair(year)
+        if pair is None:
+            return {}
+
+        matrix = self.matrices[pair]
+        transitions = {}
+        for other in range(self.table.n_clusters):
+            if other == cluster:
+                continue
+            if matrix[other, cluster]:
+                transitions[f"from_{other}"] = int(matrix[other, cluster])
+            if matrix[cluster, other]:
+                transitions[f"to_{other}"] = int(matrix[cluster, other])
+        return transitions
@@ -0,0 +1,80 @@
+import numpy as np
+
+from services.cluster_table import ClusterTable
+
+
+class TrendIndex:
+    """
+    Prefix sums over the cluster table for O(1) trend statistics of any year window
+
+    For every country the history is the sequence of years where the country has a node,
+    a change is counted whenever its cluster differs from the previous such year.
+    """
+
+    def __init__(self, table: ClusterTable):
+        self.table = table
+        clusters = table.clusters
+
+        present = clusters >= 0
+        n_years, n_countries = clusters.shape
+        rows = np.arange(n_years)[:, None]
+
+        # Index of the last present row at or before each row (-1 if none)
+        self.last_valid = np.maximum.accumulate(np.where(present, rows, -1), axis=0)
+        # Index of the first present row at or after each row (n_years if none)
+        self.next_valid = np.minimum.accumulate(np.where(present, rows, n_years)[::-1], axis=0)[::-1]
+
+        # Cluster of the previous present row, compared with the current one
+        previous_row = np.vstack([np.full((1, n_countries), -1), self.last_valid[:-1]])
+        previous_cluster = np.take_along_axis(clusters, np.maximum(previous_row, 0), axis=0)
+        changed = present & (previous_row >= 0) & (previous_cluster != clusters)
+
+        zeros = np.zeros((1, n_countries), dtype=np.int64)
+        self.present_prefix = np.vstack([zeros, np.cumsum(present, axis=0)])
+        self.change_prefix = np.vstack([zeros, np.cumsum(changed, axis=0)])
+
+    def window(self, from_year: int, to_year: int):
+        """Row range [start, end] of the table covering the year window, None if empty"""
+        start = int(np.searchsorted(self.table.years, from_year, side="left"))
+        end = int(np.searchsorted(self.table.years, to_year, side="right")) - 1
+        if start > end:
+            return None
+        return start, end
+
+    def summarize(self, country_ids: np.ndarray, from_year: int, to_year: int):
+        """
+        Trend statistics for many countries over one year window
+
+        Returns a dict of arrays aligned with country_ids: first/last present row,
+        number of observed years, cluster changes, stability score and trend sign
+        (1 improving, -1 declining, 0 stable). Countries without data have n_years == 0.
+        """
+        country_ids = np.asarray(country_ids, dtype=np.int64)
+        rows = self.window(from_year, to_year)
+        if rows is None:
+            empty = np.zeros(len(country_ids), dtype=np.int64)
+            return {"first": empty, "last": empty, "n_years": empty, "changes": empty,
+                    "stability": np.ones(len(country_ids)), "trend": empty}
+        start, end = rows
+
+        first = self.next_valid[start, country_ids]
+        last = self.last_valid[end, country_ids]
+        n_years = self.present_prefix[end + 1, country_ids] - self.present_prefix[start, country_ids]
+
+        has_data = n_years > 0
+        first_clipped = np.where(has_data, first, start)
+        last_clipped = np.where(has_data, last, start)
+
+        # Changes strictly after the first observed year of the window
+        changes = self.change_prefix[end + 1, country_ids] - self.change_prefix[first_clipped + 1, country_ids]
+        changes = np.where(has_data, changes, 0)
+
+        max_changes = np.maximum(n_years - 1, 1)
+        stability = np.where(n_years > 1, 1.0 - changes / max_changes, 1.0)
+
+        clusters = self.table.clusters
+        trend = np.sign(clusters[last_clipped, country_ids] - clusters[first_clipped, country_ids])
+        trend = np.where(n_years > 1, trend, 0)
+
+        return {"first": first_clipped, "last": last_clipped, "n_years": n_years,
+                "changes": changes, "stability": stability, "trend": trend}
@@ -0,0 +1,48 @@
+"""
+Fixtures of the service tests
+
+Tests run from the backend/app directory against the served artifact bundle, like the
+service itself: data/bundle, built from the source files on first use.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def app_dir():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(APP_DIR)
+        yield APP_DIR
+
+
+@pytest.fixture(scope="session")
+def service():
+    """Service loaded once, for tests that only read from it"""
+    from services.prediction_service import PredictionService
+    return PredictionService()
+
+
+@pytest.fixture
+def fresh_service():
+    """Service of its own, for tests that change it"""
+    from services.prediction_service import PredictionService
+    service = PredictionService()
+    yield service
+    if service.state.forecaster is not None:
+        service.state.forecaster.shutdown()
+
+
+@pytest.fixture
+def client():
+    """HTTP client of a freshly started app, like a new worker"""
+    from fastapi.testclient import TestClient
+    from main import app
+    with TestClient(app) as client:
+        yield client
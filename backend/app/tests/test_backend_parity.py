@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("torch_geometric")
+
+from benchmarks.backend_parity import torch_outputs
+from services.artifact_bundle import ArtifactBundle
+from services.minibatch import MiniBatchGCN
+from services.propagation import GCNWeights, PropagationEngine
+from services.what_if import WhatIfEngine
+
+ATOL = 1e-5
+# The forecast graph holds unscaled values up to ~1e4, where float32 itself only resolves ~1e-3
+RELATIVE = 1e-6
+
+
+def assert_matches(actual: np.ndarray, expected: np.ndarray):
+    np.testing.assert_allclose(actual, expected, atol=max(ATOL, RELATIVE * float(np.abs(expected).max())))
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    return ArtifactBundle.open()
+
+
+@pytest.fixture(scope="module")
+def weights(bundle):
+    return GCNWeights.from_state_dict(bundle.state_dict())
+
+
+@pytest.mark.parametrize("graph", ["graph", "future"])
+def test_propagation_matches_the_pyg_model(bundle, weights, graph):
+    x, edge_index = bundle.features(f"{graph}_x"), bundle.array(f"{graph}_edge_index")
+    hidden, logits = torch_outputs(bundle.state_dict(), x, edge_index)
+
+    engine = PropagationEngine(weights, x, edge_index)
+    assert_matches(engine.hidden(), hidden)
+    assert_matches(engine.logits(), logits)
+
+
+def test_what_if_matches_the_pyg_model_on_changed_features(bundle, weights):
+    x, edge_index = bundle.features("graph_x"), bundle.array("graph_edge_index")
+    rng = np.random.default_rng(0)
+    nodes = rng.choice(x.shape[0], 5, replace=False)
+    deltas = rng.normal(size=(len(nodes), x.shape[1])).astype(np.float32)
+
+    scenario_rows, affected, scores = WhatIfEngine(PropagationEngine(weights, x, edge_index)).score(nodes, deltas)
+
+    for scenario, (node, delta) in enumerate(zip(nodes, deltas)):
+        x_changed = np.array(x)
+        x_changed[node] += delta
+        _, expected = torch_outputs(bundle.state_dict(), x_changed, edge_index)
+        rows = scenario_rows == scenario
+        assert node in affected[rows]
+        assert_matches(scores[rows], expected[affected[rows]])
+
+
+def test_minibatch_matches_the_pyg_model(bundle, weights):
+    x, edge_index = bundle.features("graph_x"), bundle.array("graph_edge_index")
+    _, expected = torch_outputs(bundle.state_dict(), x, edge_index)
+    nodes = np.random.default_rng(0).permutation(x.shape[0])
+
+    model = MiniBatchGCN(weights, x, edge_index, batch_size=64)
+    try:
+        assert_matches(model.logits(nodes), expected[nodes])
+    finally:
+        model.close()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torch_geometric")
+
+from models.feature_predictor import FeaturePredictor
+from pipeline.build_bundle import DATASET_PATH, GRAPH_PATH
+from services.forecaster import Forecaster
+
+HORIZON = 2
+
+
+def notebook_rollout(predictor: FeaturePredictor, base_year: int, horizon: int) -> dict:
+    """
+    predict_future_features of the forecasting notebook, by country name
+
+    Nodes of the .pt graph are pivot rows in pivot_table order, every country starts
+    from its row of base_year or else its latest one.
+    """
+    from torch_geometric.utils import subgraph
+
+    data = torch.load(GRAPH_PATH, weights_only=False)
+    pivot_df = pd.read_csv(DATASET_PATH).pivot_table(
+        index=["Economy", "Year"], columns="Indicator", values="Value"
+    ).reset_index()
+    pivot_df = pivot_df[pivot_df["Year"] <= base_year]
+    latest = pivot_df.groupby("Economy", sort=True)["Year"].idxmax()
+
+    nodes = torch.tensor(latest.to_numpy(), dtype=torch.long)
+    mask = torch.zeros(data.x.shape[0], dtype=torch.bool)
+    mask[nodes] = True
+    edge_index, _ = subgraph(mask, data.edge_index, relabel_nodes=True, num_nodes=data.x.shape[0])
+
+    x = data.x[nodes]
+    with torch.no_grad():
+        for _ in range(horizon):
+            x = predictor(x, edge_index)
+    return dict(zip(latest.index, x.numpy()))
+
+
+def test_rollout_matches_the_notebook_by_country(service):
+    torch.manual_seed(0)
+    predictor = FeaturePredictor(input_dim=service.state.data.x.shape[1]).eval()
+    base_year = max(service.state.data.node_offset)
+    forecaster = Forecaster(
+        predictor, service.gcn_weights, service.state.data.x, service.state.data.edge_index,
+        service.state.node_index.node_country_ids, service.state.node_index.node_years, base_year
+    )
+    try:
+        steps = forecaster.forecast(HORIZON).result()
+    finally:
+        forecaster.shutdown()
+
+    expected = notebook_rollout(predictor, base_year, HORIZON)
+    countries = [service.state.countries[country_id] for country_id in forecaster.country_ids.tolist()]
+    assert sorted(countries) == sorted(expected)
+    assert steps[-1].year == base_year + HORIZON
+    for country, features in zip(countries, steps[-1].x):
+        np.testing.assert_allclose(features, expected[country], atol=1e-4, err_msg=country)
+
+
+def test_range_stream_sends_each_year_once_it_is_ready(fresh_service):
+    import asyncio
+    from dataclasses import replace
+    from services.registry import LoadedModel, ModelRegistry
+
+    service = fresh_service
+    torch.manual_seed(0)
+    service.feature_predictor = FeaturePredictor(input_dim=service.state.data.x.shape[1]).eval()
+    state = service.state
+    service.state = replace(state, forecaster=service._create_forecaster(state.data, state.node_index))
+    base_year = service.state.forecaster.base_year
+
+    registry = ModelRegistry()
+    registry.model = LoadedModel(service, registry.executor)
+
+    async def stream():
+        # Forecast years in the table when each payload was sent
+        return [
+            (payload, sorted(service.state.forecast_graphs))
+            async for payload in registry.iter_clusters_range(base_year - 2, base_year + 3)
+        ]
+
+    try:
+        sent = asyncio.run(stream())
+    finally:
+        registry.close()
+
+    assert [payload["year"] for payload, _ in sent] == list(range(base_year - 2, base_year + 4))
+    for payload, forecast_years in sent:
+        assert forecast_years == list(range(base_year + 1, max(payload["year"], base_year) + 1))
+    assert [payload for payload, _ in sent] == list(service.iter_clusters_range(base_year - 2, base_year + 3))
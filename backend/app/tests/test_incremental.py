@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from services.incremental import IncrementalGCN
+from services.propagation import gcn_logits
+
+
+def new_nodes(service, year: int, countries):
+    """Features and edges of nodes appended for countries in a year, linked to the last year's nodes"""
+    data = service.state.data
+    last_nodes = service.state.node_index.year_nodes(max(data.node_offset))
+    n_old, n_new = data.x.shape[0], len(countries)
+    rng = np.random.default_rng(year)
+
+    seeds = rng.choice(last_nodes, size=n_new, replace=False)
+    x_new = np.asarray(data.x[seeds]).copy()
+    x_new[:, :len(service.feature_names)] += rng.normal(0, 0.1, size=(n_new, len(service.feature_names)))
+
+    new_ids = np.arange(n_old, n_old + n_new)
+    links = np.stack([
+        np.concatenate([new_ids, new_ids, new_ids[:-1]]),
+        np.concatenate([seeds, rng.choice(last_nodes, size=n_new), new_ids[1:]]),
+    ])
+    return x_new.astype(np.float32), np.concatenate([links, links[::-1]], axis=1)
+
+
+@pytest.mark.parametrize("year, countries", [
+    (2024, ["Atlantis", "Lemuria", "Mu"]),
+    (2025, ["Germany", "France", "Japan", "Brazil"]),
+])
+def test_append_matches_full_recompute(fresh_service, year, countries):
+    service = fresh_service
+    x_new, edge_index_new = new_nodes(service, year, countries)
+    before = service.state.incremental.out.copy()
+
+    affected = service.append_nodes(year, countries, x_new, edge_index_new)
+
+    state = service.state
+    full = gcn_logits(service.gcn_weights, np.asarray(state.data.x), state.data.edge_index)
+    np.testing.assert_allclose(state.incremental.out, full, atol=1e-5)
+    # Outputs outside the two-hop neighbourhood of the new edges do not change
+    unaffected = np.setdiff1d(np.arange(len(before)), affected)
+    np.testing.assert_allclose(full[unaffected], before[unaffected], atol=1e-5)
+
+    # The cluster table computed from scratch on the extended graph
+    rebuilt = IncrementalGCN(service.gcn_weights, state.data.x, state.data.edge_index)
+    expected = service._build_cluster_table(state.node_index, rebuilt.out, state.countries)
+
+    table = state.cluster_table
+    np.testing.assert_array_equal(table.years, expected.years)
+    np.testing.assert_array_equal(table.clusters, expected.clusters)
+    np.testing.assert_allclose(table.logits, expected.logits, atol=1e-5)
+
+    for country in countries:
+        node_id = state.node_index.node_id(country, year)
+        assert node_id is not None and node_id >= len(full) - len(countries)
+        assert table.lookup(table.find_country(country), year) == int(full[node_id].argmax())
+
+
+def test_append_leaves_the_served_state_unchanged(fresh_service):
+    service = fresh_service
+    x_new, edge_index_new = new_nodes(service, 2025, ["Atlantis", "Germany"])
+    previous = service.state
+    n_nodes, n_edges, n_countries = previous.data.x.shape[0], previous.data.edge_index.shape[1], len(previous.countries)
+    offsets = dict(previous.data.node_offset)
+    out, clusters = previous.incremental.out.copy(), previous.cluster_table.clusters.copy()
+
+    service.append_nodes(2025, ["Atlantis", "Germany"], x_new, edge_index_new)
+
+    assert service.state is not previous
+    assert (previous.data.x.shape[0], previous.data.edge_index.shape[1]) == (n_nodes, n_edges)
+    assert previous.data.node_offset == offsets
+    assert len(previous.countries) == n_countries and previous.countries.find("Atlantis") is None
+    assert previous.node_index.node_id("Germany", 2025) is None
+    np.testing.assert_array_equal(previous.incremental.out, out)
+    np.testing.assert_array_equal(previous.cluster_table.clusters, clusters)
+
+
+def test_revision_follows_the_appended_content(fresh_service):
+    from services.prediction_service import PredictionService
+    other = PredictionService()
+    assert fresh_service.state.revision == other.state.revision == ""
+
+    x_new, edge_index_new = new_nodes(fresh_service, 2025, ["Atlantis", "Germany"])
+    for service in (fresh_service, other):
+        service.append_nodes(2025, ["Atlantis", "Germany"], x_new, edge_index_new)
+    # Workers that applied the same appends serve the same bodies under the same ETags
+    assert fresh_service.state.revision == other.state.revision != ""
+
+    x_new[0, 0] += 1
+    fresh_service.append_nodes(2025, ["Mu"], x_new[:1], edge_index_new[:, :0])
+    other.append_nodes(2025, ["Mu"], x_new[1:], edge_index_new[:, :0])
+    assert fresh_service.state.revision != other.state.revision
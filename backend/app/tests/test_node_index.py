@@ -0,0 +1,42 @@
+import numpy as np
+
+from pipeline.graph_builder import feature_scaling
+
+
+def standardized_rows(service) -> np.ndarray:
+    """Indicator features of every pivot row, scaled like the graph features"""
+    values = service.pivot_df[service.feature_names].to_numpy(dtype=np.float64)
+    fill, mean, std = feature_scaling(values)
+    return (np.where(np.isnan(values), fill, values) - mean) / std
+
+
+def test_nodes_hold_the_features_of_their_country_year(service):
+    expected = standardized_rows(service)
+    n_features = len(service.feature_names)
+
+    rows = np.random.default_rng(0).choice(len(service.pivot_df), size=100, replace=False)
+    germany_2020 = np.flatnonzero((service.pivot_df["Economy"] == "Germany") & (service.pivot_df["Year"] == 2020))
+    for row in np.concatenate([germany_2020, rows]).tolist():
+        country, year = service.pivot_df["Economy"].iloc[row], int(service.pivot_df["Year"].iloc[row])
+        node_id = service.state.node_index.node_id(country, year)
+
+        assert node_id is not None, (country, year)
+        assert service.state.node_index.country_year(node_id) == (country, year)
+        np.testing.assert_allclose(service.state.data.x[node_id, :n_features], expected[row], atol=1e-5)
+
+
+def test_every_pivot_row_has_its_own_node(service):
+    node_ids = [
+        service.state.node_index.node_id(country, int(year))
+        for country, year in zip(service.pivot_df["Economy"], service.pivot_df["Year"])
+    ]
+
+    assert None not in node_ids
+    assert sorted(node_ids) == list(range(service.state.data.x.shape[0]))
+
+
+def test_year_nodes_only_hold_their_year(service):
+    for year, (start_idx, end_idx) in service.state.data.node_offset.items():
+        nodes = service.state.node_index.year_nodes(year)
+        np.testing.assert_array_equal(nodes, np.arange(start_idx, end_idx))
+        assert (service.state.node_index.node_years[nodes] == year).all()
@@ -0,0 +1,35 @@
+def test_single_country_similar_is_not_served_from_the_bulk_response(client):
+    bulk = client.get("/predict/similar", params={"countries": "Nowhere"})
+    assert bulk.status_code == 200
+    assert bulk.json()["missing"] == ["Nowhere"]
+
+    single = client.get("/predict/similar/Nowhere")
+    assert single.status_code == 404
+    assert single.headers.get("etag") != bulk.headers["etag"]
+
+
+def test_etags_are_weak_and_revalidate(client):
+    response = client.get("/predict/clusters/2020", headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["etag"]
+    assert response.headers["content-encoding"] == "gzip"
+    assert etag.startswith('W/"')
+
+    for if_none_match in (etag, etag.removeprefix("W/")):
+        assert client.get("/predict/clusters/2020", headers={"If-None-Match": if_none_match}).status_code == 304
+
+
+def test_etags_change_with_the_response_schema(client, monkeypatch):
+    import services.http_cache
+    etag = client.get("/predict/clusters/2020").headers["etag"]
+
+    monkeypatch.setattr(services.http_cache, "RESPONSE_SCHEMA_VERSION", services.http_cache.RESPONSE_SCHEMA_VERSION + 1)
+    response = client.get("/predict/clusters/2020", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_missing_data_is_a_404(client):
+    for url in ("/predict/trends/Nowhere", "/cluster-stats/2030/1", "/predict/similar/Nowhere"):
+        response = client.get(url)
+        assert response.status_code == 404, url
+        assert response.json()["detail"] != "Error: "
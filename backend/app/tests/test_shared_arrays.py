@@ -0,0 +1,62 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from services.registry import ModelRegistry
+from services.shared_arrays import share_array
+
+
+def test_array_is_mapped_from_the_written_file(tmp_path):
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    array[1, 2] = np.nan
+    path = str(tmp_path / "v1" / "logits.npy")
+
+    first, second = share_array(array, path), share_array(array, path)
+
+    assert isinstance(first, np.memmap) and isinstance(second, np.memmap)
+    np.testing.assert_array_equal(second, array)
+    assert os.listdir(tmp_path / "v1") == ["logits.npy"]
+
+
+@pytest.mark.parametrize("leftover", [
+    np.zeros((3, 5), dtype=np.float32),
+    np.zeros((3, 4), dtype=np.float64),
+    np.ones((3, 4), dtype=np.float32),
+])
+def test_file_that_does_not_match_is_not_served(tmp_path, leftover):
+    path = str(tmp_path / "logits.npy")
+    np.save(path, leftover)
+    array = np.zeros((3, 4), dtype=np.float32)
+
+    shared = share_array(array, path)
+
+    assert not isinstance(shared, np.memmap)
+    np.testing.assert_array_equal(shared, array)
+
+
+def test_truncated_file_is_not_served(tmp_path):
+    path = str(tmp_path / "logits.npy")
+    array = np.ones((64, 64), dtype=np.float32)
+    np.save(path, array)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    shared = share_array(array, path)
+
+    assert not isinstance(shared, np.memmap)
+    np.testing.assert_array_equal(shared, array)
+
+
+def test_retired_version_files_are_removed(tmp_path):
+    registry = ModelRegistry(shared_dir=str(tmp_path))
+    registry.model = SimpleNamespace(artifact_version="new")
+    closed = []
+    for version in ("old", "new"):
+        share_array(np.zeros(3), str(tmp_path / version / "clusters.npy"))
+        registry._retire(SimpleNamespace(artifact_version=version, close=lambda: closed.append(version)))
+
+    assert os.listdir(tmp_path) == ["new"]
+    assert closed == ["old", "new"]
+    registry.executor.shutdown()
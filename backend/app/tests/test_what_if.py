@@ -0,0 +1,49 @@
+import numpy as np
+
+from schemas.requests import WhatIfScenario
+
+
+def observed_indicators(service, country: str, year: int) -> dict:
+    """Raw indicator values of a (country, year) pivot row, missing ones left out"""
+    pivot_df = service.pivot_df
+    row = pivot_df[(pivot_df["Economy"] == country) & (pivot_df["Year"] == year)][service.feature_names].iloc[0]
+    return {name: float(value) for name, value in row.dropna().items()}
+
+
+def table_logits(service, country: str, year: int) -> np.ndarray:
+    table = service.state.cluster_table
+    return table.logits[table.year_index[year], table.find_country(country)]
+
+
+def test_no_op_scenario_leaves_logits_unchanged(service):
+    indicators = observed_indicators(service, "Germany", 2020)
+    first = next(iter(indicators))
+
+    for changed in ({first: indicators[first]}, indicators):
+        result = service.score_scenarios(
+            [WhatIfScenario(country="Germany", year=2020, indicators=changed)], all_neighbours=True
+        ).results[0]
+
+        assert (result.country, result.year) == ("Germany", 2020)
+        assert result.cluster == result.previous_cluster
+        np.testing.assert_allclose(result.logits, table_logits(service, "Germany", 2020), atol=1e-5)
+        for neighbour in result.neighbours:
+            assert neighbour.cluster == neighbour.previous_cluster
+            np.testing.assert_allclose(neighbour.logits, table_logits(service, neighbour.country, neighbour.year), atol=1e-5)
+
+
+def test_batch_of_no_op_scenarios_leaves_every_node_unchanged(service):
+    pivot_df = service.pivot_df
+    rows = np.random.default_rng(0).choice(len(pivot_df), size=20, replace=False).tolist()
+    scenarios = [
+        WhatIfScenario(country=country, year=year, indicators=observed_indicators(service, country, year))
+        for country, year in ((pivot_df["Economy"].iloc[row], int(pivot_df["Year"].iloc[row])) for row in rows)
+    ]
+
+    response = service.score_scenarios(scenarios)
+
+    assert response.missing == []
+    for scenario, result in zip(scenarios, response.results):
+        assert (result.country, result.year) == (scenario.country, scenario.year)
+        assert result.neighbours == []
+        np.testing.assert_allclose(result.logits, table_logits(service, scenario.country, scenario.year), atol=1e-5)
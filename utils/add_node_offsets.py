@@ -1,6 +1,13 @@
+import os
+import sys
+
 import torch
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend", "app"))
+
+from pipeline.graph_builder import node_permutation, reorder_nodes
+
 data = torch.load("../graphs/digital_inequality_graph.pt", weights_only=False)
 df = pd.read_csv("../cleaned_final_dataset.csv")
 
@@ -11,6 +18,16 @@ pivot_df = df.pivot_table(
 ).reset_index()
 pivot_df["node_id"] = range(len(pivot_df))
 
+# The notebook numbers nodes in pivot_table (Economy, Year) order, the years of a
+# node range are only contiguous once the nodes are renumbered by (Year, Economy)
+order = node_permutation(pivot_df)
+x, edge_index = reorder_nodes(data.x.numpy(), data.edge_index.numpy(), order)
+data.x, data.edge_index = torch.from_numpy(x), torch.from_numpy(edge_index)
+pivot_df = pivot_df.iloc[order].reset_index(drop=True)
+pivot_df["node_id"] = range(len(pivot_df))
+data.countries = pivot_df["Economy"].tolist()
+data.years = torch.tensor(pivot_df["Year"].to_numpy())
+
 print("📊 Info about years in graph:")
 print(f"Unique years: {sorted(pivot_df['Year'].unique())}")
 print(f"Nodes: {len(pivot_df)}")
@@ -24,15 +41,16 @@ print(data.node_offsets)
 # Create node_offsets
 def create_node_offsets(pivot_df):
     """Make node_offsets dict with years"""
-    node_offsets = {}
-    current_idx = 0
-    
-    for year in sorted(pivot_df['Year'].unique()):
-        # Number of nodes for the current year
-        year_count = len(pivot_df[pivot_df['Year'] == year])
-        node_offsets[year] = (current_idx, current_idx + year_count)
-        current_idx += year_count
-        print(f"Year {year}: nodes {node_offsets[year][0]}-{node_offsets[year][1]-1}")
+    # Number of nodes of every year in one pass instead of a filter per year
+    year_counts = pivot_df['Year'].value_counts().sort_index()
+    ends = year_counts.cumsum()
+    node_offsets = {
+        year: (int(end - count), int(end))
+        for year, count, end in zip(year_counts.index, year_counts, ends)
+    }
+
+    for year, (start_idx, end_idx) in node_offsets.items():
+        print(f"Year {year}: nodes {start_idx}-{end_idx-1}")
 
     print(node_offsets)    
     